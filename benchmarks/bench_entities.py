@@ -0,0 +1,120 @@
+# benchmarks/bench_entities.py
+#
+# Per-frame coin and door bookkeeping: the old per-object way (a Coin list,
+# a new pygame.Rect for every collision test and every drawn coin, and an
+# all(coin.collected ...) scan for the door) against the CoinStore.
+#
+# Each frame tests the player against the coins, collects what it touches,
+# checks the door and gathers the rects of the coins left to draw. Reported
+# per coin count: time per frame, and from tracemalloc the mean and largest
+# number of bytes allocated during a frame.
+#
+# Run from the repository root:
+#   python benchmarks/bench_entities.py
+
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import pygame
+from objects import CoinStore, Door
+from utils import MAIN_AREA
+
+FRAMES = 2000
+
+class OldCoin:
+    """Coin and its collision test as they were before CoinStore."""
+    def __init__(self, x, y, width=20, height=20):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.collected = False
+
+    def check_collision(self, player_rect):
+        return pygame.Rect(self.x, self.y, self.width, self.height).colliderect(player_rect)
+
+def old_frame(coins, door, player_rect, drawn):
+    for coin in coins:
+        if not coin.collected and coin.check_collision(player_rect):
+            coin.collected = True
+    if all(coin.collected for coin in coins):
+        door.is_locked = False
+    pygame.Rect(door.x, door.y, 50, 80).colliderect(player_rect)
+    for coin in coins:
+        if not coin.collected:
+            drawn.append(pygame.Rect(coin.x, coin.y, coin.width, coin.height))
+
+def store_frame(store, door, player_rect, drawn):
+    store.collect_touching(player_rect)
+    door.rect.colliderect(player_rect)
+    rects = store.rects
+    for index in store.live:
+        drawn.append(rects[index])
+
+def positions(count, rng):
+    return [(rng.randint(MAIN_AREA.left, MAIN_AREA.right - 20),
+             rng.randint(MAIN_AREA.top, MAIN_AREA.bottom - 20)) for _ in range(count)]
+
+def player_path(frames, rng):
+    # The player wanders, so coins are collected as the frames go by.
+    rects = []
+    x, y = MAIN_AREA.center
+    for _ in range(frames):
+        x = max(MAIN_AREA.left, min(MAIN_AREA.right - 25, x + rng.choice((-5, 0, 5))))
+        y = max(MAIN_AREA.top, min(MAIN_AREA.bottom - 50, y + rng.choice((-5, 0, 5))))
+        rects.append(pygame.Rect(x, y, 25, 50))
+    return rects
+
+def run(make_state, frame, path):
+    """
+    Returns (ms per frame, mean and max bytes allocated during a frame,
+    from tracemalloc's peak). Last frame's rects to draw are dropped
+    before each frame, so every Rect a frame creates counts.
+    """
+    coins, door = make_state()
+    drawn = []
+    start = time.perf_counter()
+    for player_rect in path:
+        drawn.clear()
+        frame(coins, door, player_rect, drawn)
+    elapsed = time.perf_counter() - start
+
+    coins, door = make_state()
+    drawn = []
+    peaks = []
+    tracemalloc.start()
+    for player_rect in path:
+        drawn.clear()
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        frame(coins, door, player_rect, drawn)
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+    return elapsed / len(path) * 1000.0, sum(peaks) / len(peaks), max(peaks)
+
+def main():
+    print(f"{'coins':>6} | {'old ms':>8} {'store ms':>9} | {'old B/frame':>12} {'store B/frame':>14} "
+          f"| {'old max B':>10} {'store max B':>12}")
+    for count in (10, 100, 1000):
+        rng = random.Random(count)
+        spots = positions(count, rng)
+        path = player_path(FRAMES, rng)
+        def old_state():
+            return [OldCoin(x, y) for x, y in spots], Door(700, 100)
+        def store_state():
+            door = Door(700, 100)
+            store = CoinStore([(x, y, 20, 20) for x, y in spots])
+            store.bind_door(door)
+            return store, door
+        old_ms, old_mean, old_max = run(old_state, old_frame, path)
+        new_ms, new_mean, new_max = run(store_state, store_frame, path)
+        print(f"{count:>6} | {old_ms:>8.4f} {new_ms:>9.4f} | {old_mean:>12.0f} {new_mean:>14.0f} "
+              f"| {old_max:>10} {new_max:>12}")
+
+if __name__ == "__main__":
+    main()
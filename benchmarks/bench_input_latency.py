@@ -0,0 +1,177 @@
+# benchmarks/bench_input_latency.py
+#
+# Measures the tilt input path without the controller: a recorded or
+# synthetic serial stream is replayed at its original timing into
+# SerialReader, and a headless copy of the main loop (fixed SIM_DT ticks at
+# a capped frame rate) applies the newest sample each frame.
+#
+# Reported per run, p50/p99 in ms from the moment a sample reaches the port:
+#   parsed  - until SerialReader has it in the ring buffer
+#   applied - until a World.step() has moved the knight with it
+#
+# With --controllers N, N copies of each stream are replayed through
+# pseudo-terminals into one ControllerManager, and "applied" is until a
+# frame's poll() has delivered the sample.
+#
+# Run from the repository root:
+#   python benchmarks/bench_input_latency.py
+#   python benchmarks/bench_input_latency.py --recording session.ikqs --speed 4
+#   python benchmarks/bench_input_latency.py --pty   # through a real tty and pyserial
+#   python benchmarks/bench_input_latency.py --controllers 4
+
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from controllers import ControllerManager
+from input_handler import SerialReader
+from serial_replay import ReplayPort, open_pty_replay, read_recording, synthesize
+from sim import GameSim
+from tilt_filter import shape_tilt
+from world import SIM_DT
+
+MAX_FRAME_TIME = 0.25
+# Seconds a pty replay stays open after its last record, past the end of a run.
+PTY_LINGER = 0.5
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+def run(records, fps, speed=1.0, use_pty=False):
+    """Plays records through SerialReader into the game loop. Returns latency lists and counters."""
+    if use_pty:
+        import serial
+        start = time.perf_counter() + 0.2
+        # Kept open past the end of the run, so the reader doesn't report the hang-up.
+        path, feeder = open_pty_replay(records, speed, start, linger=PTY_LINGER)
+        port = serial.Serial(path, 115200, timeout=0.1)
+        release_time = lambda i: start + records[i][0] / speed
+    else:
+        port = ReplayPort(records, speed)
+        release_time = port.release_time
+    duration = records[-1][0] / speed + 0.1
+    reader = SerialReader(port)
+    sim = GameSim(0, seed=1)
+    parsed, applied = [], []
+    seen = 0
+    last_applied = -1
+    baseline = None
+    reader.start()
+    frame = 1.0 / fps if fps else 0.0
+    last = time.perf_counter()
+    end = last + duration + (0.2 if use_pty else 0.0)
+    accumulator = 0.0
+    while last < end:
+        now = time.perf_counter()
+        accumulator += min(now - last, MAX_FRAME_TIME)
+        last = now
+        # Arrival to ring buffer for every sample since the last frame.
+        count = reader.count
+        for i in range(max(seen, count - reader.size), count):
+            parsed.append(reader.buffer[i % reader.size][0] - release_time(i))
+        seen = count
+        sample = reader.latest()
+        vector = (0, 0)
+        if sample:
+            # Raw mapping, with the first sample as the zero.
+            if baseline is None:
+                baseline = (sample[2], sample[3])
+            vector = shape_tilt(sample[2] - baseline[0], sample[3] - baseline[1])
+        newest = reader.last_read - 1
+        while accumulator >= SIM_DT:
+            sim.world.step(vector, SIM_DT)
+            accumulator -= SIM_DT
+            if newest > last_applied:
+                applied.append(time.perf_counter() - release_time(newest))
+                last_applied = newest
+            if sim.world.state != "playing":
+                sim.reset(1)
+        if frame:
+            time.sleep(max(0.0, last + frame - time.perf_counter()))
+    reader.stop()
+    port.close()
+    if use_pty:
+        feeder.join()
+    return sorted(parsed), sorted(applied), reader.stats()
+
+def run_controllers(records, count, fps, speed=1.0):
+    """
+    Plays records into count pseudo-terminals served by one
+    ControllerManager, polled once per frame. Returns latency lists over
+    all controllers and their summed counters.
+    """
+    start = time.perf_counter() + 0.3
+    # Kept open until the stats are in: a closed pty counts as unplugged.
+    replays = [open_pty_replay(records, speed, start, linger=PTY_LINGER) for _ in range(count)]
+    manager = ControllerManager([path for path, _ in replays], max_players=count)
+    manager.start()
+    release_time = lambda i: start + records[i][0] / speed
+    parsed, applied = [], []
+    seen = {}
+    frame = 1.0 / fps if fps else 0.0
+    end = start + records[-1][0] / speed + 0.2
+    while time.perf_counter() < end:
+        last = time.perf_counter()
+        controllers = manager.poll()
+        polled = time.perf_counter()
+        for controller in controllers:
+            reader = controller.reader
+            count = controller.seen
+            first = seen.get(controller.path, 0)
+            for i in range(max(first, count - reader.size), count):
+                parsed.append(reader.buffer[i % reader.size][0] - release_time(i))
+            if count > first:
+                applied.append(polled - release_time(count - 1))
+            seen[controller.path] = count
+        if frame:
+            time.sleep(max(0.0, last + frame - time.perf_counter()))
+    stats = {}
+    for controller in manager.connected:
+        for key, value in controller.stats().items():
+            if isinstance(value, int):
+                stats[key] = stats.get(key, 0) + value
+    manager.stop()
+    for _, feeder in replays:
+        feeder.join()
+    return sorted(parsed), sorted(applied), stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial input latency without the hardware.")
+    parser.add_argument("--rates", type=int, nargs="*", default=[100, 500, 1000],
+                        help="synthetic samples per second")
+    parser.add_argument("--protocols", nargs="*", default=["text", "binary"], choices=["text", "binary"])
+    parser.add_argument("--seconds", type=float, default=3.0, help="length of each synthetic stream")
+    parser.add_argument("--recording", help="replay this recording instead of synthetic streams")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed multiplier")
+    parser.add_argument("--fps", type=int, default=60, help="frame cap of the game loop, 0 for none")
+    parser.add_argument("--pty", action="store_true", help="replay through a pseudo-terminal and pyserial")
+    parser.add_argument("--controllers", type=int, default=0,
+                        help="replay this many streams at once through one ControllerManager")
+    args = parser.parse_args()
+
+    if args.recording:
+        runs = [(os.path.basename(args.recording), "-", read_recording(args.recording))]
+    else:
+        runs = [(protocol, rate, synthesize(rate, args.seconds, protocol))
+                for protocol in args.protocols for rate in args.rates]
+
+    print(f"{'stream':>10} {'rate':>6} | {'samples':>8} {'parsed p50':>10} {'p99':>7} "
+          f"| {'applied p50':>11} {'p99':>7} | {'dropped':>7} {'lost':>5} {'bad':>4}")
+    for name, rate, records in runs:
+        if args.controllers:
+            parsed, applied, stats = run_controllers(records, args.controllers, args.fps, args.speed)
+        else:
+            parsed, applied, stats = run(records, args.fps, args.speed, args.pty)
+        ms = lambda values, q: percentile(values, q) * 1000.0
+        print(f"{name:>10} {rate:>6} | {stats['lines']:>8} {ms(parsed, 0.5):>10.2f} {ms(parsed, 0.99):>7.2f} "
+              f"| {ms(applied, 0.5):>11.2f} {ms(applied, 0.99):>7.2f} "
+              f"| {stats['dropped']:>7} {stats['lost']:>5} {stats['malformed']:>4}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# benchmarks/bench_spatial.py
+#
+# Compares the linear wall/obstacle scans the main loop used to do with the
+# SpatialGrid broad phase, at increasing wall and obstacle counts. Its wall
+# and spider fixtures are shared with bench_suite.py.
+#
+# Run from the repository root:
+#   python benchmarks/bench_spatial.py
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import pygame
+from spatial import SpatialGrid, build_grid
+from utils import MAIN_AREA
+from obstacles import MovingObstacle
+
+def wall_length(count):
+    """Wall length for count walls in one screen: shorter as the count grows, like a dense maze."""
+    return int(max(16, 160 / (count / 10) ** 0.5))
+
+def make_walls(count, rng, area=MAIN_AREA, length=None):
+    """Random thin wall segments inside area, wall_length(count) long unless length is given."""
+    if length is None:
+        length = wall_length(count)
+    walls = []
+    for _ in range(count):
+        w, h = (length, 8) if rng.random() < 0.5 else (8, length)
+        walls.append(pygame.Rect(rng.randint(area.left, area.right - w),
+                                 rng.randint(area.top, area.bottom - h), w, h))
+    return walls
+
+def make_obstacles(count, rng, image=None, area=MAIN_AREA):
+    """count bouncing 30x30 spiders at random spots in area."""
+    speeds = [-4, -3, -2, 2, 3, 4]
+    return [MovingObstacle(rng.randint(area.left, area.right - 30),
+                           rng.randint(area.top, area.bottom - 30),
+                           30, 30, rng.choice(speeds), rng.choice(speeds), image)
+            for _ in range(count)]
+
+class WallList:
+    """The old linear scan, behind the same interface as SpatialGrid."""
+    def __init__(self, walls):
+        self.walls = walls
+
+    def collides(self, rect):
+        return any(rect.colliderect(wall) for wall in self.walls)
+
+def frame_linear(player_rect, walls, obstacles):
+    wall_list = WallList(walls)
+    for _ in range(2):
+        wall_list.collides(player_rect)
+    hit = False
+    for obstacle in obstacles:
+        obstacle.update(wall_list)
+        if player_rect.colliderect(obstacle.rect):
+            hit = True
+    return hit
+
+def frame_grid(player_rect, wall_grid, obstacles, obstacle_grid):
+    for _ in range(2):
+        wall_grid.collides(player_rect)
+    for obstacle in obstacles:
+        obstacle.update(wall_grid)
+        obstacle_grid.move(obstacle)
+    return obstacle_grid.collides(player_rect)
+
+def placement(wall_index, rng, count=50):
+    placed = 0
+    for _ in range(count):
+        for _ in range(100):
+            x = rng.randint(MAIN_AREA.left, MAIN_AREA.right - 20)
+            y = rng.randint(MAIN_AREA.top, MAIN_AREA.bottom - 20)
+            if not wall_index.collides(pygame.Rect(x, y, 20, 20)):
+                placed += 1
+                break
+    return placed
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000.0
+
+def main():
+    frames = 100
+    print(f"{'walls':>6} {'spiders':>8} | {'frame linear':>13} {'frame grid':>11} | "
+          f"{'place linear':>13} {'place grid':>11}   (ms)")
+    for wall_count in (10, 100, 1000):
+        for obstacle_count in (10, 50, 200):
+            rng = random.Random(wall_count * 1000 + obstacle_count)
+            walls = make_walls(wall_count, rng)
+            player_rect = pygame.Rect(400, 300, 25, 50)
+
+            linear_obstacles = make_obstacles(obstacle_count, random.Random(1))
+            t_linear = timed(lambda: frame_linear(player_rect, walls, linear_obstacles), frames)
+
+            wall_grid = build_grid(MAIN_AREA, walls)
+            grid_obstacles = make_obstacles(obstacle_count, random.Random(1))
+            obstacle_grid = SpatialGrid(MAIN_AREA)
+            for obstacle in grid_obstacles:
+                obstacle_grid.insert(obstacle, obstacle.rect)
+            t_grid = timed(lambda: frame_grid(player_rect, wall_grid, grid_obstacles, obstacle_grid), frames)
+
+            p_linear = timed(lambda: placement(WallList(walls), random.Random(7)), 3)
+            p_grid = timed(lambda: placement(wall_grid, random.Random(7)), 3)
+            print(f"{wall_count:>6} {obstacle_count:>8} | {t_linear:>13.3f} {t_grid:>11.3f} | "
+                  f"{p_linear:>13.3f} {p_grid:>11.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+# benchmarks/bench_suite.py
+#
+# Headless regression benchmarks for the hot paths, run with the SDL dummy
+# video driver so they work on a build machine without a display:
+#   render.full / render.dirty  render_game and DirtyRectRenderer, per frame
+#   step                        World.step(), the main loop's collision tick
+#   obstacles.update            MovingObstacle.update for a whole group, per tick
+#   place.coins / place.spiders create_coins_in_area / create_obstacles in a dense maze
+#   input.text / input.binary   SerialReader.feed plus get_input() on a frame's worth
+#                               of synthetic controller samples
+#   render.view                 render_view through a Camera sweeping a scrolling level
+#   obstacles.view              ObstacleGroup.update around the view of a scrolling level
+#   step.world                  World.step() in a scrolling level
+# Each case is run at several sizes (walls, coins, spiders or samples). The
+# scrolling cases keep the walls, coins and spiders per screen fixed and
+# grow the level, so their times should stay flat or grow slowly.
+#
+# Results are written as JSON (median and best ms per operation for every
+# case) and, with --baseline, compared against a stored run: a case whose
+# best time is more than --tolerance slower fails the run with exit status 1.
+# The best of the rounds is compared because it is the least disturbed by
+# whatever else the machine is doing.
+# Timings only compare on the same machine, so keep one baseline per
+# cabinet model and refresh it with --save-baseline after an intended change.
+#
+# Run from the repository root:
+#   python benchmarks/bench_suite.py
+#   python benchmarks/bench_suite.py --output results.json --baseline benchmarks/baseline.json
+#   python benchmarks/bench_suite.py --filter render --save-baseline benchmarks/baseline.json
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import pygame
+import input_handler
+from assets import get_asset
+from input_handler import SerialReader
+from objects import CoinStore, Door, create_coins_in_area
+from camera import Camera
+from obstacles import ObstacleGroup, create_obstacles
+from player import Player
+from renderer import (DirtyRectRenderer, StaticTiles, build_static_layer, render_game, render_view,
+                      warm_surface_cache)
+from serial_replay import synthesize
+from spatial import build_grid
+from tilt_filter import TiltFilter
+from utils import MAIN_AREA, SCREEN_WIDTH, SCREEN_HEIGHT, Timer, play_area
+from world import World
+from bench_spatial import make_obstacles, make_walls, wall_length
+
+SUITE_VERSION = 1
+
+# A case more than this much slower than the baseline is a regression.
+DEFAULT_TOLERANCE = 0.25
+
+# (walls, coins, spiders) for the render, step and placement cases.
+SIZES = [(10, 10, 3), (100, 50, 50), (400, 200, 200)]
+
+# Level size, in screens along each side, for the scrolling cases, and the
+# (walls, coins, spiders) in each screen of it.
+WORLD_SCREENS = [1, 3, 6]
+PER_SCREEN = (40, 20, 10)
+
+# Samples per rendered frame for the input cases: 100, 1000 and 5000
+# samples/s at 60 fps, rounded up.
+SAMPLES_PER_FRAME = [2, 17, 84]
+
+def coin_positions(count, rng, area=MAIN_AREA):
+    return [(rng.randint(area.left, area.right - 20),
+             rng.randint(area.top, area.bottom - 20)) for _ in range(count)]
+
+class BenchLevels:
+    """A one-level stand-in for LevelManager, holding a generated level."""
+    def __init__(self, level):
+        self.levels = [level]
+        self.current_level_index = 0
+
+    def get_current_level(self):
+        return self.levels[self.current_level_index]
+
+    def next_level(self):
+        self.current_level_index += 1
+
+    def reset(self):
+        self.current_level_index = 0
+
+def make_level(walls, coins, spiders, rng):
+    return {
+        "player_start": (100, 350),
+        "door": (700, 100),
+        "time_limit": 1e9,
+        "walls": [tuple(wall) for wall in make_walls(walls, rng)],
+        "coins": coin_positions(coins, rng),
+        "spider_count": spiders,
+    }
+
+def render_case(walls, coins, spiders, dirty):
+    rng = random.Random(walls)
+    wall_rects = make_walls(walls, rng)
+    static_layer = build_static_layer(
+        pygame.transform.scale(get_asset("background"), (SCREEN_WIDTH, SCREEN_HEIGHT)),
+        get_asset("vertical_wall"), get_asset("horizontal_wall"), wall_rects)
+    coin_img = get_asset("coin")
+    door_closed_img = get_asset("door_closed")
+    door_open_img = get_asset("door_open")
+    coin_store = CoinStore([(x, y, 20, 20) for x, y in coin_positions(coins, rng)])
+    obstacles = ObstacleGroup(make_obstacles(spiders, rng, get_asset("spider")))
+    wall_grid = build_grid(MAIN_AREA, wall_rects)
+    player = Player(100, 350)
+    door = Door(700, 100)
+    timer = Timer(60)
+    warm_surface_cache(door_closed_img, door_open_img, coin_img, coin_store, obstacles)
+    screen = pygame.display.get_surface()
+    render = DirtyRectRenderer().render if dirty else render_game
+    def frame():
+        # Sprites move every frame, as in play, so the dirty renderer has work to do.
+        obstacles.update(wall_grid)
+        player.prev_x = player.x
+        player.x = 100 + (player.x - 99) % 500
+        render(screen, static_layer, door_closed_img, door_open_img, coin_img,
+               player, coin_store, door, timer, obstacles, 0.5)
+    return frame
+
+def step_case(walls, coins, spiders):
+    rng = random.Random(walls)
+    player = Player(100, 350, image=pygame.Surface((50, 50)))
+    world = World(BenchLevels(make_level(walls, coins, spiders, rng)), player, None,
+                  rng=random.Random(1), single_level=True)
+    directions = [(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)]
+    ticks = [0]
+    def tick():
+        ticks[0] += 1
+        world.step(directions[(ticks[0] // 10) % len(directions)])
+        # A death or the door ends the run; carry on so every tick is timed
+        # on the same layout.
+        world.state = "playing"
+    return tick
+
+def obstacles_case(walls, coins, spiders):
+    rng = random.Random(walls)
+    wall_grid = build_grid(MAIN_AREA, make_walls(walls, rng))
+    group = ObstacleGroup(make_obstacles(spiders, rng, None))
+    player_rect = pygame.Rect(100, 350, 25, 50)
+    def tick():
+        group.update(wall_grid)
+        group.collides(player_rect)
+    return tick
+
+def place_coins_case(walls, coins, spiders):
+    rng = random.Random(walls)
+    wall_grid = build_grid(MAIN_AREA, make_walls(walls, rng))
+    positions = coin_positions(coins, rng)
+    return lambda: create_coins_in_area(positions, wall_grid, rng=random.Random(2))
+
+def place_spiders_case(walls, coins, spiders):
+    rng = random.Random(walls)
+    wall_grid = build_grid(MAIN_AREA, make_walls(walls, rng))
+    safe_rect = pygame.Rect(0, 250, 250, 250)
+    return lambda: create_obstacles(wall_grid, None, safe_rect, count=spiders, rng=random.Random(3))
+
+def make_world(screens, rng):
+    """A scrolling level screens x screens screens large, with PER_SCREEN of everything in each."""
+    world_size = (SCREEN_WIDTH * screens, SCREEN_HEIGHT * screens)
+    area = play_area(*world_size)
+    walls, coins, spiders = (count * screens * screens for count in PER_SCREEN)
+    return world_size, area, make_walls(walls, rng, area, wall_length(PER_SCREEN[0])), coins, spiders
+
+def sweep(area, frame, period=1200):
+    """The knight's position at frame, sweeping back and forth across area on a diagonal."""
+    phase = frame % (2 * period)
+    t = (phase if phase < period else 2 * period - phase) / period
+    return (int(area.left + t * (area.width - 50)), int(area.top + t * (area.height - 50)))
+
+def render_view_case(screens):
+    rng = random.Random(screens)
+    world_size, area, wall_rects, coins, spiders = make_world(screens, rng)
+    bounds = pygame.Rect((0, 0), world_size)
+    wall_grid = build_grid(area, wall_rects)
+    tiles = StaticTiles(pygame.transform.scale(get_asset("background"), (SCREEN_WIDTH, SCREEN_HEIGHT)),
+                        get_asset("vertical_wall"), get_asset("horizontal_wall"), wall_grid, bounds)
+    camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT, bounds)
+    coin_img = get_asset("coin")
+    door_closed_img = get_asset("door_closed")
+    door_open_img = get_asset("door_open")
+    coin_store = CoinStore([(x, y, 20, 20) for x, y in coin_positions(coins, rng, area)], area)
+    obstacles = ObstacleGroup(make_obstacles(spiders, rng, get_asset("spider"), area), area)
+    player = Player(*area.topleft)
+    door = Door(area.right - 100, area.bottom - 100)
+    timer = Timer(60)
+    warm_surface_cache(door_closed_img, door_open_img, coin_img, coin_store, obstacles)
+    screen = pygame.display.get_surface()
+    frames = [0]
+    def frame():
+        frames[0] += 1
+        player.prev_x, player.prev_y = player.x, player.y
+        player.x, player.y = sweep(area, frames[0])
+        render_view(screen, camera, tiles, door_closed_img, door_open_img, coin_img,
+                    player, coin_store, door, timer, obstacles, 0.5)
+    return frame
+
+def obstacles_view_case(screens):
+    rng = random.Random(screens)
+    world_size, area, wall_rects, coins, spiders = make_world(screens, rng)
+    wall_grid = build_grid(area, wall_rects)
+    group = ObstacleGroup(make_obstacles(spiders, rng, None, area), area)
+    camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT, pygame.Rect((0, 0), world_size))
+    ticks = [0]
+    def tick():
+        ticks[0] += 1
+        x, y = sweep(area, ticks[0])
+        camera.follow(x + 25, y + 25)
+        group.update(wall_grid, camera.rect.inflate(128, 128))
+        group.collides(pygame.Rect(x + 12, y, 25, 50))
+    return tick
+
+def step_world_case(screens):
+    rng = random.Random(screens)
+    world_size, area, wall_rects, coins, spiders = make_world(screens, rng)
+    level = {
+        "world_size": world_size,
+        "player_start": (100, 350),
+        "door": (area.right - 100, area.bottom - 100),
+        "time_limit": 1e9,
+        "walls": [tuple(wall) for wall in wall_rects],
+        "coins": coin_positions(coins, rng, area),
+        "spider_count": spiders,
+    }
+    player = Player(100, 350, image=pygame.Surface((50, 50)))
+    world = World(BenchLevels(level), player, None, rng=random.Random(1), single_level=True)
+    ticks = [0]
+    def tick():
+        # The knight wanders in a loop so the view keeps moving.
+        ticks[0] += 1
+        world.step((1, 1) if (ticks[0] // 300) % 2 == 0 else (-1, -1))
+        world.state = "playing"
+    return tick
+
+def input_case(protocol, samples):
+    """One frame of get_input(): the frame's chunk parsed by the shared reader, then filtered."""
+    data = b"".join(chunk for _, chunk in synthesize(1000, 60, protocol, random.Random(4)))
+    frame_size = len(data) // 60000 * samples
+    reader = SerialReader()
+    input_handler.reader = reader
+    input_handler.tilt_filter = TiltFilter()
+    input_handler._filtered_count = 0
+    offset = [0]
+    def frame():
+        start = offset[0]
+        if start + frame_size > len(data):
+            start = 0
+        offset[0] = start + frame_size
+        reader.feed(data[start:start + frame_size])
+        input_handler.get_input()
+    return frame
+
+def cases():
+    """Yields (name, params, setup) for every case; setup() returns the function to time."""
+    for walls, coins, spiders in SIZES:
+        params = {"walls": walls, "coins": coins, "spiders": spiders}
+        yield "render.full", params, lambda w=walls, c=coins, s=spiders: render_case(w, c, s, False)
+        yield "render.dirty", params, lambda w=walls, c=coins, s=spiders: render_case(w, c, s, True)
+        yield "step", params, lambda w=walls, c=coins, s=spiders: step_case(w, c, s)
+        yield "obstacles.update", params, lambda w=walls, c=coins, s=spiders: obstacles_case(w, c, s)
+        yield "place.coins", params, lambda w=walls, c=coins, s=spiders: place_coins_case(w, c, s)
+        yield "place.spiders", params, lambda w=walls, c=coins, s=spiders: place_spiders_case(w, c, s)
+    for screens in WORLD_SCREENS:
+        params = {"screens": screens}
+        yield "render.view", params, lambda n=screens: render_view_case(n)
+        yield "obstacles.view", params, lambda n=screens: obstacles_view_case(n)
+        yield "step.world", params, lambda n=screens: step_world_case(n)
+    for protocol in ("text", "binary"):
+        for samples in SAMPLES_PER_FRAME:
+            yield f"input.{protocol}", {"samples": samples}, lambda p=protocol, n=samples: input_case(p, n)
+
+def case_key(name, params):
+    return name + "[" + ",".join(f"{key}={value}" for key, value in params.items()) + "]"
+
+def measure(func, repeat, min_time):
+    """
+    Times func: calls are batched so one round takes at least min_time
+    seconds, and repeat rounds are run. Returns (median ms, best ms) per call.
+    """
+    func()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    rounds = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        rounds.append((time.perf_counter() - start) / number)
+    rounds.sort()
+    return rounds[len(rounds) // 2] * 1000.0, rounds[0] * 1000.0
+
+def run(name_filter=None, repeat=7, min_time=0.05, keys=None):
+    results = {}
+    for name, params, setup in cases():
+        key = case_key(name, params)
+        if name_filter and name_filter not in key or keys is not None and key not in keys:
+            continue
+        median, best = measure(setup(), repeat, min_time)
+        results[key] = {"name": name, "params": params, "median_ms": median, "min_ms": best}
+        print(f"{key:<48} {median:>10.4f} ms  (best {best:.4f})", file=sys.stderr)
+    return {
+        "version": SUITE_VERSION,
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "results": results,
+    }
+
+def compare(report, baseline, tolerance):
+    """Returns (rows, regressions): (key, baseline best ms, best ms, ratio) for cases in both runs."""
+    rows = []
+    regressions = []
+    for key, result in report["results"].items():
+        before = baseline.get("results", {}).get(key)
+        if before is None:
+            continue
+        ratio = result["min_ms"] / before["min_ms"] if before["min_ms"] > 0 else 1.0
+        rows.append((key, before["min_ms"], result["min_ms"], ratio))
+        if ratio > 1.0 + tolerance:
+            regressions.append(key)
+    return rows, regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless performance benchmarks with baseline comparison.")
+    parser.add_argument("--output", help="write the results as JSON to this file (default: stdout)")
+    parser.add_argument("--baseline", help="compare against this earlier --output or --save-baseline file")
+    parser.add_argument("--save-baseline", help="also write the results here, as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown before a case counts as a regression (0.25 = 25%%)")
+    parser.add_argument("--filter", help="only run cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=7, help="timed rounds per case")
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds per timed round")
+    args = parser.parse_args()
+
+    pygame.init()
+    pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    report = run(args.filter, args.repeat, args.min_time)
+    pygame.quit()
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows, regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            # Measure suspects once more, keeping each case's better run, so
+            # one disturbed round doesn't fail the build.
+            print(f"\nRe-running {len(regressions)} slower case(s)...", file=sys.stderr)
+            pygame.init()
+            pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+            rerun = run(repeat=args.repeat, min_time=args.min_time, keys=set(regressions))["results"]
+            pygame.quit()
+            for key, result in rerun.items():
+                if result["min_ms"] < report["results"][key]["min_ms"]:
+                    report["results"][key] = result
+            rows, regressions = compare(report, baseline, args.tolerance)
+        report["baseline"] = {"path": args.baseline, "tolerance": args.tolerance, "regressions": regressions}
+        print(f"\n{'case':<48} {'baseline':>10} {'now':>10} {'change':>8}", file=sys.stderr)
+        for key, before, now, ratio in rows:
+            flag = "  REGRESSION" if key in regressions else ""
+            print(f"{key:<48} {before:>10.4f} {now:>10.4f} {ratio - 1:>+8.1%}{flag}", file=sys.stderr)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) more than {args.tolerance:.0%} slower than the baseline.",
+                  file=sys.stderr)
+            status = 1
+
+    text = json.dumps(report, indent=1)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            f.write(text + "\n")
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+# benchmarks/bench_swarm.py
+#
+# Compares one MovingObstacle per spider (ObstacleGroup) with the NumPy
+# ObstacleSwarm for a tick of update() plus the player overlap test.
+#
+# Run from the repository root:
+#   python benchmarks/bench_swarm.py
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import pygame
+from level_manager import LevelManager
+from obstacles import MovingObstacle, ObstacleGroup
+from spatial import build_grid
+from swarm import ObstacleSwarm
+from utils import MAIN_AREA
+
+def spawn(count, rng):
+    speeds = [-4, -3, -2, 2, 3, 4]
+    return [(rng.randint(MAIN_AREA.left, MAIN_AREA.right - 30),
+             rng.randint(MAIN_AREA.top, MAIN_AREA.bottom - 30),
+             rng.choice(speeds), rng.choice(speeds)) for _ in range(count)]
+
+def per_tick_ms(obstacles, wall_grid, player_rect, ticks):
+    start = time.perf_counter()
+    for _ in range(ticks):
+        obstacles.update(wall_grid)
+        obstacles.collides(player_rect)
+    return (time.perf_counter() - start) / ticks * 1000.0
+
+def main():
+    walls = [pygame.Rect(*wall) for wall in LevelManager().levels[1]["walls"]]
+    wall_grid = build_grid(MAIN_AREA, walls)
+    player_rect = pygame.Rect(100, 350, 25, 50)
+    print(f"{'spiders':>8} | {'per-object ms':>14} {'swarm ms':>9} {'speedup':>8}")
+    for count in (10, 100, 1000, 10000):
+        ticks = max(5, 20000 // count)
+        states = spawn(count, random.Random(count))
+        group = ObstacleGroup([MovingObstacle(x, y, 30, 30, vx, vy, None) for x, y, vx, vy in states])
+        swarm = ObstacleSwarm(*zip(*states), 30, 30, None)
+        t_group = per_tick_ms(group, wall_grid, player_rect, ticks)
+        t_swarm = per_tick_ms(swarm, wall_grid, player_rect, ticks)
+        print(f"{count:>8} | {t_group:>14.3f} {t_swarm:>9.3f} {t_group / t_swarm:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# benchmarks/bench_tilt_filter.py
+#
+# Runs tilt samples through TiltFilter the way the game does, one batch per
+# 60 fps frame, and compares it with the raw mapping: the newest sample
+# through shape_tilt, relative to the first sample as the baseline.
+#
+# The default stream is a synthetic recording with a known true tilt:
+# still, then tilted, then still again, with noise, spikes, slow drift and a
+# bad first reading. Reported per sample rate:
+#   us/frame      - filter time per frame (mean and p99; the budget is
+#                   100 us at p99)
+#   false motion  - share of frames at rest where the knight would move
+#   error         - mean distance between the output and the true vector
+#
+# Run from the repository root:
+#   python benchmarks/bench_tilt_filter.py
+#   python benchmarks/bench_tilt_filter.py --recording session.ikqs
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from serial_protocol import StreamParser
+from serial_replay import read_recording
+from tilt_filter import TiltFilter, shape_tilt
+
+FPS = 60
+
+def true_tilt(t):
+    """(roll, pitch) the controller really has at t seconds, before drift and noise."""
+    if 3.0 <= t < 7.0:
+        ramp = min(1.0, (t - 3.0) / 0.3)
+        return -15.0 * ramp, 10.0 * ramp
+    if 7.0 <= t < 7.3:
+        ramp = 1.0 - (t - 7.0) / 0.3
+        return -15.0 * ramp, 10.0 * ramp
+    return 0.0, 0.0
+
+def synthetic_frames(rate, seconds, rng):
+    """Samples grouped into frames, as (frame_time, samples, true_vector) tuples."""
+    frames = {}
+    for i in range(int(rate * seconds)):
+        t = i / rate
+        roll, pitch = true_tilt(t)
+        drift = 0.2 * t
+        roll += drift + rng.gauss(0.0, 0.8)
+        pitch += drift + rng.gauss(0.0, 0.8)
+        if i == 0 or rng.random() < 0.01:
+            roll += 50.0    # A bad first reading, then the odd spike.
+        frames.setdefault(int(t * FPS), []).append((roll, pitch))
+    result = []
+    for frame, values in sorted(frames.items()):
+        frame_time = (frame + 1) / FPS
+        truth = shape_tilt(*true_tilt(frame_time))
+        result.append((frame_time, [(frame_time, 1, roll, pitch) for roll, pitch in values], truth))
+    return result
+
+def recorded_frames(path):
+    parser = StreamParser()
+    frames = {}
+    for seconds, data in read_recording(path):
+        for sample in parser.feed(data):
+            frames.setdefault(int(seconds * FPS), []).append(sample)
+    return [((frame + 1) / FPS, [((frame + 1) / FPS,) + sample for sample in samples], None)
+            for frame, samples in sorted(frames.items())]
+
+def raw_vectors(frames):
+    baseline = None
+    vectors = []
+    for _, samples, _ in frames:
+        _, _, roll, pitch = samples[-1]
+        if baseline is None:
+            baseline = (samples[0][2], samples[0][3])
+        vectors.append(shape_tilt(roll - baseline[0], pitch - baseline[1]))
+    return vectors
+
+def filtered_vectors(frames, tilt_filter):
+    vectors = []
+    costs = []
+    for _, samples, _ in frames:
+        start = time.perf_counter()
+        vectors.append(tilt_filter.update(samples))
+        costs.append(time.perf_counter() - start)
+    return vectors, sorted(costs)
+
+def quality(frames, vectors):
+    rest = moving = 0
+    false_motion = 0
+    error = 0.0
+    for (frame_time, _, truth), vector in zip(frames, vectors):
+        if truth is None:
+            return float("nan"), float("nan")
+        error += math.hypot(vector[0] - truth[0], vector[1] - truth[1])
+        # Rest frames, leaving the first half second for calibration.
+        if truth == (0, 0) and frame_time > 0.5:
+            rest += 1
+            false_motion += vector != (0, 0)
+    return false_motion / max(rest, 1), error / len(vectors)
+
+def main():
+    parser = argparse.ArgumentParser(description="TiltFilter cost and quality per frame.")
+    parser.add_argument("--rates", type=int, nargs="*", default=[100, 500, 2000], help="samples per second")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--recording", help="use a serial recording instead of the synthetic stream")
+    parser.add_argument("--drift-rate", type=float, default=0.5, help="TiltFilter drift_rate")
+    args = parser.parse_args()
+
+    if args.recording:
+        runs = [(os.path.basename(args.recording), recorded_frames(args.recording))]
+    else:
+        runs = [(f"{rate}/s", synthetic_frames(rate, args.seconds, random.Random(rate))) for rate in args.rates]
+
+    print(f"{'stream':>12} | {'us/frame':>8} {'p99':>7} | {'false motion':>12} {'error':>6} "
+          f"| {'raw false motion':>16} {'error':>6}")
+    for name, frames in runs:
+        vectors, costs = filtered_vectors(frames, TiltFilter(drift_rate=args.drift_rate))
+        mean_us = sum(costs) / len(costs) * 1e6
+        p99_us = costs[min(len(costs) - 1, int(0.99 * len(costs)))] * 1e6
+        false_motion, error = quality(frames, vectors)
+        raw_false_motion, raw_error = quality(frames, raw_vectors(frames))
+        print(f"{name:>12} | {mean_us:>8.1f} {p99_us:>7.1f} | {false_motion:>12.1%} {error:>6.3f} "
+              f"| {raw_false_motion:>16.1%} {raw_error:>6.3f}")
+
+if __name__ == "__main__":
+    main()
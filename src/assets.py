@@ -0,0 +1,127 @@
+# src/assets.py
+
+import json
+import os
+import pygame
+
+ASSET_DIR = "assets"
+CACHE_DIR = ".asset_cache"
+
+# name -> (file in ASSET_DIR, in-game size or None to keep the source size, has alpha)
+#
+# Sprites are baked at the size they are drawn at. Walls are stretched per
+# level, so they are baked at the largest size the built-in levels use.
+ASSET_SPECS = {
+    "background": ("background.png", None, False),
+    "vertical_wall": ("vertical_wall.png", (20, 150), False),
+    "horizontal_wall": ("horizontal_wall.png", (400, 20), False),
+    "door_closed": ("door_closed.png", (50, 80), True),
+    "door_open": ("door_open.png", (50, 80), True),
+    "coin": ("coin.png", (20, 20), True),
+    "spider": ("spider.png", (30, 30), True),
+    "knight": ("knight.png", (50, 50), True),
+}
+
+class AssetManager:
+    """
+    Loads sprites lazily from a cache of pre-scaled raw pixel buffers.
+
+    The first time an asset is requested, its PNG is decoded, scaled to its
+    in-game size and written to cache_dir as raw RGB/RGBA bytes. Later runs
+    read those bytes straight into a Surface, skipping PNG decoding and the
+    full-size image. A cache entry is rebuilt when the source file's mtime or
+    size changes, or when the baked size in ASSET_SPECS changes.
+    """
+    def __init__(self, asset_dir=ASSET_DIR, cache_dir=CACHE_DIR, specs=ASSET_SPECS):
+        self.asset_dir = asset_dir
+        self.cache_dir = cache_dir
+        self.specs = specs
+        self.surfaces = {}
+        self._index = None
+
+    def path(self, name):
+        return os.path.join(self.asset_dir, self.specs[name][0])
+
+    def get(self, name):
+        """Returns the Surface for name, loading it on first use."""
+        surface = self.surfaces.get(name)
+        if surface is None:
+            surface = self._load(name)
+            self.surfaces[name] = surface
+        return surface
+
+    def preload(self, names=None):
+        for name in names or self.specs:
+            self.get(name)
+
+    def _index_path(self):
+        return os.path.join(self.cache_dir, "index.json")
+
+    def _read_index(self):
+        if self._index is None:
+            try:
+                with open(self._index_path()) as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def _write_index(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self._index_path() + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._index, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self._index_path())
+
+    def _load(self, name):
+        filename, size, has_alpha = self.specs[name]
+        source = self.path(name)
+        stat = os.stat(source)
+        key = [stat.st_mtime_ns, stat.st_size, list(size) if size else None]
+        pixel_format = "RGBA" if has_alpha else "RGB"
+
+        entry = self._read_index().get(name)
+        surface = None
+        if entry is not None and entry["key"] == key:
+            surface = self._read_raw(entry, pixel_format)
+        if surface is None:
+            surface = self._bake(name, source, size, pixel_format, key)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha() if has_alpha else surface.convert()
+        return surface
+
+    def _read_raw(self, entry, pixel_format):
+        width, height = entry["size"]
+        try:
+            with open(os.path.join(self.cache_dir, entry["file"]), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) != width * height * len(pixel_format):
+            return None
+        return pygame.image.frombytes(data, (width, height), pixel_format)
+
+    def _bake(self, name, source, size, pixel_format, key):
+        image = pygame.image.load(source)
+        if size is not None:
+            # smoothscale averages the large source pixels down; it only takes 24/32-bit images.
+            scale = pygame.transform.smoothscale if image.get_bitsize() >= 24 else pygame.transform.scale
+            image = scale(image, size)
+        data = pygame.image.tobytes(image, pixel_format)
+        width, height = image.get_size()
+        filename = f"{name}.{width}x{height}.{pixel_format.lower()}"
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = os.path.join(self.cache_dir, filename + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, os.path.join(self.cache_dir, filename))
+        self._read_index()[name] = {"key": key, "file": filename, "size": [width, height]}
+        self._write_index()
+        return pygame.image.frombytes(data, (width, height), pixel_format)
+
+# Shared asset manager for the game.
+assets = AssetManager()
+
+def get_asset(name):
+    """Returns the in-game Surface for name from the shared AssetManager."""
+    return assets.get(name)
@@ -0,0 +1,96 @@
+# src/batch_runner.py
+#
+# Plays many seeded headless episodes per level across all CPU cores and
+# reports how often each level is completed and how long it takes.
+#
+# Example:
+#   python src/batch_runner.py --episodes 2000 --policy greedy
+
+import argparse
+import os
+import statistics
+import time
+from multiprocessing import Pool
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from level_manager import LevelManager
+from sim import GameSim, POLICIES, run_episode
+from world import SIM_DT
+
+def _run_chunk(task):
+    """Worker: plays the episodes for one (level, seeds) chunk."""
+    level_index, seeds, policy_name, max_ticks = task
+    sim = GameSim(level_index, max_ticks=max_ticks)
+    policy = POLICIES[policy_name]()
+    results = []
+    for seed in seeds:
+        results.append(run_episode(sim, policy, seed))
+    return level_index, results
+
+def run_batch(level_indices, episodes, policy_name="greedy", processes=None,
+              max_ticks=None, base_seed=0, chunk_size=50):
+    """
+    Plays episodes seeded runs of every level in level_indices.
+
+    Seeds are base_seed, base_seed + 1, ... so a batch is reproducible.
+    Returns a dict of per-level summaries plus "steps" and "elapsed".
+    """
+    tasks = []
+    for level_index in level_indices:
+        for start in range(0, episodes, chunk_size):
+            seeds = range(base_seed + start, base_seed + min(start + chunk_size, episodes))
+            tasks.append((level_index, list(seeds), policy_name, max_ticks))
+
+    per_level = {level_index: [] for level_index in level_indices}
+    start_time = time.perf_counter()
+    with Pool(processes) as pool:
+        for level_index, results in pool.imap_unordered(_run_chunk, tasks):
+            per_level[level_index].extend(results)
+    elapsed = time.perf_counter() - start_time
+
+    summary = {"levels": {}, "steps": 0, "elapsed": elapsed}
+    for level_index, results in per_level.items():
+        door_times = [ticks * SIM_DT for completed, ticks, _, _ in results if completed]
+        reasons = {}
+        for completed, _, _, reason in results:
+            if not completed:
+                reasons[reason or "max ticks"] = reasons.get(reason or "max ticks", 0) + 1
+        summary["steps"] += sum(ticks for _, ticks, _, _ in results)
+        summary["levels"][level_index] = {
+            "episodes": len(results),
+            "completion_rate": len(door_times) / len(results) if results else 0.0,
+            "mean_time_to_door": statistics.fmean(door_times) if door_times else None,
+            "median_time_to_door": statistics.median(door_times) if door_times else None,
+            "failures": reasons,
+        }
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch-run headless episodes per level.")
+    parser.add_argument("--episodes", type=int, default=1000, help="episodes per level")
+    parser.add_argument("--levels", type=int, nargs="*", help="level indices (default: all)")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="greedy")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--max-ticks", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0, help="first episode seed")
+    args = parser.parse_args()
+
+    levels = args.levels
+    if not levels:
+        levels = list(range(len(LevelManager().levels)))
+    summary = run_batch(levels, args.episodes, args.policy, args.processes, args.max_ticks, args.seed)
+
+    print(f"{'level':>5} {'episodes':>8} {'complete':>9} {'mean door s':>12} {'median door s':>14}  failures")
+    for level_index, stats in summary["levels"].items():
+        mean = stats["mean_time_to_door"]
+        median = stats["median_time_to_door"]
+        print(f"{level_index:>5} {stats['episodes']:>8} {stats['completion_rate']:>8.1%} "
+              f"{mean if mean is not None else float('nan'):>12.2f} "
+              f"{median if median is not None else float('nan'):>14.2f}  {stats['failures']}")
+    steps = summary["steps"]
+    elapsed = summary["elapsed"]
+    print(f"{steps} steps in {elapsed:.2f} s ({steps / elapsed:,.0f} steps/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# src/camera.py
+
+import pygame
+
+class Camera:
+    """
+    A view_width x view_height window onto a level of size bounds.
+
+    rect is the part of the world on screen, in world coordinates: a world
+    point (x, y) is drawn at (x - rect.x, y - rect.y). follow() centers the
+    view on a point but keeps it inside bounds, and centers the whole world
+    on an axis where it is smaller than the view.
+    """
+    def __init__(self, view_width, view_height, bounds):
+        self.rect = pygame.Rect(0, 0, view_width, view_height)
+        self.bounds = pygame.Rect(bounds)
+        self.follow(*self.bounds.center)
+
+    @property
+    def origin(self):
+        """World position of the screen's top-left corner."""
+        return self.rect.topleft
+
+    def follow(self, x, y):
+        rect = self.rect
+        bounds = self.bounds
+        if bounds.width <= rect.width:
+            rect.centerx = bounds.centerx
+        else:
+            rect.x = max(bounds.left, min(int(x) - rect.width // 2, bounds.right - rect.width))
+        if bounds.height <= rect.height:
+            rect.centery = bounds.centery
+        else:
+            rect.y = max(bounds.top, min(int(y) - rect.height // 2, bounds.bottom - rect.height))
+
+    def scrolls(self):
+        """True when the world doesn't fit in the view, so the view moves."""
+        return self.bounds.width > self.rect.width or self.bounds.height > self.rect.height
+
+    def to_screen(self, rect):
+        """rect moved from world to screen coordinates."""
+        return rect.move(-self.rect.x, -self.rect.y)
+
+    def visible(self, rect):
+        return self.rect.colliderect(rect)
@@ -0,0 +1,80 @@
+# src/collision.py
+
+import math
+import pygame
+
+# At most one contact per axis, plus the final free move.
+MAX_SLIDES = 3
+
+def sweep_box(wall_grid, x, y, width, height, dx, dy):
+    """
+    Moves the box (x, y, width, height) by (dx, dy) through the walls in
+    wall_grid and returns its new (x, y).
+
+    The whole path is swept, so a fast box can't tunnel through a thin
+    wall. On contact the box stops exactly against the wall face, and the
+    rest of the move continues along that face (sliding). Walls the box
+    already overlaps at the start are ignored, so it can always move out of
+    them. Positions may be floats; the result never overlaps a wall once
+    truncated to the integer rect pygame uses.
+    """
+    for _ in range(MAX_SLIDES):
+        if not dx and not dy:
+            break
+        # Only walls in the grid cells the sweep passes over can be hit.
+        left = math.floor(min(x, x + dx)) - 1
+        top = math.floor(min(y, y + dy)) - 1
+        bounds = pygame.Rect(left, top,
+                             math.ceil(max(x, x + dx) + width) + 1 - left,
+                             math.ceil(max(y, y + dy) + height) + 1 - top)
+        hit_time = 1.0
+        hit_wall = None
+        hit_x_axis = False
+        for wall in wall_grid.query(bounds):
+            time, x_axis = _entry_time(x, y, width, height, dx, dy, wall)
+            if time is not None and time < hit_time:
+                hit_time, hit_wall, hit_x_axis = time, wall, x_axis
+        if hit_wall is None:
+            return x + dx, y + dy
+        # Move to the contact point, snapping onto the wall face so rounding
+        # can't leave the box overlapping it, then slide with what is left.
+        if hit_x_axis:
+            x = hit_wall.left - width if dx > 0 else hit_wall.right
+            y += dy * hit_time
+            dx, dy = 0, dy * (1.0 - hit_time)
+        else:
+            x += dx * hit_time
+            y = hit_wall.top - height if dy > 0 else hit_wall.bottom
+            dx, dy = dx * (1.0 - hit_time), 0
+    return x, y
+
+def _entry_time(x, y, width, height, dx, dy, wall):
+    """
+    Returns (t, hit on the x axis) for the fraction t in [0, 1) of (dx, dy)
+    at which the box first overlaps wall, or (None, False) if it doesn't
+    during the move or overlaps it already.
+    """
+    if dx > 0:
+        entry_x = (wall.left - (x + width)) / dx
+        exit_x = (wall.right - x) / dx
+    elif dx < 0:
+        entry_x = (wall.right - x) / dx
+        exit_x = (wall.left - (x + width)) / dx
+    elif x < wall.right and x + width > wall.left:
+        entry_x, exit_x = -math.inf, math.inf
+    else:
+        return None, False
+    if dy > 0:
+        entry_y = (wall.top - (y + height)) / dy
+        exit_y = (wall.bottom - y) / dy
+    elif dy < 0:
+        entry_y = (wall.bottom - y) / dy
+        exit_y = (wall.top - (y + height)) / dy
+    elif y < wall.bottom and y + height > wall.top:
+        entry_y, exit_y = -math.inf, math.inf
+    else:
+        return None, False
+    entry = max(entry_x, entry_y)
+    if entry < 0 or entry >= 1 or entry >= min(exit_x, exit_y):
+        return None, False
+    return entry, entry_x >= entry_y
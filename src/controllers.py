@@ -0,0 +1,211 @@
+# src/controllers.py
+#
+# Several tilt controllers on one machine, one per player. ControllerManager
+# serves every port from a single thread: ports are opened non-blocking and
+# registered with a selector, and only those with data waiting are read.
+# Every RESCAN_INTERVAL seconds it looks for devices matching
+# DEVICE_PATTERNS, so controllers can be plugged in while the game runs; a
+# port that fails or disappears is closed and its player slot freed.
+#
+# Each Controller has its own parser ring (a SerialReader the manager feeds
+# instead of a thread of its own) and TiltFilter, so every controller is
+# calibrated on its own, again each time it is plugged in. poll() brings
+# all of them up to date in one call per frame. POSIX only: Windows serial
+# ports can't be used with selectors.
+
+import glob
+import os
+import selectors
+import threading
+import time
+import serial
+from input_handler import BAUD_RATE, SerialReader
+from tilt_filter import TiltFilter
+
+DEVICE_PATTERNS = ("/dev/ttyACM*", "/dev/ttyUSB*")
+MAX_PLAYERS = 4
+
+# Seconds between looks for new or removed devices.
+RESCAN_INTERVAL = 1.0
+# Longest the I/O thread waits for data, so stop() is honoured.
+SELECT_TIMEOUT = 0.1
+# Longest stop() waits for the I/O thread to finish.
+STOP_TIMEOUT = 1.0
+# Bytes taken from a port per read; a 10-byte frame at 1 kHz is 10 kB/s.
+READ_SIZE = 4096
+
+def open_controller(path, baud=BAUD_RATE):
+    """Opens a controller's port for non-blocking reads."""
+    return serial.Serial(path, baud, timeout=0)
+
+class Controller:
+    """
+    One connected tilt controller, played as player (0-based). direction,
+    pressed and arrival (time of the newest sample used) are brought up to
+    date by ControllerManager.poll().
+    """
+    def __init__(self, path, port, player, tilt_filter=None):
+        self.path = path
+        self.port = port
+        self.player = player
+        self.reader = SerialReader(port)
+        self.filter = tilt_filter or TiltFilter()
+        self.seen = 0
+        self.direction = (0, 0)
+        self.pressed = False
+        self.arrival = None
+
+    def update(self):
+        """Runs the samples that arrived since the last update through the filter."""
+        reader = self.reader
+        if reader.count == self.seen:
+            return
+        samples, self.seen = reader.read_new(self.seen)
+        self.arrival, button_state, _, _ = samples[-1]
+        self.direction = self.filter.update(samples)
+        # The firmware reads the button with a pull-up: 0 means pressed.
+        self.pressed = button_state == 0
+
+    def stats(self):
+        return self.reader.stats()
+
+class ControllerManager:
+    """
+    Up to max_players controllers among the devices matching patterns.
+
+    A new controller takes the player slot it had before it was unplugged,
+    if that is still free, or else the lowest free one. opener opens a
+    device path and returns a port with fileno() and close(). connected is
+    the tuple of controllers ordered by player, replaced as a whole by the
+    I/O thread, so it can be read from any thread without locking.
+
+    start() opens a fresh selector for the I/O thread, which closes it and
+    every port on its way out, so a stopped manager can be started again.
+    """
+    def __init__(self, patterns=DEVICE_PATTERNS, max_players=MAX_PLAYERS, opener=open_controller,
+                 rescan_interval=RESCAN_INTERVAL):
+        self.patterns = patterns
+        self.max_players = max_players
+        self.opener = opener
+        self.rescan_interval = rescan_interval
+        self.selector = None
+        self.controllers = {}       # path -> Controller, I/O thread only.
+        self.last_player = {}       # path -> player slot it had last.
+        self.failed = set()         # Paths that failed to open, reported once.
+        self.connected = ()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            if self._running:
+                return
+            # A stop() that timed out: the thread is on its way out.
+            self._thread.join()
+        self.selector = selectors.DefaultSelector()
+        self.failed.clear()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="controllers", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the I/O thread and waits up to STOP_TIMEOUT for it to close the ports."""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=STOP_TIMEOUT)
+            if not self._thread.is_alive():
+                self._thread = None
+
+    def poll(self):
+        """
+        Brings every connected controller up to date and returns them,
+        ordered by player. Never blocks; call it once per frame.
+        """
+        connected = self.connected
+        for controller in connected:
+            controller.update()
+        return connected
+
+    def _run(self):
+        next_scan = 0.0
+        try:
+            while self._running:
+                now = time.perf_counter()
+                if now >= next_scan:
+                    self.rescan()
+                    next_scan = now + self.rescan_interval
+                if not self.controllers:
+                    time.sleep(SELECT_TIMEOUT)
+                    continue
+                for key, _ in self.selector.select(SELECT_TIMEOUT):
+                    controller = key.data
+                    try:
+                        data = os.read(key.fd, READ_SIZE)
+                    except OSError:
+                        data = b""
+                    if data:
+                        controller.reader.feed(data)
+                    else:
+                        # Readable with nothing to read: the device went away.
+                        self._remove(controller)
+                        self._publish()
+        finally:
+            # Only this thread uses the selector, so it is closed here, after
+            # the last select() has returned.
+            for controller in list(self.controllers.values()):
+                self._remove(controller)
+            self._publish()
+            self.selector.close()
+
+    def rescan(self):
+        """
+        Opens newly plugged-in controllers and drops the ones that were
+        unplugged. Runs on the I/O thread.
+        """
+        present = set()
+        for pattern in self.patterns:
+            present.update(glob.glob(pattern))
+        for controller in list(self.controllers.values()):
+            if controller.path not in present:
+                self._remove(controller)
+        for path in sorted(present - set(self.controllers)):
+            player = self._free_player(path)
+            if player is None:
+                break
+            try:
+                port = self.opener(path)
+            except (OSError, serial.SerialException) as e:
+                if path not in self.failed:
+                    print(f"Error opening controller {path}:", e)
+                    self.failed.add(path)
+                continue
+            self.failed.discard(path)
+            controller = Controller(path, port, player)
+            self.controllers[path] = controller
+            self.last_player[path] = player
+            self.selector.register(port.fileno(), selectors.EVENT_READ, controller)
+        self._publish()
+
+    def _free_player(self, path):
+        taken = {controller.player for controller in self.controllers.values()}
+        player = self.last_player.get(path)
+        if player is not None and player not in taken:
+            return player
+        for player in range(self.max_players):
+            if player not in taken:
+                return player
+        return None
+
+    def _remove(self, controller):
+        del self.controllers[controller.path]
+        try:
+            self.selector.unregister(controller.port.fileno())
+        except (KeyError, ValueError, OSError):
+            pass
+        try:
+            controller.port.close()
+        except (OSError, serial.SerialException):
+            pass
+
+    def _publish(self):
+        self.connected = tuple(sorted(self.controllers.values(), key=lambda controller: controller.player))
@@ -0,0 +1,332 @@
+# src/input_backends.py
+#
+# Player input from any mix of sources, picked at runtime by a spec string
+# such as "keyboard,gamepad,serial" or "replay:session.ikqs". Each entry is
+# a BACKENDS name, optionally followed by ":" and one argument:
+#   keyboard           arrow keys, space as the button
+#   gamepad[:index]    first (or index-th) joystick, left stick or d-pad
+#   serial[:port]      tilt controller, opened in the background
+#   replay[:path]      tilt controller recording (see serial_replay.py)
+#   controllers[:glob] every tilt controller plugged in (see controllers.py)
+#   scripted:path      JSON list of [seconds, dx, dy] moves
+
+import collections
+import json
+import math
+import time
+import pygame
+from controllers import DEVICE_PATTERNS, ControllerManager
+from input_handler import SERIAL_PORT, REPLAY_PATH, SerialReader, open_serial_port
+from serial_replay import ReplayPort, read_recording
+from tilt_filter import TiltFilter
+
+# Event kinds. Move values are (dx, dy) vectors, button values are True
+# for a press and False for a release.
+MOVE = "move"
+BUTTON = "button"
+
+# Oldest events are dropped past this many, if nobody polls.
+EVENT_QUEUE_SIZE = 256
+
+# A tilt controller whose newest sample is older than this (seconds) is
+# treated as gone: its move drops back to (0, 0) until samples resume.
+SAMPLE_TIMEOUT = 0.25
+
+class InputBackend:
+    """
+    One source of input.
+
+    open() returns at once; anything slow, like opening a port, happens on
+    a background thread. pump() runs on the main thread once per frame and
+    pushes new events into the manager. It only looks at state that is
+    already in memory, so it never blocks.
+    """
+    name = "input"
+
+    def __init__(self, arg=None):
+        self.manager = None
+
+    def open(self, manager):
+        self.manager = manager
+
+    def pump(self, now):
+        pass
+
+    def close(self):
+        pass
+
+    def push(self, kind, value, timestamp=None):
+        self.manager.push(self.name, kind, value, timestamp)
+
+class KeyboardBackend(InputBackend):
+    name = "keyboard"
+
+    def __init__(self, arg=None):
+        super().__init__()
+        self.vector = (0, 0)
+        self.pressed = False
+
+    def pump(self, now):
+        keys = pygame.key.get_pressed()
+        dx = (1 if keys[pygame.K_RIGHT] else 0) - (1 if keys[pygame.K_LEFT] else 0)
+        dy = (1 if keys[pygame.K_DOWN] else 0) - (1 if keys[pygame.K_UP] else 0)
+        if (dx, dy) != self.vector:
+            self.vector = (dx, dy)
+            self.push(MOVE, self.vector, now)
+        pressed = bool(keys[pygame.K_SPACE])
+        if pressed != self.pressed:
+            self.pressed = pressed
+            self.push(BUTTON, pressed, now)
+
+class GamepadBackend(InputBackend):
+    """Left stick (or the d-pad) and button 0 of a joystick, picked up whenever one is plugged in."""
+    name = "gamepad"
+    DEADZONE = 0.2
+
+    def __init__(self, arg=None):
+        super().__init__()
+        self.index = int(arg) if arg else 0
+        self.joystick = None
+        self.vector = (0, 0)
+        self.pressed = False
+
+    def pump(self, now):
+        if not pygame.joystick.get_init():
+            return
+        if pygame.joystick.get_count() <= self.index:
+            if self.joystick is not None:
+                self.joystick = None
+                self._set(0, 0, False, now)
+            return
+        if self.joystick is None:
+            self.joystick = pygame.joystick.Joystick(self.index)
+        joystick = self.joystick
+        dx = joystick.get_axis(0) if joystick.get_numaxes() > 1 else 0.0
+        dy = joystick.get_axis(1) if joystick.get_numaxes() > 1 else 0.0
+        magnitude = math.hypot(dx, dy)
+        if magnitude < self.DEADZONE:
+            dx, dy = 0, 0
+            if joystick.get_numhats():
+                dx, hat_y = joystick.get_hat(0)
+                dy = -hat_y
+        elif magnitude > 1.0:
+            dx, dy = dx / magnitude, dy / magnitude
+        pressed = joystick.get_numbuttons() > 0 and joystick.get_button(0)
+        self._set(dx, dy, bool(pressed), now)
+
+    def _set(self, dx, dy, pressed, now):
+        if (dx, dy) != self.vector:
+            self.vector = (dx, dy)
+            self.push(MOVE, self.vector, now)
+        if pressed != self.pressed:
+            self.pressed = pressed
+            self.push(BUTTON, pressed, now)
+
+class SerialTiltBackend(InputBackend):
+    """
+    The tilt controller. The port is opened on the SerialReader's thread.
+    Each frame, the samples that arrived since the last one go through a
+    TiltFilter, and the result becomes a move event stamped with the newest
+    sample's arrival time. If the reader stops (a port error or an unplugged
+    board) or no sample arrives for SAMPLE_TIMEOUT, the move drops back to
+    (0, 0) and the button is released.
+    """
+    name = "serial"
+
+    def __init__(self, arg=None, tilt_filter=None):
+        super().__init__()
+        self.port_name = arg or SERIAL_PORT
+        self.filter = tilt_filter or TiltFilter()
+        self.reader = None
+        self.seen = 0
+        self.pressed = False
+        self.arrival = None     # Arrival time of the newest sample used, None while stalled.
+
+    def open_port(self):
+        return open_serial_port(self.port_name)
+
+    def open(self, manager):
+        super().open(manager)
+        self.reader = SerialReader(opener=self.open_port)
+        self.reader.start()
+
+    def pump(self, now):
+        reader = self.reader
+        if reader.count == self.seen:
+            if self.arrival is not None and (not reader.running or now - self.arrival > SAMPLE_TIMEOUT):
+                self.arrival = None
+                self.push(MOVE, (0, 0), now)
+                if self.pressed:
+                    self.pressed = False
+                    self.push(BUTTON, False, now)
+            return
+        samples, self.seen = reader.read_new(self.seen)
+        arrival, button_state, _, _ = samples[-1]
+        self.arrival = arrival
+        self.push(MOVE, self.filter.update(samples), arrival)
+        # The firmware reads the button with a pull-up: 0 means pressed.
+        pressed = button_state == 0
+        if pressed != self.pressed:
+            self.pressed = pressed
+            self.push(BUTTON, pressed, arrival)
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.stop()
+            if self.reader.port is not None:
+                self.reader.port.close()
+
+class ReplayBackend(SerialTiltBackend):
+    """The tilt controller played back from a recording, looped."""
+    name = "replay"
+
+    def __init__(self, arg=None, speed=1.0, tilt_filter=None):
+        super().__init__(tilt_filter=tilt_filter)
+        self.path = arg or REPLAY_PATH
+        if not self.path:
+            raise ValueError("replay input needs a recording: use replay:<path> or set SERIAL_REPLAY")
+        self.speed = speed
+
+    def open_port(self):
+        return ReplayPort(read_recording(self.path), self.speed, loop=True)
+
+class ControllersBackend(InputBackend):
+    """
+    Every tilt controller a ControllerManager finds, or those matching the
+    glob in arg. Each is its own source, "controllers<player>", so they all
+    steer the knight and any of their buttons restarts; an unplugged
+    controller's move drops back to (0, 0).
+    """
+    name = "controllers"
+
+    def __init__(self, arg=None):
+        super().__init__()
+        self.controllers = ControllerManager((arg,) if arg else DEVICE_PATTERNS)
+        self.arrivals = {}      # source -> arrival time of the last move pushed
+        self.pressed = {}
+
+    def open(self, manager):
+        super().open(manager)
+        self.controllers.start()
+
+    def pump(self, now):
+        sources = set()
+        for controller in self.controllers.poll():
+            source = f"{self.name}{controller.player}"
+            sources.add(source)
+            arrival = controller.arrival
+            if arrival is None or arrival == self.arrivals.get(source):
+                continue
+            self.arrivals[source] = arrival
+            self.manager.push(source, MOVE, controller.direction, arrival)
+            if controller.pressed != self.pressed.get(source, False):
+                self.pressed[source] = controller.pressed
+                self.manager.push(source, BUTTON, controller.pressed, arrival)
+        for source in set(self.arrivals) - sources:
+            del self.arrivals[source]
+            self.pressed.pop(source, None)
+            self.manager.push(source, MOVE, (0, 0), now)
+
+    def close(self):
+        self.controllers.stop()
+
+class ScriptedBackend(InputBackend):
+    """
+    Plays a fixed list of (seconds, dx, dy) moves, timed from open(), for
+    demos and repeatable runs. arg is a JSON file holding such a list, or
+    the list itself.
+    """
+    name = "scripted"
+
+    def __init__(self, arg=None):
+        super().__init__()
+        if isinstance(arg, str):
+            with open(arg) as f:
+                arg = json.load(f)
+        self.script = sorted((float(t), (dx, dy)) for t, dx, dy in (arg or []))
+        self.next_move = 0
+        self.start = None
+
+    def open(self, manager):
+        super().open(manager)
+        self.start = time.perf_counter()
+
+    def pump(self, now):
+        script = self.script
+        while self.next_move < len(script) and self.start + script[self.next_move][0] <= now:
+            seconds, vector = script[self.next_move]
+            self.push(MOVE, vector, self.start + seconds)
+            self.next_move += 1
+
+BACKENDS = {
+    "keyboard": KeyboardBackend,
+    "gamepad": GamepadBackend,
+    "serial": SerialTiltBackend,
+    "replay": ReplayBackend,
+    "controllers": ControllersBackend,
+    "scripted": ScriptedBackend,
+}
+
+def create_backends(spec):
+    """Builds the backends named in a comma-separated spec string."""
+    backends = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, arg = entry.partition(":")
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown input backend {name!r}; choose from {', '.join(BACKENDS)}")
+        backends.append(BACKENDS[name](arg or None))
+    return backends
+
+class InputManager:
+    """
+    Merges the events of several backends into one timestamped queue.
+
+    Events are (timestamp, source, kind, value) tuples. poll() pumps every
+    backend and drains the queue once per frame; after that, direction and
+    take_press() are plain attribute reads. When several sources are
+    active their moves add up, clamped to -1..1 per axis.
+    """
+    def __init__(self, backends):
+        self.backends = list(backends)
+        self.events = collections.deque(maxlen=EVENT_QUEUE_SIZE)
+        self.moves = {}         # source -> (timestamp, vector)
+        self.direction = (0, 0)
+        self.presses = 0
+        for backend in self.backends:
+            backend.open(self)
+
+    def push(self, source, kind, value, timestamp=None):
+        self.events.append((time.perf_counter() if timestamp is None else timestamp, source, kind, value))
+
+    def poll(self):
+        """Pumps the backends and applies their events. Returns the events, oldest first."""
+        now = time.perf_counter()
+        for backend in self.backends:
+            backend.pump(now)
+        events = sorted(self.events, key=lambda event: event[0])
+        self.events.clear()
+        for timestamp, source, kind, value in events:
+            if kind == MOVE:
+                self.moves[source] = (timestamp, value)
+            elif kind == BUTTON and value:
+                self.presses += 1
+        if events:
+            dx = dy = 0
+            for _, (move_x, move_y) in self.moves.values():
+                dx += move_x
+                dy += move_y
+            self.direction = (max(-1, min(dx, 1)), max(-1, min(dy, 1)))
+        return events
+
+    def take_press(self):
+        """True if a button was pressed since the last call."""
+        pressed = self.presses > 0
+        self.presses = 0
+        return pressed
+
+    def close(self):
+        for backend in self.backends:
+            backend.close()
@@ -1,100 +1,234 @@
 import serial
+import threading
 import time
-import math
+import os
+from serial_protocol import StreamParser
+from serial_replay import ReplayPort, RecordingPort, read_recording
+from tilt_filter import TiltFilter
 
-# Set up the serial connection.
 # Update 'COM5' to your actual serial port (e.g., '/dev/ttyACM0' on Linux/Mac)
-try:
-    ser = serial.Serial('COM5', 115200, timeout=0.1)
-    time.sleep(2)  # Allow time for the connection to establish.
-except Exception as e:
-    print("Error opening serial port:", e)
-    ser = None
-
-# Global variables for baseline calibration.
-baseline_set = False
-baseline_roll = 0.0
-baseline_pitch = 0.0
-
-def clamp(val, min_val, max_val):
-    """Clamp val to the range [min_val, max_val]."""
-    return max(min(val, max_val), min_val)
+SERIAL_PORT = 'COM5'
+BAUD_RATE = 115200
+# The board resets when the port is opened; give it this long to come up.
+SETTLE_TIME = 2.0
+
+# Set SERIAL_REPLAY to a recording file to play it back (looped) instead of
+# opening the port, or SERIAL_RECORD to a file name to record the port.
+REPLAY_PATH = os.environ.get("SERIAL_REPLAY")
+RECORD_PATH = os.environ.get("SERIAL_RECORD")
+
+def open_serial_port(name=SERIAL_PORT, baud=BAUD_RATE):
+    """
+    Opens the controller's port, or the SERIAL_REPLAY recording, and waits
+    for the board to settle. Blocks, so SerialReader calls it on its thread.
+    """
+    if REPLAY_PATH:
+        return ReplayPort(read_recording(REPLAY_PATH), loop=True)
+    port = serial.Serial(name, baud, timeout=0.1)
+    time.sleep(SETTLE_TIME)
+    if RECORD_PATH:
+        port = RecordingPort(port, RECORD_PATH)
+    return port
+
+# Number of parsed samples kept by the background reader.
+RING_SIZE = 64
+
+class SerialReader:
+    """
+    Drains a serial port on a background thread so the game never reacts to
+    stale tilt data.
+
+    Pass either an open port or an opener, a function that opens one. The
+    opener runs on the reader's thread, so start() never blocks on a slow or
+    missing port; error holds the exception if opening failed.
+
+    The port is read in bulk and decoded by a StreamParser, which accepts
+    both the text lines of the original firmware and the binary frames.
+    Parsed samples go into a fixed-size ring buffer of
+    (arrival_time, button_state, roll, pitch) tuples. The newest sample and the
+    average of the last few samples can be read at any time without blocking.
+
+    Counters:
+      lines     - samples successfully parsed (text lines or binary frames)
+      malformed - lines that could not be decoded or parsed, and bad frames
+      lost      - binary frames missing from the sequence numbers
+      dropped   - samples that were superseded before the game read them
+    """
+    def __init__(self, port=None, size=RING_SIZE, opener=None):
+        self.port = port
+        self.opener = opener
+        self.error = None
+        self.size = size
+        self.buffer = [None] * size
+        self.count = 0          # Total samples ever written (next write index = count % size).
+        self.last_read = 0      # Value of count the last time latest() was called.
+        self.parser = StreamParser()
+        self.lines = 0
+        self.dropped = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="serial-reader", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    @property
+    def connected(self):
+        return self.port is not None
+
+    @property
+    def running(self):
+        """False once the reader has stopped, or gave up after a port error."""
+        return self._running
+
+    def _run(self):
+        if self.port is None:
+            try:
+                self.port = self.opener()
+            except Exception as e:
+                print("Error opening serial port:", e)
+                self.error = e
+                self._running = False
+                return
+        while self._running:
+            try:
+                # Take everything that is waiting in one read. With nothing
+                # waiting, read(1) blocks for at most the port timeout, so
+                # stop() is honoured.
+                raw = self.port.read(self.port.in_waiting or 1)
+            except Exception as e:
+                print("Error reading serial input:", e)
+                self._running = False
+                break
+            if raw:
+                self.feed(raw)
+
+    def feed(self, raw):
+        """Parses a chunk of raw bytes and stores its samples in the ring buffer."""
+        samples = self.parser.feed(raw)
+        if not samples:
+            return
+        now = time.perf_counter()
+        for sample in samples:
+            # The tuple is built before it is published, and a single list store
+            # is atomic, so the reader never sees a half-written sample.
+            self.buffer[self.count % self.size] = (now,) + sample
+            self.count += 1
+        self.lines += len(samples)
+
+    @property
+    def malformed(self):
+        return self.parser.malformed
+
+    @property
+    def lost(self):
+        return self.parser.lost
+
+    def latest(self):
+        """Returns the newest sample, or None if nothing has arrived yet."""
+        count = self.count
+        if count == 0:
+            return None
+        if count > self.last_read + 1:
+            self.dropped += count - self.last_read - 1
+        self.last_read = count
+        return self.buffer[(count - 1) % self.size]
+
+    def read_new(self, since):
+        """
+        Returns (samples, count): the samples written after the first since,
+        oldest first, and the count to pass next time. Samples the ring
+        already overwrote are counted as dropped.
+        """
+        count = self.count
+        start = max(since, count - self.size)
+        self.dropped += start - since
+        self.last_read = count
+        buffer = self.buffer
+        size = self.size
+        return [buffer[i % size] for i in range(start, count)], count
+
+    def average(self, n):
+        """Returns the newest sample with roll/pitch averaged over the last n samples."""
+        newest = self.latest()
+        if newest is None or n <= 1:
+            return newest
+        count = self.last_read
+        n = min(n, count, self.size)
+        roll_sum = 0.0
+        pitch_sum = 0.0
+        for i in range(count - n, count):
+            sample = self.buffer[i % self.size]
+            roll_sum += sample[2]
+            pitch_sum += sample[3]
+        return (newest[0], newest[1], roll_sum / n, pitch_sum / n)
+
+    def sample_age(self):
+        """Seconds since the newest sample arrived, or None if nothing has arrived yet."""
+        count = self.count
+        if count == 0:
+            return None
+        return time.perf_counter() - self.buffer[(count - 1) % self.size][0]
+
+    def stats(self):
+        return {
+            "lines": self.lines,
+            "malformed": self.malformed,
+            "lost": self.lost,
+            "dropped": self.dropped,
+            "protocol": self.parser.protocol,
+            "sample_age": self.sample_age(),
+        }
+
+# The shared reader behind get_input(), started on first use.
+reader = None
+
+def get_reader():
+    """Returns the shared SerialReader, starting it (and opening the port in the background) if needed."""
+    global reader
+    if reader is None:
+        reader = SerialReader(opener=open_serial_port)
+        reader.start()
+    return reader
+
+# Filter between the shared reader and get_input(), and how far it has read.
+tilt_filter = TiltFilter()
+_filtered_count = 0
 
 def get_input():
     """
-    Reads serial input from the Arduino and returns a tuple (dx, dy) representing
-    the omnidirectional movement based on the sensor's tilt.
-    
-    Expected serial format:
+    Returns a tuple (dx, dy) representing the omnidirectional movement based on
+    the sensor's tilt.
+
+    Expected serial format (see serial_protocol.py for the binary frames):
       "button_state,roll_angle,pitch_angle,direction"
     For example: "1,1.10,0.24,STRAIGHT"
-    
+
     We ignore the button state and textual direction. Instead, we use the roll and pitch
     angles (in degrees) to compute a movement vector.
-    
-    The first valid reading is used as the baseline (zero) value.
-    A deadzone is applied so that small deviations around the zero don't produce movement.
-    A tilt beyond the deadzone is scaled so that a tilt of max_angle (e.g. 30°) yields full movement (magnitude 1).
-    
+
+    The serial port is opened and drained by a background SerialReader, so this
+    never blocks; it returns (0, 0) until the port is up and the TiltFilter has
+    calibrated. Every sample since the last call goes through the filter.
+
     Returns:
       (dx, dy) where dx and dy are floats between -1 and 1.
     """
-    global baseline_set, baseline_roll, baseline_pitch
-    
-    if ser and ser.in_waiting > 0:
-        try:
-            # Read one line from the serial port and decode it.
-            line = ser.readline().decode('utf-8').strip()
-            if line:
-                parts = line.split(',')
-                if len(parts) >= 3:
-                    try:
-                        # Parse the roll and pitch values from the serial output.
-                        raw_roll = float(parts[1])
-                        raw_pitch = float(parts[2])
-                    except ValueError:
-                        return (0, 0)
-                    
-                    # Set baseline from the first valid reading.
-                    if not baseline_set:
-                        baseline_roll = raw_roll
-                        baseline_pitch = raw_pitch
-                        baseline_set = True
-                        
-                    # Compute deltas relative to the baseline.
-                    delta_roll = raw_roll - baseline_roll
-                    delta_pitch = raw_pitch - baseline_pitch
-                    
-                    # Apply a deadzone (in degrees) to filter out minor noise.
-                    deadzone = 2.0
-                    magnitude = math.sqrt(delta_roll**2 + delta_pitch**2)
-                    if magnitude < deadzone:
-                        return (0, 0)
-                    
-                    # Define the maximum tilt (in degrees) corresponding to full movement.
-                    max_angle = 30.0
-                    # Scale the effective magnitude between 0 and 1.
-                    effective_magnitude = (magnitude - deadzone) / (max_angle - deadzone)
-                    effective_magnitude = clamp(effective_magnitude, 0, 1)
-                    
-                    # Determine the movement direction.
-                    # According to our convention:
-                    #   - For horizontal: positive delta_roll means sensor tilted left -> move left (dx negative).
-                    #   - For vertical: positive delta_pitch means sensor tilted forward -> move down (dy positive).
-                    # Compute the unit vector from the delta.
-                    dx = -delta_roll  # Invert so that left tilt gives negative dx.
-                    dy = delta_pitch
-                    norm = math.sqrt(dx**2 + dy**2)
-                    if norm == 0:
-                        return (0, 0)
-                    dx /= norm
-                    dy /= norm
-                    
-                    # Multiply by the effective magnitude to get the final movement vector.
-                    dx *= effective_magnitude
-                    dy *= effective_magnitude
-                    
-                    return (dx, dy)
-        except Exception as e:
-            print("Error reading serial input:", e)
-    return (0, 0)
\ No newline at end of file
+    global _filtered_count
+    samples, _filtered_count = get_reader().read_new(_filtered_count)
+    return tilt_filter.update(samples)
+
+def get_stats():
+    """Returns the reader's counters, the detected protocol and the newest sample's age."""
+    if reader is None:
+        return None
+    return reader.stats()
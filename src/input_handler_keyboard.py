@@ -1,17 +0,0 @@
-# src/input_handler_keyboard.py
-import pygame
-
-def get_input():
-    keys = pygame.key.get_pressed()
-    dx, dy = 0, 0
-
-    if keys[pygame.K_UP]:
-        dy = -1
-    if keys[pygame.K_DOWN]:
-        dy = 1
-    if keys[pygame.K_LEFT]:
-        dx = -1
-    if keys[pygame.K_RIGHT]:
-        dx = 1
-
-    return (dx, dy)
\ No newline at end of file
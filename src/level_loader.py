@@ -0,0 +1,196 @@
+# src/level_loader.py
+#
+# Levels are JSON files with:
+#   "name": str (optional)
+#   "player_start": [x, y]
+#   "coins": list of [x, y]
+#   "door": [x, y]
+#   "time_limit": seconds
+#   "walls": list of [x, y, width, height]
+#   "spider_count": int (optional, default 3)
+#   "chasers": int (optional, default 0), how many of the spiders hunt the knight
+#   "world_size": [width, height] (optional, default the screen size); larger
+#                 levels scroll with the knight
+#
+# Coordinates are world coordinates: the play area is the world minus a
+# MAIN_MARGIN border, and a one-screen level's world is the screen.
+#
+# Each file is compiled once into a small binary in the cache directory that
+# already holds everything level setup needs: wall rects with their spatial
+# grid cells, coin positions checked against the walls and the spawn safe
+# zone. Loading a compiled level is a single read. Compiling rejects levels
+# where the knight can't reach every coin and the door.
+
+import array
+import json
+import os
+import random
+import struct
+import zlib
+import pygame
+from navigation import unreachable
+from objects import Door, create_coins_in_area
+from spatial import build_grid
+from utils import SCREEN_WIDTH, SCREEN_HEIGHT, play_area
+
+LEVEL_CACHE_DIR = ".level_cache"
+
+MAGIC = b"IKQL"
+# Bump when the compiled layout or the compile rules change.
+FORMAT_VERSION = 4
+
+# Grid cell size for the wall index, and the spawn safe zone around the
+# 50x50 knight where no spiders are placed, and the knight's hitbox, as in
+# Player.
+CELL_SIZE = 64
+PLAYER_DRAW_SIZE = (50, 50)
+PLAYER_HITBOX_SIZE = (PLAYER_DRAW_SIZE[0] // 2, PLAYER_DRAW_SIZE[1])
+SAFE_MARGIN = 100
+
+# magic, version, source mtime_ns, source size, world size, play area, cell size
+_HEADER = struct.Struct("<4sHqq2i4iH")
+# player start, door, time limit, spider count, chasers, safe rect
+_FIELDS = struct.Struct("<2i2ifHH4i")
+_COUNT = struct.Struct("<I")
+
+def read_level_file(path):
+    with open(path) as f:
+        data = json.load(f)
+    for key in ("player_start", "coins", "door", "time_limit", "walls"):
+        if key not in data:
+            raise ValueError(f"{path}: missing \"{key}\"")
+    world_size = data.get("world_size", (SCREEN_WIDTH, SCREEN_HEIGHT))
+    area = play_area(*world_size)
+    if area.width <= 0 or area.height <= 0:
+        raise ValueError(f"{path}: \"world_size\" {world_size} leaves no play area")
+    return data
+
+def compile_level(data, seed=0):
+    """
+    Turns a level dict as read from JSON into its compiled form.
+
+    Coins that overlap a wall are moved once here, with a fixed seed, instead
+    of on every level load. Raises ValueError if the knight can't reach a
+    coin or the door from the start.
+    """
+    world_size = tuple(data.get("world_size", (SCREEN_WIDTH, SCREEN_HEIGHT)))
+    area = play_area(*world_size)
+    walls = [pygame.Rect(wall) for wall in data["walls"]]
+    wall_grid = build_grid(area, walls, CELL_SIZE)
+    coins = create_coins_in_area(data["coins"], wall_grid, rng=random.Random(seed), area=area)
+    start_x, start_y = data["player_start"]
+    problems = unreachable(walls, (start_x, start_y), PLAYER_DRAW_SIZE, PLAYER_HITBOX_SIZE,
+                           pygame.Rect(data["door"], (Door.WIDTH, Door.HEIGHT)),
+                           [coin.rect for coin in coins], area=area)
+    if problems:
+        raise ValueError(f"{data.get('name') or 'level'}: can't reach " + ", ".join(problems))
+    safe_rect = (start_x - SAFE_MARGIN, start_y - SAFE_MARGIN,
+                 PLAYER_DRAW_SIZE[0] + 2 * SAFE_MARGIN, PLAYER_DRAW_SIZE[1] + 2 * SAFE_MARGIN)
+    return {
+        "name": data.get("name", ""),
+        "world_size": world_size,
+        "player_start": (start_x, start_y),
+        "door": tuple(data["door"]),
+        "time_limit": data["time_limit"],
+        "spider_count": data.get("spider_count", 3),
+        "chasers": data.get("chasers", 0),
+        "walls": [tuple(wall) for wall in walls],
+        "wall_spans": [wall_grid.spans[wall_grid.slots[id(wall)]] for wall in walls],
+        "cell_size": CELL_SIZE,
+        "coins": [(coin.x, coin.y) for coin in coins],
+        "safe_rect": safe_rect,
+    }
+
+def _source_key(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+def write_compiled(cache_path, level, source_key):
+    name = level["name"].encode("utf-8")
+    area = play_area(*level["world_size"])
+    parts = [
+        _HEADER.pack(MAGIC, FORMAT_VERSION, source_key[0], source_key[1], *level["world_size"],
+                     area.x, area.y, area.width, area.height, level["cell_size"]),
+        _FIELDS.pack(*level["player_start"], *level["door"], level["time_limit"],
+                     level["spider_count"], level["chasers"], *level["safe_rect"]),
+        _COUNT.pack(len(name)), name,
+    ]
+    walls = array.array("i")
+    for wall, span in zip(level["walls"], level["wall_spans"]):
+        walls.extend(wall)
+        walls.extend(span)
+    coins = array.array("i")
+    for coin in level["coins"]:
+        coins.extend(coin)
+    parts += [_COUNT.pack(len(level["walls"])), walls.tobytes(),
+              _COUNT.pack(len(level["coins"])), coins.tobytes()]
+    os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"".join(parts))
+    os.replace(tmp_path, cache_path)
+
+def read_compiled(cache_path, source_key=None):
+    """
+    Reads a compiled level, or returns None if it is missing, stale or was
+    compiled for a different format, play area or cell size.
+    """
+    try:
+        with open(cache_path, "rb") as f:
+            blob = f.read()
+    except OSError:
+        return None
+    if len(blob) < _HEADER.size:
+        return None
+    magic, version, mtime_ns, size, ww, wh, ax, ay, aw, ah, cell_size = _HEADER.unpack_from(blob, 0)
+    if (magic != MAGIC or version != FORMAT_VERSION or cell_size != CELL_SIZE
+            or (ax, ay, aw, ah) != tuple(play_area(ww, wh))):
+        return None
+    if source_key is not None and (mtime_ns, size) != tuple(source_key):
+        return None
+    try:
+        offset = _HEADER.size
+        fields = _FIELDS.unpack_from(blob, offset)
+        offset += _FIELDS.size
+        (name_len,) = _COUNT.unpack_from(blob, offset)
+        offset += _COUNT.size
+        name = blob[offset:offset + name_len].decode("utf-8")
+        offset += name_len
+        (wall_count,) = _COUNT.unpack_from(blob, offset)
+        offset += _COUNT.size
+        walls = array.array("i")
+        walls.frombytes(blob[offset:offset + wall_count * 8 * walls.itemsize])
+        offset += wall_count * 8 * walls.itemsize
+        (coin_count,) = _COUNT.unpack_from(blob, offset)
+        offset += _COUNT.size
+        coins = array.array("i")
+        coins.frombytes(blob[offset:offset + coin_count * 2 * coins.itemsize])
+    except (struct.error, ValueError, UnicodeDecodeError):
+        return None
+    if len(walls) != wall_count * 8 or len(coins) != coin_count * 2:
+        return None
+    return {
+        "name": name,
+        "world_size": (ww, wh),
+        "player_start": (fields[0], fields[1]),
+        "door": (fields[2], fields[3]),
+        "time_limit": fields[4],
+        "spider_count": fields[5],
+        "chasers": fields[6],
+        "safe_rect": tuple(fields[7:11]),
+        "walls": [tuple(walls[i:i + 4]) for i in range(0, len(walls), 8)],
+        "wall_spans": [tuple(walls[i + 4:i + 8]) for i in range(0, len(walls), 8)],
+        "cell_size": cell_size,
+        "coins": [(coins[i], coins[i + 1]) for i in range(0, len(coins), 2)],
+    }
+
+def load_level(path, cache_dir=LEVEL_CACHE_DIR):
+    """Returns the compiled level for a JSON file, compiling and caching it if needed."""
+    source_key = _source_key(path)
+    cache_path = os.path.join(cache_dir, os.path.splitext(os.path.basename(path))[0] + ".bin")
+    level = read_compiled(cache_path, source_key)
+    if level is None:
+        # Seed coin placement from the file name so a level compiles the same everywhere.
+        level = compile_level(read_level_file(path), seed=zlib.crc32(os.path.basename(path).encode()))
+        write_compiled(cache_path, level, source_key)
+    return level
@@ -1,65 +1,65 @@
 # src/level_manager.py
 
+import os
+import threading
+from collections import OrderedDict
+from level_loader import LEVEL_CACHE_DIR, load_level
+
+LEVEL_DIR = "levels"
+
+class LevelPack:
+    """
+    The levels in a directory of JSON files, in file name order.
+
+    Only the file list is read up front. Each level is compiled (or read from
+    its compiled cache) when it is first indexed, and at most cache_size
+    compiled levels are kept in memory, so large community packs stay cheap.
+    Indexing is thread-safe, so levels can be preloaded from a worker thread.
+    """
+    def __init__(self, directory=LEVEL_DIR, cache_dir=None, cache_size=8):
+        self.directory = directory
+        self.paths = sorted(
+            os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".json")
+        )
+        if cache_dir is None:
+            cache_dir = os.path.join(LEVEL_CACHE_DIR, os.path.basename(os.path.normpath(directory)))
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+        self.loaded = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.paths)
+        with self.lock:
+            level = self.loaded.get(index)
+            if level is not None:
+                self.loaded.move_to_end(index)
+                return level
+            level = load_level(self.paths[index], self.cache_dir)
+            self.loaded[index] = level
+            if len(self.loaded) > self.cache_size:
+                self.loaded.popitem(last=False)
+            return level
+
 class LevelManager:
-    def __init__(self):
+    def __init__(self, directory=LEVEL_DIR):
         # Each level is a dictionary with:
         # - "player_start": (x, y)
-        # - "coins": list of (x, y) positions
+        # - "coins": list of (x, y) positions, already clear of the walls
         # - "door": (x, y)
-        # - "time_limit": int (in seconds)
+        # - "time_limit": seconds
         # - "walls": list of (x, y, width, height)
+        # - "spider_count": int
+        # - "world_size": (width, height)
+        # plus the precomputed "wall_spans", "cell_size" and "safe_rect".
+        # See level_loader.py for the file format.
         #
-        # All coordinates should be inside the main area.
-        self.levels = [
-            # Level 1: A simple open area (longer time)
-            {
-                "player_start": (100, 100),
-                "coins": [(150, 150), (300, 200), (500, 150)],
-                "door": (700, 500),
-                "time_limit": 20,  # Longer time for the first level
-                "walls": [
-                    (100, 80, 200, 20),
-                    (400, 300, 20, 150)
-                ]
-            },
-            # Level 2: A semi-maze layout
-            {
-                "player_start": (100, 350),
-                "coins": [(120, 320), (350, 150), (600, 350), (400, 400)],
-                "door": (700, 100),
-                "time_limit": 30,
-                "walls": [
-                    (200, 250, 400, 20),
-                    (200, 250, 20, 150),
-                    (580, 250, 20, 150)
-                ]
-            },
-            # Level 3: Vertical walls forming corridors
-            {
-                "player_start": (100, 350),
-                "coins": [
-                    (150, 320), (150, 380),
-                    (350, 320), (350, 380)
-                ],
-                "door": (700, 350),
-                "time_limit": 30,
-                "walls": [
-                    (250, 300, 20, 150),
-                    (450, 300, 20, 150)
-                ]
-            },
-            # Level 4: A central split wall layout
-            {
-                "player_start": (400, 100),
-                "coins": [(320, 150), (480, 150), (320, 350), (480, 350)],
-                "door": (400, 520),
-                "time_limit": 30,
-                "walls": [
-                    (200, 300, 150, 20),
-                    (400, 300, 200, 20)
-                ]
-            }
-        ]
+        # All coordinates should be inside the level's play area.
+        self.levels = LevelPack(directory)
         self.current_level_index = 0
 
     def get_current_level(self):
@@ -69,4 +69,4 @@ class LevelManager:
         self.current_level_index += 1
 
     def reset(self):
-        self.current_level_index = 0
\ No newline at end of file
+        self.current_level_index = 0
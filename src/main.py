@@ -1,44 +1,61 @@
 # src/main.py
 
+import cProfile
+import os
+import time
 import pygame
-import random
 from level_manager import LevelManager
 from player import Player
-from objects import Coin, Door
-from input_handler_keyboard import get_input
-from utils import Timer
+from input_backends import InputManager, create_backends
+from renderer import (render_game, render_view, render_win_screen, render_gameover_screen,
+                      warm_surface_cache, build_static_layer, DirtyRectRenderer, PerfOverlay, StaticTiles)
+from camera import Camera
+from profiler import frame_profiler
+from session import SessionRecorder, SessionReplay
+from world import World, SIM_DT
+from assets import get_asset
+from utils import SCREEN_WIDTH, SCREEN_HEIGHT
 
-# Window dimensions
-SCREEN_WIDTH = 800
-SCREEN_HEIGHT = 600
+# Push only the changed screen regions instead of flipping the whole window
+# every frame. Helps most on software-rendered framebuffers; with many
+# spiders on screen it redraws fully instead (see DIRTY_SPRITE_LIMIT). Levels
+# larger than the screen scroll, and are always drawn whole through a Camera.
+DIRTY_RECT_RENDERING = True
 
-# Define the main playable area (invisible boundary) with a 50-pixel margin.
-MAIN_MARGIN = 50
-MAIN_AREA = pygame.Rect(MAIN_MARGIN, MAIN_MARGIN,
-                        SCREEN_WIDTH - 2 * MAIN_MARGIN,
-                        SCREEN_HEIGHT - 2 * MAIN_MARGIN)
+# Input sources, see input_backends.py. Set INPUT_BACKENDS to change them,
+# e.g. INPUT_BACKENDS=keyboard,serial for the tilt controller, or
+# INPUT_BACKENDS=replay:session.ikqs to play with a recorded controller.
+# Serial ports are only opened when asked for, so a machine without the
+# board starts quietly.
+INPUT_BACKENDS = os.environ.get("INPUT_BACKENDS", "keyboard,gamepad")
 
-def create_coins_in_area(coin_positions, walls, coin_width=20, coin_height=20):
-    """Creates coins ensuring they are within MAIN_AREA."""
-    coins = []
-    for pos in coin_positions:
-        x, y = pos
-        x = max(MAIN_AREA.left, min(x, MAIN_AREA.right - coin_width))
-        y = max(MAIN_AREA.top, min(y, MAIN_AREA.bottom - coin_height))
-        coin_rect = pygame.Rect(x, y, coin_width, coin_height)
-        collision = any(coin_rect.colliderect(wall) for wall in walls)
-        attempts = 0
-        while collision and attempts < 100:
-            x = random.randint(MAIN_AREA.left, MAIN_AREA.right - coin_width)
-            y = random.randint(MAIN_AREA.top, MAIN_AREA.bottom - coin_height)
-            coin_rect = pygame.Rect(x, y, coin_width, coin_height)
-            collision = any(coin_rect.colliderect(wall) for wall in walls)
-            attempts += 1
-        if collision:
-            print(f"Skipping coin at {pos} after {attempts} attempts.")
-            continue
-        coins.append(Coin(x, y, coin_width, coin_height))
-    return coins
+# Render frame cap; 0 renders as fast as possible. The simulation always
+# advances in fixed SIM_DT ticks, independent of this.
+RENDER_FPS = 60
+# Longest frame the simulation will catch up on, so a stall doesn't turn
+# into a burst of hundreds of ticks.
+MAX_FRAME_TIME = 0.25
+
+# Frame profiling, see profiler.py. The stage timers always run in the game;
+# PROFILE_KEY shows or hides the overlay. Set PROFILE_EXPORT to a .csv or
+# .json file to write the last frames' timings there at exit, and
+# PROFILE_CPROFILE to a file to dump a cProfile of the whole run into.
+PROFILE_KEY = pygame.K_F3
+PROFILE_EXPORT = os.environ.get("PROFILE_EXPORT")
+PROFILE_CPROFILE = os.environ.get("PROFILE_CPROFILE")
+
+# Session recording, see session.py. Set SESSION_RECORD to a file, or to a
+# directory for a new timestamped file each time the game starts, to record
+# the seed and every tick's input. Set SESSION_REPLAY to a recording to
+# watch it instead of playing, REPLAY_SPEED times as fast.
+SESSION_RECORD = os.environ.get("SESSION_RECORD")
+SESSION_REPLAY = os.environ.get("SESSION_REPLAY")
+REPLAY_SPEED = float(os.environ.get("REPLAY_SPEED", "1"))
+
+def session_path(path):
+    if os.path.isdir(path):
+        return os.path.join(path, time.strftime("session-%Y%m%d-%H%M%S.ikqr"))
+    return path
 
 def main():
     pygame.init()
@@ -47,178 +64,152 @@ def main():
     clock = pygame.time.Clock()
     
     # Load and scale background
-    original_bg = pygame.image.load("assets/background.png").convert()
-    bg_image = pygame.transform.scale(original_bg, (SCREEN_WIDTH, SCREEN_HEIGHT))
-    
-    # Load wall textures
-    vertical_wall_texture = pygame.image.load("assets/vertical_wall.png").convert()
-    horizontal_wall_texture = pygame.image.load("assets/horizontal_wall.png").convert()
-    
-    # Load door images
-    door_closed_img = pygame.image.load("assets/door_closed.png").convert_alpha()
-    door_open_img = pygame.image.load("assets/door_open.png").convert_alpha()
-    
-    # Load coin image
-    coin_img = pygame.image.load("assets/coin.png").convert_alpha()
+    bg_image = pygame.transform.scale(get_asset("background"), (SCREEN_WIDTH, SCREEN_HEIGHT))
     
-    # Load spider image for obstacles
-    spider_img = pygame.image.load("assets/spider.png").convert_alpha()
+    # Wall textures, door, coin and spider images, pre-scaled by the asset cache.
+    vertical_wall_texture = get_asset("vertical_wall")
+    horizontal_wall_texture = get_asset("horizontal_wall")
+    door_closed_img = get_asset("door_closed")
+    door_open_img = get_asset("door_open")
+    coin_img = get_asset("coin")
+    spider_img = get_asset("spider")
     
-    # Initialize game state variables.
-    game_state = "playing"  # "playing", "win", "gameover"
-    total_time = 0.0
-    gameover_reason = ""
-    
-    # Initialize level manager and current level
+    # Initialize level manager and game world.
     level_manager = LevelManager()
-    current_level = level_manager.get_current_level()
-    
-    walls = [pygame.Rect(x, y, w, h) for (x, y, w, h) in current_level["walls"]]
-    player = Player(*current_level["player_start"])
-    coins = create_coins_in_area(current_level["coins"], walls)
-    door = Door(*current_level["door"])
-    timer = Timer(current_level["time_limit"])
-    
-    # Define a safe zone for obstacles around the player's spawn (100-pixel margin)
-    safe_margin = 100
-    safe_rect = pygame.Rect(
-        player.x - safe_margin, player.y - safe_margin,
-        player.draw_width + 2 * safe_margin, player.draw_height + 2 * safe_margin
-    )
-    
-    obstacles = create_obstacles(walls, spider_img, safe_rect, count=3, obs_width=30, obs_height=30)
+    player = Player(*level_manager.get_current_level()["player_start"])
+    replay = SessionReplay(SESSION_REPLAY) if SESSION_REPLAY else None
+    world = World(level_manager, player, spider_img, preload=True,
+                  seed=replay.seed if replay is not None else None)
+    recorder = None
+    if SESSION_RECORD and replay is None:
+        recorder = SessionRecorder(session_path(SESSION_RECORD), world)
+    # Backends open in the background, so a missing controller doesn't delay startup.
+    inputs = InputManager(create_backends(INPUT_BACKENDS))
+    static_layer = None
+    # For levels larger than the screen: the camera and the static layer's tiles.
+    camera = None
+    tiles = None
+    level_serial = None
     
     restart_button = pygame.Rect(SCREEN_WIDTH // 2 - 60, SCREEN_HEIGHT // 2 + 50, 120, 50)
+    dirty_renderer = DirtyRectRenderer() if DIRTY_RECT_RENDERING else None
+    # The win and game over screens are static, so they are only drawn once.
+    end_screen_drawn = False
+    accumulator = 0.0
+    overlay = PerfOverlay(frame_profiler)
+    frame_profiler.enabled = True
     
     running = True
     while running:
-        delta_time = clock.get_time() / 1000.0
-        if game_state == "playing":
-            total_time += delta_time
+        frame_profiler.next_frame()
+        frame_time = min(clock.tick(RENDER_FPS) / 1000.0, MAX_FRAME_TIME)
+        frame_profiler.mark("wait")
         
+        restart = False
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
-            if game_state in ("win", "gameover") and event.type == pygame.MOUSEBUTTONDOWN:
+            if event.type == pygame.KEYDOWN and event.key == PROFILE_KEY:
+                overlay.toggle()
+            if world.state in ("win", "gameover") and event.type == pygame.MOUSEBUTTONDOWN:
                 if restart_button.collidepoint(event.pos):
-                    level_manager.reset()
-                    current_level = level_manager.get_current_level()
-                    walls = [pygame.Rect(x, y, w, h) for (x, y, w, h) in current_level["walls"]]
-                    player.x, player.y = current_level["player_start"]
-                    player.rect.topleft = (player.x, player.y)
-                    coins = create_coins_in_area(current_level["coins"], walls)
-                    door.x, door.y = current_level["door"]
-                    door.lock()
-                    timer.reset(current_level["time_limit"])
-                    safe_rect = pygame.Rect(
-                        player.x - safe_margin, player.y - safe_margin,
-                        player.draw_width + 2 * safe_margin, player.draw_height + 2 * safe_margin
-                    )
-                    obstacles = create_obstacles(walls, spider_img, safe_rect, count=3, obs_width=30, obs_height=30)
-                    total_time = 0.0
-                    game_state = "playing"
+                    restart = True
+        frame_profiler.mark("events")
+        
+        # Collect input from every backend once per rendered frame. The
+        # controller's button restarts from the end screens too.
+        inputs.poll()
+        if inputs.take_press() and world.state in ("win", "gameover"):
+            restart = True
+        if restart and replay is None:
+            if recorder is not None:
+                recorder.restart(world)
+            else:
+                world.restart()
+            accumulator = 0.0
+            end_screen_drawn = False
+        frame_profiler.mark("input")
         
-        if game_state == "playing":
-            # Get movement input from input_handler.
-            direction_vector = get_input()
-            # Save previous position.
-            prev_x, prev_y = player.x, player.y
-            
-            # Apply horizontal movement first.
-            player.x += direction_vector[0] * player.speed
-            player.rect.x = player.x + (player.draw_width - player.rect.width) // 2
-            for wall in walls:
-                if player.rect.colliderect(wall):
-                    player.x = prev_x
-                    player.rect.x = prev_x + (player.draw_width - player.rect.width) // 2
-                    break
-            
-            # Apply vertical movement.
-            player.y += direction_vector[1] * player.speed
-            player.rect.y = player.y
-            for wall in walls:
-                if player.rect.colliderect(wall):
-                    player.y = prev_y
-                    player.rect.y = prev_y
-                    break
-            
-            # Enforce boundaries using MAIN_AREA.
-            if player.x < MAIN_AREA.left:
-                player.x = MAIN_AREA.left
-            if player.x + player.draw_width > MAIN_AREA.right:
-                player.x = MAIN_AREA.right - player.draw_width
-            if player.y < MAIN_AREA.top:
-                player.y = MAIN_AREA.top
-            if player.y + player.draw_height > MAIN_AREA.bottom:
-                player.y = MAIN_AREA.bottom - player.draw_height
-            player.rect.topleft = (player.x, player.y)
-            player.rect.x = player.x + (player.draw_width - player.rect.width) // 2
-            
-            # Update obstacles.
-            for obstacle in obstacles:
-                obstacle.update(walls)
-                if player.rect.colliderect(obstacle.rect):
-                    game_state = "gameover"
-                    gameover_reason = "You Died!"
-            
-            # Check coin collisions.
-            for coin in coins:
-                if not coin.collected and coin.check_collision(player):
-                    coin.collect()
-            
-            # Unlock door if all coins collected.
-            if all(coin.collected for coin in coins):
-                door.unlock()
-            
-            # Check door.
-            if door.check_collision(player) and not door.is_locked:
-                level_manager.next_level()
-                if level_manager.current_level_index >= len(level_manager.levels):
-                    game_state = "win"
+        if replay is not None:
+            # The recording restarts from the end screens itself, where the
+            # player did, so it steps whatever the state.
+            if not replay.done:
+                accumulator += frame_time * REPLAY_SPEED
+                while accumulator >= SIM_DT and not replay.done:
+                    replay.step(world, SIM_DT)
+                    accumulator -= SIM_DT
+                if world.state == "playing":
+                    end_screen_drawn = False
+        elif world.state == "playing":
+            direction_vector = inputs.direction
+            accumulator += frame_time
+            while accumulator >= SIM_DT and world.state == "playing":
+                if recorder is not None:
+                    recorder.step(world, direction_vector, SIM_DT)
                 else:
-                    current_level = level_manager.get_current_level()
-                    walls = [pygame.Rect(x, y, w, h) for (x, y, w, h) in current_level["walls"]]
-                    player.x, player.y = current_level["player_start"]
-                    player.rect.topleft = (player.x, player.y)
-                    coins = create_coins_in_area(current_level["coins"], walls)
-                    door.x, door.y = current_level["door"]
-                    door.lock()
-                    timer.reset(current_level["time_limit"])
-                    safe_rect = pygame.Rect(
-                        player.x - safe_margin, player.y - safe_margin,
-                        player.draw_width + 2 * safe_margin, player.draw_height + 2 * safe_margin
-                    )
-                    obstacles = create_obstacles(walls, spider_img, safe_rect, count=3, obs_width=30, obs_height=30)
-            
-            # Update timer; if time runs out, game over.
-            if timer.update(delta_time):
-                game_state = "gameover"
-                gameover_reason = "Time Ran Out!"
-            
-            render_game(
-                screen,
-                bg_image,
-                vertical_wall_texture,
-                horizontal_wall_texture,
-                door_closed_img,
-                door_open_img,
-                coin_img,
-                player,
-                coins,
-                door,
-                timer,
-                walls,
-                obstacles
-            )
+                    world.step(direction_vector, SIM_DT)
+                accumulator -= SIM_DT
+        
+        if world.level_serial != level_serial:
+            # Walls only change on level load, so the static layer is rebuilt here.
+            level_serial = world.level_serial
+            camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT, world.bounds)
+            if camera.scrolls():
+                tiles = StaticTiles(bg_image, vertical_wall_texture, horizontal_wall_texture,
+                                    world.wall_grid, world.bounds)
+                static_layer = None
+            else:
+                tiles = None
+                static_layer = build_static_layer(bg_image, vertical_wall_texture, horizontal_wall_texture,
+                                                  world.walls)
+            warm_surface_cache(door_closed_img, door_open_img, coin_img, world.coins, world.obstacles)
+            frame_profiler.mark("level")
         
-        elif game_state == "win":
-            render_win_screen(screen, bg_image, total_time, restart_button)
+        if world.state == "playing":
+            # Draw moving sprites part way between the last two ticks.
+            alpha = accumulator / SIM_DT
+            if tiles is not None:
+                render_view(screen, camera, tiles, door_closed_img, door_open_img, coin_img,
+                            world.player, world.coins, world.door, world.timer, world.obstacles,
+                            alpha, overlay if overlay.visible else None)
+            else:
+                render = dirty_renderer.render if dirty_renderer else render_game
+                render(
+                    screen,
+                    static_layer,
+                    door_closed_img,
+                    door_open_img,
+                    coin_img,
+                    world.player,
+                    world.coins,
+                    world.door,
+                    world.timer,
+                    world.obstacles,
+                    alpha,
+                    overlay if overlay.visible else None
+                )
         
-        elif game_state == "gameover":
-            render_gameover_screen(screen, bg_image, level_manager.current_level_index, restart_button, gameover_reason)
+        elif world.state == "win" and not end_screen_drawn:
+            render_win_screen(screen, bg_image, world.total_time, restart_button)
+            end_screen_drawn = True
         
-        clock.tick(30)
+        elif world.state == "gameover" and not end_screen_drawn:
+            render_gameover_screen(screen, bg_image, level_manager.current_level_index, restart_button, world.gameover_reason)
+            end_screen_drawn = True
+    inputs.close()
+    if recorder is not None:
+        recorder.close(world)
+    if replay is not None:
+        print(replay.report())
+    world.preloader.shutdown()
+    if PROFILE_EXPORT:
+        frame_profiler.export(PROFILE_EXPORT)
     pygame.quit()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if PROFILE_CPROFILE:
+        profile = cProfile.Profile()
+        profile.runcall(main)
+        profile.dump_stats(PROFILE_CPROFILE)
+    else:
+        main()
@@ -0,0 +1,303 @@
+# src/navigation.py
+#
+# Grid navigation over the play area: the walls rasterized into blocked
+# cells for an agent of a given size, breadth-first flow fields toward a
+# target cell for chasing spiders, and reachability checks for levels.
+
+import math
+from array import array
+from collections import OrderedDict
+from utils import MAIN_AREA
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; ObstacleSwarm needs it, MovingObstacles don't.
+    np = None
+
+# Cell size (pixels) of the spiders' flow field, and of the finer grid the
+# level compiler checks reachability on.
+NAV_CELL = 10
+REACH_CELL = 5
+
+# Flow fields kept for recent target cells, so a knight moving back and
+# forth between cells doesn't trigger a search every time.
+FLOW_CACHE_SIZE = 16
+
+def _cover(low, high, origin, cell_size, count):
+    # Range of cells whose centers lie strictly between low and high.
+    first = math.floor((low - origin) / cell_size - 0.5) + 1
+    last = math.ceil((high - origin) / cell_size - 0.5) - 1
+    return max(first, 0), min(last, count - 1)
+
+class NavGrid:
+    """
+    The walls rasterized for an agent of width x height pixels.
+
+    A cell is free when the agent, centered anywhere within margin pixels
+    of the cell's center, overlaps no wall and stays inside the area. With
+    margin = cell_size / 2 that holds for every point of the cell, so an
+    agent whose center stays in free cells never touches a wall; a margin
+    of 0 only tests the center, which is the right test for reachability.
+
+    Cells are numbered row by row. steps(i) lists the free cells an agent
+    can step to from cell i: the four sides, and the diagonals whose two
+    side cells are also free, so no path cuts a wall's corner. The lists
+    are made the first time a search reaches a cell and kept in neighbors,
+    so a grid over a large level only pays for the cells searched.
+    """
+    def __init__(self, walls, width, height, cell_size=NAV_CELL, margin=None, area=MAIN_AREA):
+        self.area = area
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.margin = cell_size / 2 if margin is None else margin
+        self.cols = area.width // cell_size
+        self.rows = area.height // cell_size
+        cols, rows = self.cols, self.rows
+        grow_x = width / 2 + self.margin
+        grow_y = height / 2 + self.margin
+
+        # Cells whose agent box leaves the area are blocked too.
+        blocked = bytearray([1]) * (cols * rows)
+        col0 = max(0, math.ceil(grow_x / cell_size - 0.5))
+        col1 = min(cols - 1, math.floor((area.width - grow_x) / cell_size - 0.5))
+        row0 = max(0, math.ceil(grow_y / cell_size - 0.5))
+        row1 = min(rows - 1, math.floor((area.height - grow_y) / cell_size - 0.5))
+        for row in range(row0, row1 + 1):
+            blocked[row * cols + col0:row * cols + col1 + 1] = bytes(col1 - col0 + 1)
+        for wall in walls:
+            if wall.width <= 0 or wall.height <= 0:
+                continue
+            col0, col1 = _cover(wall.left - grow_x, wall.right + grow_x, area.left, cell_size, cols)
+            row0, row1 = _cover(wall.top - grow_y, wall.bottom + grow_y, area.top, cell_size, rows)
+            if col0 <= col1:
+                for row in range(row0, row1 + 1):
+                    blocked[row * cols + col0:row * cols + col1 + 1] = b"\x01" * (col1 - col0 + 1)
+        self.blocked = blocked
+        self.neighbors = [None] * (cols * rows)
+
+    def __len__(self):
+        return self.cols * self.rows
+
+    def steps(self, index):
+        """The free cells an agent can step to from cell index."""
+        blocked = self.blocked
+        cols = self.cols
+        row, col = divmod(index, cols)
+        steps = []
+        left = col > 0 and not blocked[index - 1]
+        right = col < cols - 1 and not blocked[index + 1]
+        up = row > 0 and not blocked[index - cols]
+        down = row < self.rows - 1 and not blocked[index + cols]
+        if left:
+            steps.append(index - 1)
+        if right:
+            steps.append(index + 1)
+        if up:
+            steps.append(index - cols)
+        if down:
+            steps.append(index + cols)
+        if up and left and not blocked[index - cols - 1]:
+            steps.append(index - cols - 1)
+        if up and right and not blocked[index - cols + 1]:
+            steps.append(index - cols + 1)
+        if down and left and not blocked[index + cols - 1]:
+            steps.append(index + cols - 1)
+        if down and right and not blocked[index + cols + 1]:
+            steps.append(index + cols + 1)
+        return steps
+
+    def agent_position(self, cell):
+        """Top-left agent position that centers it on cell."""
+        half = self.cell_size / 2
+        return (int(self.area.left + (cell % self.cols) * self.cell_size + half - self.width / 2),
+                int(self.area.top + (cell // self.cols) * self.cell_size + half - self.height / 2))
+
+    def cell_at(self, x, y):
+        """Cell containing point (x, y), clamped into the grid."""
+        col = int((x - self.area.left) // self.cell_size)
+        row = int((y - self.area.top) // self.cell_size)
+        col = 0 if col < 0 else self.cols - 1 if col >= self.cols else col
+        row = 0 if row < 0 else self.rows - 1 if row >= self.rows else row
+        return row * self.cols + col
+
+    def is_free(self, cell):
+        return not self.blocked[cell]
+
+    def cells_touching(self, rect):
+        """Free cells where the agent, centered on the cell, would overlap rect."""
+        cols = self.cols
+        col0, col1 = _cover(rect.left - self.width / 2, rect.right + self.width / 2,
+                            self.area.left, self.cell_size, cols)
+        row0, row1 = _cover(rect.top - self.height / 2, rect.bottom + self.height / 2,
+                            self.area.top, self.cell_size, self.rows)
+        return [row * cols + col for row in range(row0, row1 + 1) for col in range(col0, col1 + 1)
+                if not self.blocked[row * cols + col]]
+
+    def search(self, sources, max_steps=None):
+        """
+        Breadth-first search from the sources cells over free cells, out to
+        max_steps steps if given. Returns (dist, parent) as int arrays:
+        steps from the nearest source per cell (-1 where unreachable or out
+        of range), and the neighbor one step closer to it (a source is its
+        own parent).
+        """
+        count = self.cols * self.rows
+        dist = array("i", [-1]) * count
+        parent = array("i", [0]) * count
+        neighbors = self.neighbors
+        for source in sources:
+            dist[source] = 0
+            parent[source] = source
+        frontier = list(sources)
+        steps = 0
+        while frontier and (max_steps is None or steps < max_steps):
+            steps += 1
+            following = []
+            for cell in frontier:
+                cell_steps = neighbors[cell]
+                if cell_steps is None:
+                    cell_steps = neighbors[cell] = self.steps(cell)
+                for neighbor in cell_steps:
+                    if dist[neighbor] < 0:
+                        dist[neighbor] = steps
+                        parent[neighbor] = cell
+                        following.append(neighbor)
+            frontier = following
+        return dist, parent
+
+    def reachable(self, sources):
+        """
+        The cells search() would reach from sources, as a bytearray with 1
+        for each; a diagonal step can always be made as two side steps, so
+        these are the free cells connected through their sides. Filled a
+        run of free cells at a time, which keeps fine grids over large
+        levels cheap.
+        """
+        cols = self.cols
+        count = cols * self.rows
+        closed = bytearray(self.blocked)     # blocked or already reached
+        reached = bytearray(count)
+        stack = list(sources)
+        while stack:
+            cell = stack.pop()
+            if closed[cell]:
+                continue
+            row_start = cell - cell % cols
+            found = closed.rfind(1, row_start, cell)
+            left = row_start if found < 0 else found + 1
+            right = closed.find(1, cell, row_start + cols)
+            if right < 0:
+                right = row_start + cols
+            closed[left:right] = b"\x01" * (right - left)
+            reached[left:right] = b"\x01" * (right - left)
+            # Seed every open run beside this one in the rows above and below.
+            for start in (left - cols, left + cols):
+                if start < 0 or start >= count:
+                    continue
+                end = start + right - left
+                index = closed.find(0, start, end)
+                while index >= 0:
+                    stack.append(index)
+                    run_end = closed.find(1, index, end)
+                    if run_end < 0:
+                        break
+                    index = closed.find(0, run_end, end)
+        return reached
+
+class FlowField:
+    """
+    Directions toward a moving target for every agent on a NavGrid.
+
+    track() is called with the target's rect every tick, but only searches
+    again when the target's center enters a different cell; fields for the
+    last FLOW_CACHE_SIZE target cells are kept. The search starts from every
+    free cell where an agent would touch the target, since the target's own
+    cell is often too close to a wall for the agent. After that,
+    next_position() tells an agent where to head in O(1): the top-left
+    position that centers it on the next cell of its shortest path.
+
+    With max_steps, the search stops that many steps from the target and
+    agents further out don't chase, so the cost of a search is bounded on
+    large levels.
+    """
+    def __init__(self, nav, max_steps=None):
+        self.nav = nav
+        self.max_steps = max_steps
+        self.target = None
+        self.dist = None
+        self.parent = None
+        self.searches = 0
+        self._cache = OrderedDict()
+
+    def track(self, rect):
+        """Points the field at rect. Returns True if the target cell changed."""
+        cell = self.nav.cell_at(*rect.center)
+        if cell == self.target:
+            return False
+        self.target = cell
+        field = self._cache.get(cell)
+        if field is None:
+            field = self.nav.search(self.nav.cells_touching(rect), self.max_steps)
+            self.searches += 1
+            self._cache[cell] = field
+            if len(self._cache) > FLOW_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(cell)
+        self.dist, self.parent = field
+        return True
+
+    def next_position(self, x, y):
+        """
+        Top-left position for an agent at top-left (x, y) to head for, or
+        None when it is off the free cells or can't reach the target.
+        """
+        nav = self.nav
+        cell = nav.cell_at(x + nav.width / 2, y + nav.height / 2)
+        if self.dist is None or self.dist[cell] < 0 or nav.blocked[cell]:
+            return None
+        return nav.agent_position(self.parent[cell])
+
+    def next_positions(self, cells):
+        """
+        next_position() for many agents at once, given a NumPy array of the
+        cells their centers are in. Returns (target x, target y, valid)
+        arrays, valid where next_position() wouldn't be None. The field is
+        read in place, so the cost follows the number of agents.
+        """
+        nav = self.nav
+        valid = ((np.frombuffer(self.dist, dtype=np.int32)[cells] >= 0) &
+                 (np.frombuffer(nav.blocked, dtype=np.uint8)[cells] == 0))
+        step = np.frombuffer(self.parent, dtype=np.int32)[cells]
+        half = nav.cell_size / 2
+        target_x = nav.area.left + (step % nav.cols) * nav.cell_size + half - nav.width / 2
+        target_y = nav.area.top + (step // nav.cols) * nav.cell_size + half - nav.height / 2
+        return target_x.astype(np.int32), target_y.astype(np.int32), valid
+
+def unreachable(walls, player_start, player_size, hitbox_size, door_rect, coin_rects, cell_size=REACH_CELL,
+                area=MAIN_AREA):
+    """
+    Checks that the knight can get from player_start to every coin and to
+    the door, on a fine NavGrid of its hitbox over area. Returns a list
+    describing what can't be reached, empty when the level is playable.
+    """
+    nav = NavGrid(walls, hitbox_size[0], hitbox_size[1], cell_size, margin=0, area=area)
+    start = nav.cell_at(player_start[0] + player_size[0] / 2, player_start[1] + player_size[1] / 2)
+    if nav.blocked[start]:
+        # The spawn point is off the cell centers; start from a free cell next to it.
+        cols = nav.cols
+        nearby = [start + dy * cols + dx for dy in (-1, 0, 1) for dx in (-1, 0, 1)
+                  if 0 <= start % cols + dx < cols and 0 <= start // cols + dy < nav.rows]
+        free = [cell for cell in nearby if not nav.blocked[cell]]
+        if not free:
+            return [f"player start at {tuple(player_start)}"]
+        start = free[0]
+    reached = nav.reachable([start])
+    problems = []
+    for index, rect in enumerate(coin_rects):
+        if not any(reached[cell] for cell in nav.cells_touching(rect)):
+            problems.append(f"coin {index} at {tuple(rect.topleft)}")
+    if not any(reached[cell] for cell in nav.cells_touching(door_rect)):
+        problems.append(f"door at {tuple(door_rect.topleft)}")
+    return problems
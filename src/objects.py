@@ -1,28 +1,67 @@
 # src/objects.py
 import pygame
+import random
+from placement import FreeSpace, wall_rects
+from spatial import SpatialGrid
+from utils import MAIN_AREA
 
 class Coin:
+    """One coin as placed by create_coins_in_area; a level's live coins are kept in a CoinStore."""
+    __slots__ = ("rect", "collected")
+
     def __init__(self, x, y, width=20, height=20):
-        self.x = x
-        self.y = y
-        self.width = width
-        self.height = height
+        self.rect = pygame.Rect(x, y, width, height)
         self.collected = False
 
+    @property
+    def x(self):
+        return self.rect.x
+
+    @property
+    def y(self):
+        return self.rect.y
+
+    @property
+    def width(self):
+        return self.rect.width
+
+    @property
+    def height(self):
+        return self.rect.height
+
     def collect(self):
         self.collected = True
 
     def check_collision(self, player):
-        # Create a rect for the coin and check collision with the player's rect
-        coin_rect = pygame.Rect(self.x, self.y, self.width, self.height)
-        return coin_rect.colliderect(player.rect)
+        return self.rect.colliderect(player.rect)
 
 class Door:
+    __slots__ = ("rect", "is_locked")
+
+    # Door dimensions, for drawing and collisions.
+    WIDTH = 50
+    HEIGHT = 80
+
     def __init__(self, x, y):
-        self.x = x
-        self.y = y
+        self.rect = pygame.Rect(x, y, self.WIDTH, self.HEIGHT)
         self.is_locked = True
 
+    @property
+    def x(self):
+        return self.rect.x
+
+    @x.setter
+    def x(self, value):
+        self.rect.x = value
+
+    @property
+    def y(self):
+        return self.rect.y
+
+    @y.setter
+    def y(self, value):
+        self.rect.y = value
+
     def unlock(self):
         self.is_locked = False
 
@@ -30,6 +69,111 @@ class Door:
         self.is_locked = True
 
     def check_collision(self, player):
-        # Define door dimensions (50x80 as before)
-        door_rect = pygame.Rect(self.x, self.y, 50, 80)
-        return door_rect.colliderect(player.rect)
\ No newline at end of file
+        return self.rect.colliderect(player.rect)
+
+def _bits(mask):
+    # Indices of the set bits of mask, lowest first.
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+class CoinStore:
+    """
+    A level's coins as parallel per-coin data, indexed by coin number.
+
+      rects     - one persistent pygame.Rect per coin
+      alive     - bitmask of coins not yet collected (bit i is coin i)
+      remaining - number of set bits in alive
+      live      - indices of the uncollected coins in order, for drawing
+
+    Uncollected coins are also in a SpatialGrid, so collect_touching() only
+    tests coins near the player, and a collected coin leaves the grid and
+    live at once: per-tick work follows the coins that are left. The
+    per-tick test queries the grid into a reused buffer, so it allocates no
+    lists or rects. When remaining reaches zero the bound door unlocks.
+    """
+    def __init__(self, rects, area=MAIN_AREA):
+        self.rects = [pygame.Rect(rect) for rect in rects]
+        self.alive = (1 << len(self.rects)) - 1
+        self.remaining = len(self.rects)
+        self.live = list(range(len(self.rects)))
+        self.grid = SpatialGrid(area)
+        self._index = {}    # id(rect) -> coin number, for grid query results
+        self._hits = []     # Reused by collect_touching().
+        for index, rect in enumerate(self.rects):
+            self.grid.insert(rect)
+            self._index[id(rect)] = index
+        self.door = None
+
+    @classmethod
+    def from_coins(cls, coins, area=MAIN_AREA):
+        return cls([coin.rect for coin in coins], area)
+
+    def __len__(self):
+        return len(self.rects)
+
+    def is_collected(self, index):
+        return not self.alive >> index & 1
+
+    def bind_door(self, door):
+        """Makes door unlock when the last coin is collected, or now if there are none."""
+        self.door = door
+        if self.remaining == 0:
+            door.unlock()
+
+    def collect(self, index):
+        """Collects coin index. Returns True if it was still there."""
+        bit = 1 << index
+        if not self.alive & bit:
+            return False
+        self.alive ^= bit
+        self.remaining -= 1
+        self.grid.remove(self.rects[index])
+        # Kept in coin order, so coins are always drawn in the same order.
+        self.live.remove(index)
+        if self.remaining == 0 and self.door is not None:
+            self.door.unlock()
+        return True
+
+    def collect_touching(self, rect):
+        """Collects every coin rect overlaps. Returns how many were collected."""
+        hits = self._hits
+        count = self.grid.query_into(rect, hits)
+        index = self._index
+        i = count
+        while i:
+            i -= 1
+            self.collect(index[id(hits[i])])
+        return count
+
+    def touching(self, rect):
+        """Coin numbers of the uncollected coins that rect overlaps, as a new list."""
+        index = self._index
+        return [index[id(hit)] for hit in self.grid.query(rect)]
+
+    def collected_since(self, alive):
+        """Coin numbers collected since alive was read from this store, lowest first."""
+        return _bits(alive & ~self.alive)
+
+def create_coins_in_area(coin_positions, wall_grid, coin_width=20, coin_height=20, rng=random, area=MAIN_AREA):
+    """
+    Creates coins ensuring they are within area. Coins that overlap a wall
+    are moved to a spot picked by rng from the free space.
+    """
+    coins = []
+    free_space = None
+    for pos in coin_positions:
+        x, y = pos
+        x = max(area.left, min(x, area.right - coin_width))
+        y = max(area.top, min(y, area.bottom - coin_height))
+        if wall_grid.collides(pygame.Rect(x, y, coin_width, coin_height)):
+            if free_space is None:
+                free_space = FreeSpace(area, wall_rects(wall_grid), coin_width, coin_height)
+            spot = free_space.sample(rng)
+            if spot is None:
+                print(f"Skipping coin at {pos}: no free space for it.")
+                continue
+            x, y = spot
+        coins.append(Coin(x, y, coin_width, coin_height))
+    return coins
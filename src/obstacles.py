@@ -2,53 +2,232 @@
 
 import pygame
 import random
+import zlib
+from array import array
+from collision import sweep_box
 from utils import MAIN_AREA
+from placement import FreeSpace, wall_rects
+from renderer import get_scaled
+from spatial import SpatialGrid
 
 class MovingObstacle:
     def __init__(self, x, y, width, height, vx, vy, image):
         self.rect = pygame.Rect(x, y, width, height)
+        # Position at the start of the last simulation tick, for interpolated drawing.
+        self.prev_x = x
+        self.prev_y = y
         self.vx = vx
         self.vy = vy
         self.image = image
 
-    def update(self, walls):
-        self.rect.x += self.vx
-        self.rect.y += self.vy
+    def update(self, wall_grid, area=MAIN_AREA, steps=1):
+        """
+        Moves one tick, bouncing off area's edges and the walls. With steps
+        above 1, covers that many ticks in one swept move instead.
+        """
+        rect = self.rect
+        self.prev_x = rect.x
+        self.prev_y = rect.y
+        if steps > 1:
+            self._sweep(wall_grid, area, steps)
+            return
+        rect.x += self.vx
+        rect.y += self.vy
 
-        if self.rect.left < MAIN_AREA.left or self.rect.right > MAIN_AREA.right:
+        if rect.left < area.left or rect.right > area.right:
             self.vx = -self.vx
-            self.rect.x += self.vx
-        if self.rect.top < MAIN_AREA.top or self.rect.bottom > MAIN_AREA.bottom:
+            rect.x += self.vx
+        if rect.top < area.top or rect.bottom > area.bottom:
             self.vy = -self.vy
-            self.rect.y += self.vy
+            rect.y += self.vy
 
-        for wall in walls:
-            if self.rect.colliderect(wall):
-                self.vx = -self.vx
-                self.vy = -self.vy
-                self.rect.x += self.vx
-                self.rect.y += self.vy
-                break
+        if wall_grid.collides(rect):
+            self.vx = -self.vx
+            self.vy = -self.vy
+            rect.x += self.vx
+            rect.y += self.vy
+            if wall_grid.collides(rect):
+                # After an edge bounce in the same tick the step back can
+                # land in a wall; where the tick started is clear.
+                rect.x = self.prev_x
+                rect.y = self.prev_y
+
+    def _sweep(self, wall_grid, area, steps):
+        # steps ticks' worth swept through the walls, so a long move can't
+        # tunnel through a thin wall: the spider stops against the first
+        # wall in its way and turns back on each axis that was cut short.
+        rect = self.rect
+        dx = self.vx * steps
+        dy = self.vy * steps
+        x, y = sweep_box(wall_grid, rect.x, rect.y, rect.width, rect.height, dx, dy)
+        if abs(x - (rect.x + dx)) > 1e-6:
+            self.vx = -self.vx
+        if abs(y - (rect.y + dy)) > 1e-6:
+            self.vy = -self.vy
+        # Truncated, the swept position is clear of the walls.
+        x = int(x)
+        y = int(y)
+        if x < area.left:
+            x, self.vx = area.left, abs(self.vx)
+        elif x + rect.width > area.right:
+            x, self.vx = area.right - rect.width, -abs(self.vx)
+        if y < area.top:
+            y, self.vy = area.top, abs(self.vy)
+        elif y + rect.height > area.bottom:
+            y, self.vy = area.bottom - rect.height, -abs(self.vy)
+        rect.x = x
+        rect.y = y
+        if wall_grid.collides(rect):
+            # Pushed back inside the area onto a wall.
+            rect.x = self.prev_x
+            rect.y = self.prev_y
+
+    def draw(self, surface, alpha=1.0, origin=(0, 0)):
+        scaled_spider = get_scaled(self.image, (self.rect.width, self.rect.height))
+        x = self.prev_x + (self.rect.x - self.prev_x) * alpha
+        y = self.prev_y + (self.rect.y - self.prev_y) * alpha
+        return surface.blit(scaled_spider, (int(x) - origin[0], int(y) - origin[1]))
+
+# Pixels per tick a chasing spider covers along each axis.
+CHASE_SPEED = 3
+
+class ChasingObstacle(MovingObstacle):
+    """
+    A spider that hunts the knight by following a FlowField: each tick it
+    steps up to CHASE_SPEED pixels per axis toward the center of the next
+    cell on its path. The field's cells are free for its whole area, so the
+    step can't hit a wall. Off the field (spawned too close to a wall) or
+    with no path to the knight, it bounces like a MovingObstacle, with the
+    velocity it had before the chase.
+    """
+    def __init__(self, x, y, width, height, vx, vy, image, flow):
+        super().__init__(x, y, width, height, vx, vy, image)
+        self.flow = flow
+
+    def update(self, wall_grid, area=MAIN_AREA, steps=1):
+        rect = self.rect
+        prev = rect.topleft
+        for _ in range(steps):
+            target = self.flow.next_position(rect.x, rect.y)
+            if target is None:
+                super().update(wall_grid, area)
+                continue
+            # vx and vy stay the bounce velocity, for when the path is lost.
+            rect.x += max(-CHASE_SPEED, min(target[0] - rect.x, CHASE_SPEED))
+            rect.y += max(-CHASE_SPEED, min(target[1] - rect.y, CHASE_SPEED))
+        self.prev_x, self.prev_y = prev
+
+# Spiders outside the active area but within AWAKE_MARGIN pixels of it (see
+# ObstacleGroup.update) move every OFFSCREEN_STRIDE ticks, that many ticks'
+# worth at once; further out they sleep.
+OFFSCREEN_STRIDE = 4
+AWAKE_MARGIN = 400
+
+# Pixels the view is grown by when picking spiders to draw, covering the
+# step between a spider's previous and current position.
+DRAW_SLACK = 8
+
+class ObstacleGroup:
+    """
+    The spiders of a level as individual MovingObstacles, indexed in a
+    spatial grid over the level's area for the player overlap test.
+
+    World only talks to obstacles through update(), collides(), draw(),
+    warm() and checksum(), so an array-backed swarm can stand in for this
+    class.
+    """
+    def __init__(self, obstacles, area=MAIN_AREA):
+        self.obstacles = obstacles
+        self.area = pygame.Rect(area)
+        self.grid = SpatialGrid(self.area)
+        for obstacle in obstacles:
+            self.grid.insert(obstacle, obstacle.rect)
+        self.ticks = 0
+
+    def __len__(self):
+        return len(self.obstacles)
+
+    def __iter__(self):
+        return iter(self.obstacles)
+
+    def update(self, wall_grid, active=None):
+        """
+        Moves every spider one tick. With an active rect (the part of a
+        large level around the view), only the spiders overlapping it move
+        every tick. Those within AWAKE_MARGIN of it move OFFSCREEN_STRIDE
+        ticks' worth, swept, on every OFFSCREEN_STRIDE-th tick (a different
+        quarter of them each tick, by grid slot), and the rest sleep where
+        they are. Both sets come from grid queries, so the cost follows the
+        view, not the size of the level.
+        """
+        area = self.area
+        grid = self.grid
+        if active is None or active.contains(area):
+            for obstacle in self.obstacles:
+                obstacle.update(wall_grid, area)
+                grid.move(obstacle)
+            return
+        near = grid.query(active)
+        for obstacle in near:
+            obstacle.update(wall_grid, area)
+            grid.move(obstacle)
+        near = set(near)
+        phase = self.ticks % OFFSCREEN_STRIDE
+        self.ticks += 1
+        slots = grid.slots
+        for obstacle in grid.query(active.inflate(2 * AWAKE_MARGIN, 2 * AWAKE_MARGIN)):
+            if slots[id(obstacle)] % OFFSCREEN_STRIDE == phase and obstacle not in near:
+                obstacle.update(wall_grid, area, OFFSCREEN_STRIDE)
+                grid.move(obstacle)
+
+    def collides(self, rect):
+        return self.grid.collides(rect)
+
+    def draw(self, surface, alpha=1.0, camera=None):
+        """
+        Draws every spider, or with a camera only those in its view, and
+        returns the list of blitted rects.
+        """
+        if camera is None:
+            return [obstacle.draw(surface, alpha) for obstacle in self.obstacles]
+        # Grid slots follow the spider order, so sorting keeps the draw order.
+        slots = self.grid.slots
+        visible = sorted(self.grid.query(camera.rect.inflate(2 * DRAW_SLACK, 2 * DRAW_SLACK)),
+                         key=lambda obstacle: slots[id(obstacle)])
+        origin = camera.origin
+        return [obstacle.draw(surface, alpha, origin) for obstacle in visible]
+
+    def warm(self):
+        """Pre-scales the spider sprites so drawing does no resampling."""
+        for obstacle in self.obstacles:
+            get_scaled(obstacle.image, obstacle.rect.size)
 
-    def draw(self, surface):
-        scaled_spider = pygame.transform.scale(self.image, (self.rect.width, self.rect.height))
-        surface.blit(scaled_spider, (self.rect.x, self.rect.y))
+    def checksum(self, crc=0):
+        """Continues the CRC32 crc over every spider's position, in order."""
+        positions = array("i")
+        for obstacle in self.obstacles:
+            positions.extend(obstacle.rect.topleft)
+        return zlib.crc32(positions, crc)
 
-def create_obstacles(walls, obstacle_image, safe_rect, count=3, obs_width=30, obs_height=30):
+def create_obstacles(wall_grid, obstacle_image, safe_rect, count=3, obs_width=30, obs_height=30, rng=random,
+                     chasers=0, flow=None, area=MAIN_AREA):
+    """
+    Places count spiders at random spots in area clear of the walls and
+    safe_rect. The first chasers of them follow flow (a FlowField) to hunt
+    the knight.
+    """
     obstacles = []
     possible_speeds = [-4, -3, -2, 2, 3, 4]
+    free_space = FreeSpace(area, wall_rects(wall_grid) + [pygame.Rect(safe_rect)], obs_width, obs_height)
+    if not free_space:
+        print(f"No free space for obstacles; skipping {count}.")
+        return obstacles
     for _ in range(count):
-        attempts = 0
-        while attempts < 100:
-            x = random.randint(MAIN_AREA.left, MAIN_AREA.right - obs_width)
-            y = random.randint(MAIN_AREA.top, MAIN_AREA.bottom - obs_height)
-            obs_rect = pygame.Rect(x, y, obs_width, obs_height)
-            if not any(obs_rect.colliderect(wall) for wall in walls) and not obs_rect.colliderect(safe_rect):
-                vx = random.choice(possible_speeds)
-                vy = random.choice(possible_speeds)
-                obstacles.append(MovingObstacle(x, y, obs_width, obs_height, vx, vy, obstacle_image))
-                break
-            attempts += 1
-        if attempts >= 100:
-            print("Failed to place an obstacle without collision; skipping one.")
-    return obstacles
\ No newline at end of file
+        x, y = free_space.sample(rng)
+        vx = rng.choice(possible_speeds)
+        vy = rng.choice(possible_speeds)
+        if len(obstacles) < chasers:
+            obstacles.append(ChasingObstacle(x, y, obs_width, obs_height, vx, vy, obstacle_image, flow))
+        else:
+            obstacles.append(MovingObstacle(x, y, obs_width, obs_height, vx, vy, obstacle_image))
+    return obstacles
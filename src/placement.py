@@ -0,0 +1,112 @@
+# src/placement.py
+
+import pygame
+
+class FreeSpace:
+    """
+    Every position where a width x height rect fits inside area without
+    overlapping any of the blocker rects, stored as disjoint rectangles.
+
+    The rectangles hold top-left positions: a blocker rules out the
+    positions whose rect would overlap it, so each one is grown by the
+    object size before it is cut out of the area. Built once per level and
+    object size, after which sample() picks a uniformly random free
+    position in O(1) with no retries. When any free position exists,
+    sample() always finds one.
+    """
+    def __init__(self, area, blockers, width, height):
+        area = pygame.Rect(area)
+        self.width = width
+        self.height = height
+        # Valid top-left positions, half-open: [x0, x1) x [y0, y1).
+        x0, y0 = area.left, area.top
+        x1, y1 = area.right - width + 1, area.bottom - height + 1
+        cuts = []
+        for rect in blockers:
+            if rect.width <= 0 or rect.height <= 0:
+                continue  # Empty rects never collide.
+            cut = (max(rect.left - width + 1, x0), max(rect.top - height + 1, y0),
+                   min(rect.right, x1), min(rect.bottom, y1))
+            if cut[0] < cut[2] and cut[1] < cut[3]:
+                cuts.append(cut)
+        self.rects = _subtract(x0, y0, x1, y1, cuts) if x0 < x1 and y0 < y1 else []
+        self.total = 0
+        self._build_alias()
+
+    def __bool__(self):
+        return self.total > 0
+
+    def _build_alias(self):
+        # Walker's alias table over the rectangles, weighted by how many
+        # positions each holds.
+        sizes = [(x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in self.rects]
+        self.total = sum(sizes)
+        count = len(sizes)
+        self.prob = [1.0] * count
+        self.alias = list(range(count))
+        if not count:
+            return
+        scaled = [size * count / self.total for size in sizes]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Leftovers are 1.0 up to rounding and keep prob 1.0.
+
+    def sample(self, rng):
+        """Returns a random free (x, y) top-left position, or None if there is none."""
+        if not self.total:
+            return None
+        index = rng.randrange(len(self.rects))
+        if rng.random() >= self.prob[index]:
+            index = self.alias[index]
+        x0, y0, x1, y1 = self.rects[index]
+        return rng.randrange(x0, x1), rng.randrange(y0, y1)
+
+def _subtract(x0, y0, x1, y1, cuts):
+    """
+    Splits the box [x0, x1) x [y0, y1) minus the cut boxes into disjoint
+    boxes. Sweeps the columns between cut edges, and a column's free
+    intervals are merged with the column before when they are the same.
+    """
+    xs = sorted({x0, x1, *(c[0] for c in cuts), *(c[2] for c in cuts)})
+    starts = sorted(cuts)
+    ends = sorted(cuts, key=lambda c: c[2])
+    active = []
+    next_start = next_end = 0
+    boxes = []
+    open_boxes = {}     # (top, bottom) -> left edge of the box still growing
+    for left, right in zip(xs, xs[1:]):
+        while next_end < len(ends) and ends[next_end][2] <= left:
+            active.remove(ends[next_end])
+            next_end += 1
+        while next_start < len(starts) and starts[next_start][0] <= left:
+            if starts[next_start][2] > left:
+                active.append(starts[next_start])
+            next_start += 1
+        intervals = []
+        top = y0
+        for cut in sorted(active, key=lambda c: c[1]):
+            if cut[1] > top:
+                intervals.append((top, cut[1]))
+            top = max(top, cut[3])
+        if top < y1:
+            intervals.append((top, y1))
+        still_open = {}
+        for interval in intervals:
+            still_open[interval] = open_boxes.pop(interval, left)
+        for (top, bottom), box_left in open_boxes.items():
+            boxes.append((box_left, top, left, bottom))
+        open_boxes = still_open
+    for (top, bottom), box_left in open_boxes.items():
+        boxes.append((box_left, top, x1, bottom))
+    return boxes
+
+def wall_rects(wall_grid):
+    """The wall rects stored in a SpatialGrid."""
+    return [rect for rect in wall_grid.rects if rect is not None]
@@ -1,15 +1,20 @@
 # src/player.py
 
 import pygame
+from assets import get_asset
 
 class Player:
-    def __init__(self, x, y):
-        # Load the knight image
-        self.image = pygame.image.load("assets/knight.png").convert_alpha()
-        # Optionally, scale the image to a desired size (for example, 50x50)
-        self.image = pygame.transform.scale(self.image, (50, 50))
+    def __init__(self, x, y, image=None):
+        if image is None:
+            # Load the knight image, already scaled to 50x50 by the asset cache.
+            image = get_asset("knight")
+        # Headless simulations pass a plain 50x50 Surface, which needs no display.
+        self.image = image
         self.x = x
         self.y = y
+        # Position at the start of the last simulation tick, for interpolated drawing.
+        self.prev_x = x
+        self.prev_y = y
         
         # Use the full image dimensions for drawing
         self.draw_width = self.image.get_width()
@@ -41,6 +46,14 @@ class Player:
         self.rect.topleft = (self.x, self.y)
         self.rect.centerx = self.x + self.draw_width // 2
 
-    def draw(self, surface):
-        # Draw the knight image at the player's drawing position.
-        surface.blit(self.image, (self.x, self.y))
\ No newline at end of file
+    def position_at(self, alpha):
+        # The drawing position alpha of the way from the previous tick's
+        # position to the current one.
+        return (self.prev_x + (self.x - self.prev_x) * alpha,
+                self.prev_y + (self.y - self.prev_y) * alpha)
+
+    def draw(self, surface, alpha=1.0, origin=(0, 0)):
+        # Draw the knight image at its interpolated position, shifted by the
+        # camera's origin in a scrolling level (after truncating, as blit does).
+        x, y = self.position_at(alpha)
+        return surface.blit(self.image, (int(x) - origin[0], int(y) - origin[1]))
\ No newline at end of file
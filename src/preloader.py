@@ -0,0 +1,40 @@
+# src/preloader.py
+
+from concurrent.futures import ThreadPoolExecutor
+
+class LevelPreloader:
+    """
+    Prepares upcoming levels on a worker thread while the current one is
+    played, so level transitions don't stall a frame.
+
+    schedule() queues World.prepare_level() for a level index and the load
+    number it will be used for. take() hands back the finished PreparedLevel,
+    waiting only if it isn't done yet, or prepares it inline if nothing
+    matching was scheduled. Placement seeds come from World.level_seed(), so
+    a seeded run places things the same way with or without preloading.
+    """
+    def __init__(self, world):
+        self.world = world
+        self.pending = {}  # level index -> (load number, Future of PreparedLevel)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="level-preloader")
+
+    def schedule(self, index, load_number):
+        if not 0 <= index < len(self.world.level_manager.levels):
+            return
+        entry = self.pending.get(index)
+        if entry is not None and entry[0] == load_number:
+            return
+        seed = self.world.level_seed(load_number)
+        self.pending[index] = (load_number, self.executor.submit(self.world.prepare_level, index, seed))
+
+    def take(self, index, load_number):
+        entry = self.pending.pop(index, None)
+        if entry is None or entry[0] != load_number:
+            return self.world.prepare_level(index, self.world.level_seed(load_number))
+        return entry[1].result()
+
+    def shutdown(self):
+        for _, future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,135 @@
+# src/profiler.py
+#
+# Per-frame section timing for the game loop. The loop calls next_frame()
+# once per rendered frame and mark(name) after each stage; mark() charges
+# the time since the previous mark to that stage. World.step() and the
+# renderer mark their own stages, so the sections are:
+#   wait      clock.tick() sleeping to hold RENDER_FPS
+#   events    pygame event handling
+#   input     InputManager.poll()
+#   player    the player's swept move (per tick, summed over the frame)
+#   obstacles spider update and the player overlap test
+#   coins     coin pickups and the door unlock
+#   rules     door, level change and timer
+#   level     static layer rebuild after a level load
+#   draw      drawing the frame
+#   present   display.flip() / display.update()
+#
+# Frame times and stage times go into preallocated ring buffers of the last
+# HISTORY frames, so recording allocates nothing in the loop. A disabled
+# profiler's mark() returns at once; the headless sim and batch runs never
+# enable it.
+
+import csv
+import json
+import time
+from array import array
+
+# Frames kept for the statistics and the export.
+HISTORY = 600
+
+class FrameProfiler:
+    def __init__(self, history=HISTORY):
+        self.history = history
+        self.enabled = False
+        self.frames = 0             # Frames recorded so far (next slot = frames % history).
+        self.frame_times = array("d", bytes(8 * history))
+        self.sections = {}          # name -> ring of seconds per frame, in first-seen order
+        self.current = {}           # name -> seconds so far in the open frame
+        self.frame_start = None
+        self.last = None
+
+    def next_frame(self):
+        """Closes the open frame, if any, and starts the next one."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            slot = self.frames % self.history
+            self.frame_times[slot] = now - self.frame_start
+            current = self.current
+            for name, ring in self.sections.items():
+                ring[slot] = current[name]
+                current[name] = 0.0
+            self.frames += 1
+        self.frame_start = now
+        self.last = now
+
+    def mark(self, name):
+        """Charges the time since the previous mark to section name."""
+        if not self.enabled or self.last is None:
+            return
+        now = time.perf_counter()
+        current = self.current
+        if name not in current:
+            # A new section: its ring is zero for the frames before it.
+            self.sections[name] = array("d", bytes(8 * self.history))
+            current[name] = 0.0
+        current[name] += now - self.last
+        self.last = now
+
+    def reset(self):
+        self.frames = 0
+        self.frame_start = None
+        self.last = None
+        for name in self.current:
+            self.current[name] = 0.0
+
+    def _order(self):
+        # Ring slots of the recorded frames, oldest first.
+        count = min(self.frames, self.history)
+        first = self.frames - count
+        return [i % self.history for i in range(first, self.frames)]
+
+    def summary(self):
+        """
+        Returns statistics over the recorded frames: fps, frame time p50/p99
+        and, per section, mean and p99, all in milliseconds. None before the
+        first frame is recorded.
+        """
+        slots = self._order()
+        if not slots:
+            return None
+        count = len(slots)
+        times = sorted(self.frame_times[i] for i in slots)
+        total = sum(times)
+        sections = {}
+        for name, ring in self.sections.items():
+            values = sorted(ring[i] for i in slots)
+            sections[name] = {
+                "mean_ms": sum(values) / count * 1000.0,
+                "p99_ms": _percentile(values, 0.99) * 1000.0,
+            }
+        return {
+            "frames": count,
+            "fps": count / total if total > 0 else 0.0,
+            "p50_ms": _percentile(times, 0.5) * 1000.0,
+            "p99_ms": _percentile(times, 0.99) * 1000.0,
+            "sections": sections,
+        }
+
+    def rows(self):
+        """Per-frame rows, oldest first: frame number, frame ms, then each section's ms."""
+        slots = self._order()
+        first = self.frames - len(slots)
+        rings = list(self.sections.values())
+        return [[first + n, self.frame_times[i] * 1000.0] + [ring[i] * 1000.0 for ring in rings]
+                for n, i in enumerate(slots)]
+
+    def export(self, path):
+        """Writes the recorded frames to path, as JSON if it ends in .json and CSV otherwise."""
+        columns = ["frame", "frame_ms"] + [name + "_ms" for name in self.sections]
+        rows = self.rows()
+        with open(path, "w", newline="") as f:
+            if path.endswith(".json"):
+                json.dump({"summary": self.summary(), "columns": columns, "rows": rows}, f, indent=1)
+            else:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                writer.writerows([row[0]] + [f"{value:.4f}" for value in row[1:]] for row in rows)
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+# The profiler the game loop, World.step() and the renderer mark.
+frame_profiler = FrameProfiler()
@@ -1,42 +1,451 @@
 # src/renderer.py
 
+import time
 import pygame
+from collections import OrderedDict
+from profiler import frame_profiler
 
-def render_game(screen, bg_image, vert_wall_tex, horiz_wall_tex,
-                door_closed_img, door_open_img, coin_img,
-                player, coins, door, timer, walls, obstacles):
-    screen.blit(bg_image, (0, 0))
-    
+class SurfaceCache:
+    """
+    LRU cache of scaled surfaces keyed by (source image, target size).
+
+    Scaling the large source PNGs is expensive, so each (image, size) pair is
+    resampled and converted to the display format once and then reused.
+    """
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, image, size):
+        key = (image, size)
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        # Sources are loaded with convert()/convert_alpha() and scale() keeps
+        # the pixel format, so the cached copy is already blit-ready.
+        surface = pygame.transform.scale(image, size)
+        self.entries[key] = surface
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.entries.clear()
+
+# Shared cache used by the renderer and the obstacles.
+surface_cache = SurfaceCache()
+
+def get_scaled(image, size):
+    """Returns image scaled to size, resampling only the first time."""
+    return surface_cache.get(image, (int(size[0]), int(size[1])))
+
+# Fonts keyed by (name, size). SysFont does font discovery and loading, so
+# each font is only created once.
+_fonts = {}
+
+def get_font(name, size):
+    """Returns the SysFont for (name, size), loading it on first use."""
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        font = pygame.font.SysFont(name, size)
+        _fonts[key] = font
+    return font
+
+class TextCache:
+    """LRU cache of rendered text surfaces keyed by (font, text, color)."""
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+
+    def get(self, font, text, color):
+        key = (font, text, color)
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.entries.move_to_end(key)
+            return surface
+        surface = font.render(text, True, color)
+        self.entries[key] = surface
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.entries.clear()
+
+text_cache = TextCache()
+
+def render_text(font, text, color):
+    """Returns the antialiased rendering of text, rendering it only the first time."""
+    return text_cache.get(font, text, color)
+
+# Last rendered timer value and its surface.
+_timer_hud = [None, None]
+
+def render_timer_text(timer):
+    """Returns (surface, value) for the HUD timer, re-rendering only when int(current_time) changes."""
+    value = int(timer.current_time)
+    if value != _timer_hud[0]:
+        _timer_hud[0] = value
+        _timer_hud[1] = render_text(get_font(None, 36), f"Time: {value}", (255, 255, 255))
+    return _timer_hud[1], value
+
+def warm_surface_cache(door_closed_img, door_open_img, coin_img, coins, obstacles):
+    """Scales every dynamic sprite the current level will draw so frames do no resampling."""
+    for rect in coins.rects:
+        get_scaled(coin_img, rect.size)
+    get_scaled(door_closed_img, (50, 80))
+    get_scaled(door_open_img, (50, 80))
+    obstacles.warm()
+
+def build_static_layer(bg_image, vert_wall_tex, horiz_wall_tex, walls):
+    """
+    Composites the background and the textured walls into one surface.
+
+    Walls and background only change on level load, so this is built once per
+    level and render_game blits it as a single surface every frame.
+    """
+    static_layer = bg_image.copy()
     for wall in walls:
         texture = vert_wall_tex if wall.width < wall.height else horiz_wall_tex
-        scaled_wall = pygame.transform.scale(texture, (wall.width, wall.height))
-        screen.blit(scaled_wall, (wall.x, wall.y))
+        static_layer.blit(get_scaled(texture, (wall.width, wall.height)), (wall.x, wall.y))
+    return static_layer
+
+# Side of a static layer tile in a scrolling level, and how many built tiles
+# are kept: an 800x600 view spans at most 4x4 tiles of 256 pixels.
+TILE_SIZE = 256
+TILE_CACHE_SIZE = 48
+
+class StaticTiles:
+    """
+    The static layer of a level larger than the screen, cut into tiles.
+
+    One surface for the whole world would grow with the level, so each
+    tile is composited from the background and the walls it touches (found
+    through the wall grid) the first time it is shown, and the
+    TILE_CACHE_SIZE most recently shown tiles are kept. The background
+    image repeats across the world. draw() blits only the tiles in view.
+    """
+    def __init__(self, bg_image, vert_wall_tex, horiz_wall_tex, wall_grid, bounds,
+                 tile_size=TILE_SIZE, max_tiles=TILE_CACHE_SIZE):
+        self.bg_image = bg_image
+        self.vert_wall_tex = vert_wall_tex
+        self.horiz_wall_tex = horiz_wall_tex
+        self.wall_grid = wall_grid
+        self.bounds = pygame.Rect(bounds)
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self.cols = -(-self.bounds.width // tile_size)
+        self.rows = -(-self.bounds.height // tile_size)
+        self.tiles = OrderedDict()
+        self.built = 0
+
+    def tile(self, col, row):
+        """Returns the surface of tile (col, row), building it on first use."""
+        key = (col, row)
+        surface = self.tiles.get(key)
+        if surface is not None:
+            self.tiles.move_to_end(key)
+            return surface
+        surface = self._build(col, row)
+        self.built += 1
+        self.tiles[key] = surface
+        if len(self.tiles) > self.max_tiles:
+            self.tiles.popitem(last=False)
+        return surface
+
+    def _build(self, col, row):
+        bounds = self.bounds
+        size = self.tile_size
+        rect = pygame.Rect(bounds.x + col * size, bounds.y + row * size, size, size).clip(bounds)
+        surface = pygame.Surface(rect.size, 0, self.bg_image)
+        bg_width, bg_height = self.bg_image.get_size()
+        for y in range(rect.top - (rect.top - bounds.top) % bg_height, rect.bottom, bg_height):
+            for x in range(rect.left - (rect.left - bounds.left) % bg_width, rect.right, bg_width):
+                surface.blit(self.bg_image, (x - rect.x, y - rect.y))
+        # Grid slots follow the level's wall order, the order build_static_layer draws in.
+        slots = self.wall_grid.slots
+        for wall in sorted(self.wall_grid.query(rect), key=lambda wall: slots[id(wall)]):
+            texture = self.vert_wall_tex if wall.width < wall.height else self.horiz_wall_tex
+            surface.blit(get_scaled(texture, (wall.width, wall.height)), (wall.x - rect.x, wall.y - rect.y))
+        return surface
+
+    def draw(self, screen, camera):
+        view = camera.rect
+        bounds = self.bounds
+        size = self.tile_size
+        if not bounds.contains(view):
+            # A world smaller than the view leaves a border around it.
+            screen.fill((0, 0, 0))
+        col0 = max(0, (view.left - bounds.left) // size)
+        col1 = min(self.cols - 1, (view.right - 1 - bounds.left) // size)
+        row0 = max(0, (view.top - bounds.top) // size)
+        row1 = min(self.rows - 1, (view.bottom - 1 - bounds.top) // size)
+        for row in range(row0, row1 + 1):
+            for col in range(col0, col1 + 1):
+                screen.blit(self.tile(col, row),
+                            (bounds.x + col * size - view.x, bounds.y + row * size - view.y))
+
+def render_view(screen, camera, tiles, door_closed_img, door_open_img, coin_img,
+                player, coins, door, timer, obstacles, alpha=1.0, overlay=None):
+    """
+    Draws the playing screen of a scrolling level, like render_game, through
+    camera. The camera is first centered on the knight's drawn position.
+    Only what is in view is drawn: StaticTiles for the walls, the coin
+    store's grid for the coins and the obstacles' own culling for the
+    spiders, so a frame costs the same however large the level is.
+    """
+    x, y = player.position_at(alpha)
+    camera.follow(x + player.draw_width / 2, y + player.draw_height / 2)
+    view = camera.rect
+    origin_x, origin_y = camera.origin
+
+    tiles.draw(screen, camera)
+
+    coin_rects = coins.rects
+    for index in sorted(coins.touching(view)):
+        rect = coin_rects[index]
+        screen.blit(get_scaled(coin_img, rect.size), (rect.x - origin_x, rect.y - origin_y))
+
+    if view.colliderect(door.rect):
+        door_image = door_open_img if not door.is_locked else door_closed_img
+        screen.blit(get_scaled(door_image, (50, 80)), (door.x - origin_x, door.y - origin_y))
+
+    obstacles.draw(screen, alpha, camera)
+
+    player.draw(screen, alpha, camera.origin)
+
+    timer_text, _ = render_timer_text(timer)
+    screen.blit(timer_text, (10, 10))
+
+    if overlay is not None:
+        overlay.draw(screen)
+
+    frame_profiler.mark("draw")
+    pygame.display.flip()
+    frame_profiler.mark("present")
+
+def render_game(screen, static_layer, door_closed_img, door_open_img, coin_img,
+                player, coins, door, timer, obstacles, alpha=1.0, overlay=None):
+    """
+    Draws the playing screen. alpha (0-1) places the knight and spiders that
+    far between their previous and current simulation tick positions.
+    overlay, if given, is drawn on top (see PerfOverlay).
+    """
+    screen.blit(static_layer, (0, 0))
     
-    for coin in coins:
-        if not coin.collected:
-            scaled_coin = pygame.transform.scale(coin_img, (coin.width, coin.height))
-            screen.blit(scaled_coin, (coin.x, coin.y))
+    coin_rects = coins.rects
+    for index in coins.live:
+        rect = coin_rects[index]
+        screen.blit(get_scaled(coin_img, rect.size), rect)
     
     door_image = door_open_img if not door.is_locked else door_closed_img
-    scaled_door = pygame.transform.scale(door_image, (50, 80))
-    screen.blit(scaled_door, (door.x, door.y))
+    scaled_door = get_scaled(door_image, (50, 80))
+    screen.blit(scaled_door, door.rect)
     
-    for obstacle in obstacles:
-        obstacle.draw(screen)
+    obstacles.draw(screen, alpha)
     
-    player.draw(screen)
+    player.draw(screen, alpha)
     
-    font = pygame.font.SysFont(None, 36)
-    timer_text = font.render(f"Time: {int(timer.current_time)}", True, (255, 255, 255))
+    timer_text, _ = render_timer_text(timer)
     screen.blit(timer_text, (10, 10))
     
+    if overlay is not None:
+        overlay.draw(screen)
+    
+    frame_profiler.mark("draw")
     pygame.display.flip()
+    frame_profiler.mark("present")
+
+# With more moving sprites than this, restoring and pushing each one costs
+# more than redrawing the whole screen (bench_suite render.full/render.dirty
+# cross over between 50 and 75 spiders), so DirtyRectRenderer redraws fully.
+DIRTY_SPRITE_LIMIT = 60
+
+class DirtyRectRenderer:
+    """
+    Draws the playing screen like render_game, but only pushes the regions that
+    changed to the display with pygame.display.update(rects).
+
+    Each frame it restores last frame's knight and spider areas from the static
+    layer, together with coins that were just collected, a door that changed
+    state and a changed timer. Sprites with per-pixel alpha must not be drawn
+    twice over themselves, so a coin, the door or the timer is only redrawn
+    when its own area was restored. Coins touching a restored area are found
+    through the CoinStore's grid, so the cost follows the restored area, not
+    the number of coins. An overlay is drawn last every frame and its area
+    restored on the next, like a sprite that moves. A new static layer (level
+    load or restart) or coin store triggers one full redraw, and so does a
+    frame after one with more than DIRTY_SPRITE_LIMIT sprites.
+    """
+    def __init__(self):
+        self.static_layer = None
+        self.prev_rects = []
+        self.coins = None
+        self.coins_alive = 0
+        self.door_locked = None
+        self.timer_value = None
+        self.timer_rect = None
+
+    def invalidate(self):
+        """Forces the next frame to redraw and push the whole screen."""
+        self.static_layer = None
+
+    def render(self, screen, static_layer, door_closed_img, door_open_img, coin_img,
+               player, coins, door, timer, obstacles, alpha=1.0, overlay=None):
+        full_redraw = (static_layer is not self.static_layer or coins is not self.coins
+                       or len(self.prev_rects) > DIRTY_SPRITE_LIMIT)
+
+        timer_text, timer_value = render_timer_text(timer)
+        timer_rect = timer_text.get_rect(topleft=(10, 10))
+
+        door_rect = door.rect
+        door_image = door_open_img if not door.is_locked else door_closed_img
+        coin_rects = coins.rects
+
+        if full_redraw:
+            self.static_layer = static_layer
+            self.coins = coins
+            screen.blit(static_layer, (0, 0))
+            redraw_coins = coins.live
+            redraw_door = True
+            redraw_timer = True
+        else:
+            restore = list(self.prev_rects)
+            for index in coins.collected_since(self.coins_alive):
+                restore.append(coin_rects[index])
+            redraw_door = door.is_locked != self.door_locked
+            if redraw_door:
+                restore.append(door_rect)
+            redraw_timer = timer_value != self.timer_value
+            if redraw_timer:
+                restore.append(self.timer_rect.union(timer_rect))
+
+            # A restored area wipes part of any sprite under it, so that sprite
+            # is restored and redrawn whole, which may in turn touch another.
+            redraw_coins = []
+            marked = set()
+            pending = 0
+            while pending < len(restore):
+                rect = restore[pending]
+                pending += 1
+                for index in coins.touching(rect):
+                    if index not in marked:
+                        marked.add(index)
+                        redraw_coins.append(index)
+                        restore.append(coin_rects[index])
+                if not redraw_door and rect.colliderect(door_rect):
+                    redraw_door = True
+                    restore.append(door_rect)
+                if not redraw_timer and rect.colliderect(timer_rect):
+                    redraw_timer = True
+                    restore.append(timer_rect)
+
+            for rect in restore:
+                screen.blit(static_layer, rect, rect)
+            redraw_coins.sort()
+
+        # Coins in coin order, then the door, as render_game draws them.
+        for index in redraw_coins:
+            rect = coin_rects[index]
+            screen.blit(get_scaled(coin_img, rect.size), rect)
+        if redraw_door:
+            screen.blit(get_scaled(door_image, (50, 80)), door_rect)
+
+        rects = obstacles.draw(screen, alpha)
+        rects.append(player.draw(screen, alpha))
+
+        if redraw_timer:
+            screen.blit(timer_text, timer_rect)
+
+        if overlay is not None:
+            overlay_rect = overlay.draw(screen)
+            if overlay_rect is not None:
+                rects.append(overlay_rect)
+
+        self.coins_alive = coins.alive
+        self.door_locked = door.is_locked
+        self.timer_value = timer_value
+        self.timer_rect = timer_rect
+
+        frame_profiler.mark("draw")
+        if full_redraw:
+            pygame.display.flip()
+        else:
+            pygame.display.update(restore + rects)
+        frame_profiler.mark("present")
+        self.prev_rects = rects
+
+class PerfOverlay:
+    """
+    Frame statistics from a FrameProfiler in a box at the top right: FPS,
+    frame time p50/p99 and the mean and p99 cost of each section.
+
+    The text changes every frame, so it is rendered straight into a cached
+    surface every REFRESH seconds (not through text_cache, which it would
+    churn) and the surface is blitted in between. Hidden until toggle().
+    """
+    REFRESH = 0.5
+    MARGIN = 10
+    PADDING = 6
+
+    def __init__(self, profiler=frame_profiler, font_size=20):
+        self.profiler = profiler
+        self.font_size = font_size
+        self.visible = False
+        self.surface = None
+        self.next_refresh = 0.0
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.next_refresh = 0.0
+
+    def lines(self):
+        summary = self.profiler.summary()
+        if summary is None:
+            return ["profiler: no frames yet"]
+        lines = [f"FPS {summary['fps']:5.1f}   frame p50 {summary['p50_ms']:5.2f}  p99 {summary['p99_ms']:5.2f} ms"]
+        for name, section in summary["sections"].items():
+            lines.append(f"{name:<10} {section['mean_ms']:6.2f}  p99 {section['p99_ms']:6.2f}")
+        return lines
+
+    def _build(self):
+        font = get_font("monospace", self.font_size)
+        rendered = [font.render(line, True, (255, 255, 255)) for line in self.lines()]
+        padding = self.PADDING
+        width = max(text.get_width() for text in rendered) + 2 * padding
+        height = sum(text.get_height() for text in rendered) + 2 * padding
+        surface = pygame.Surface((width, height))
+        surface.fill((0, 0, 0))
+        y = padding
+        for text in rendered:
+            surface.blit(text, (padding, y))
+            y += text.get_height()
+        surface.set_alpha(200)
+        return surface
+
+    def draw(self, screen):
+        """Draws the overlay if visible and returns its rect, or None."""
+        if not self.visible:
+            return None
+        now = time.perf_counter()
+        if self.surface is None or now >= self.next_refresh:
+            self.surface = self._build()
+            self.next_refresh = now + self.REFRESH
+        rect = self.surface.get_rect(topright=(screen.get_width() - self.MARGIN, self.MARGIN))
+        screen.blit(self.surface, rect)
+        return rect
 
 def render_win_screen(screen, bg_image, total_time, restart_button_rect):
     screen.blit(bg_image, (0, 0))
-    font = pygame.font.SysFont(None, 48)
-    win_text = font.render("You Win!", True, (255, 255, 255))
-    time_text = font.render(f"Total Time: {int(total_time)} seconds", True, (255, 255, 255))
+    font = get_font(None, 48)
+    win_text = render_text(font, "You Win!", (255, 255, 255))
+    time_text = render_text(font, f"Total Time: {int(total_time)} seconds", (255, 255, 255))
     
     win_rect = win_text.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2 - 50))
     time_rect = time_text.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2))
@@ -44,8 +453,8 @@ def render_win_screen(screen, bg_image, total_time, restart_button_rect):
     screen.blit(time_text, time_rect)
     
     pygame.draw.rect(screen, (0, 0, 255), restart_button_rect)
-    button_font = pygame.font.SysFont(None, 36)
-    button_text = button_font.render("Restart", True, (255, 255, 255))
+    button_font = get_font(None, 36)
+    button_text = render_text(button_font, "Restart", (255, 255, 255))
     btn_text_rect = button_text.get_rect(center=restart_button_rect.center)
     screen.blit(button_text, btn_text_rect)
     
@@ -53,9 +462,9 @@ def render_win_screen(screen, bg_image, total_time, restart_button_rect):
 
 def render_gameover_screen(screen, bg_image, levels_passed, restart_button_rect, gameover_reason):
     screen.blit(bg_image, (0, 0))
-    font = pygame.font.SysFont(None, 48)
-    over_text = font.render(gameover_reason, True, (255, 0, 0))
-    levels_text = font.render(f"Levels Passed: {levels_passed}", True, (255, 255, 255))
+    font = get_font(None, 48)
+    over_text = render_text(font, gameover_reason, (255, 0, 0))
+    levels_text = render_text(font, f"Levels Passed: {levels_passed}", (255, 255, 255))
     
     over_rect = over_text.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2 - 50))
     levels_rect = levels_text.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2))
@@ -63,8 +472,8 @@ def render_gameover_screen(screen, bg_image, levels_passed, restart_button_rect,
     screen.blit(levels_text, levels_rect)
     
     pygame.draw.rect(screen, (0, 0, 255), restart_button_rect)
-    button_font = pygame.font.SysFont(None, 36)
-    button_text = button_font.render("Restart", True, (255, 255, 255))
+    button_font = get_font(None, 36)
+    button_text = render_text(button_font, "Restart", (255, 255, 255))
     btn_text_rect = button_text.get_rect(center=restart_button_rect.center)
     screen.blit(button_text, btn_text_rect)
     
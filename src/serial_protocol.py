@@ -0,0 +1,175 @@
+# src/serial_protocol.py
+#
+# Decoding of the tilt controller's serial stream. Two formats are accepted:
+#
+# Text (the original firmware), one line per sample at 115200 baud:
+#   "button_state,roll_angle,pitch_angle,direction\r\n", e.g. "1,1.10,0.24,STRAIGHT"
+#   The button is read through a pull-up, so button_state is 0 while pressed.
+#
+# Binary, a fixed 10-byte frame per sample, little-endian:
+#   offset 0  2 bytes  sync, 0xA5 0x5A
+#   offset 2  uint8    sequence number, +1 per frame, wrapping at 256
+#   offset 3  uint8    button bits, set while pressed (bit 0: the button)
+#   offset 4  int16    roll in hundredths of a degree
+#   offset 6  int16    pitch in hundredths of a degree
+#   offset 8  uint16   CRC-16/XMODEM of bytes 2..7 (avr-libc _crc_xmodem_update)
+#
+# StreamParser works out which format a port is sending from the first
+# valid sample, so older firmware keeps working unchanged. Samples from
+# either format carry button_state as the text line does (0 = pressed), so
+# the two bits are inverted when a frame is read or built.
+
+import struct
+from binascii import crc_hqx
+
+SYNC = b"\xa5\x5a"
+FRAME = struct.Struct("<BBhhH")   # seq, buttons, roll, pitch, crc (after the sync bytes)
+FRAME_SIZE = len(SYNC) + FRAME.size
+ANGLE_SCALE = 100.0
+# Frame button bit that is set while the button is held.
+BUTTON_PRESSED = 0x01
+
+# Text lines longer than this without a newline are garbage, not a slow line.
+MAX_LINE = 128
+
+def encode_frame(seq, button_state, roll, pitch):
+    """
+    Builds the binary frame for one sample (angles in degrees). button_state
+    is as on a text line, 0 while pressed.
+    """
+    buttons = BUTTON_PRESSED if button_state == 0 else 0
+    body = struct.pack("<BBhh", seq & 0xFF, buttons,
+                       round(roll * ANGLE_SCALE), round(pitch * ANGLE_SCALE))
+    return SYNC + body + struct.pack("<H", crc_hqx(body, 0))
+
+def parse_line(line):
+    """
+    Parses one "button_state,roll_angle,pitch_angle,direction" line, given
+    as str or bytes (int() and float() read ASCII bytes directly).
+
+    Returns (button_state, roll, pitch) or None if the line is malformed.
+    """
+    parts = line.split(',' if isinstance(line, str) else b',')
+    if len(parts) < 3:
+        return None
+    try:
+        button_state = int(parts[0])
+        roll = float(parts[1])
+        pitch = float(parts[2])
+    except ValueError:
+        return None
+    return (button_state, roll, pitch)
+
+class StreamParser:
+    """
+    Turns raw chunks from a serial port into (button_state, roll, pitch)
+    samples, in either the text or the binary format. button_state is 0
+    while the button is pressed, whichever format it came in.
+
+    feed() takes whatever bytes the port had (ideally one bulk
+    read(in_waiting)) and returns the complete samples in them; partial
+    lines or frames wait in the buffer for the next chunk. Binary frames are
+    unpacked in place with struct.unpack_from, and their sequence numbers
+    count the frames lost in transit.
+
+    Counters:
+      malformed - lines that didn't parse and frames that failed the CRC
+      lost      - binary frames skipped according to the sequence numbers
+    """
+    def __init__(self, protocol=None):
+        self.protocol = protocol    # None until detected, then "text" or "binary"
+        self.buffer = bytearray()
+        self.malformed = 0
+        self.lost = 0
+        self.last_seq = None
+
+    def reset(self):
+        """Forgets the buffered bytes and the detected format, e.g. after a reconnect."""
+        self.protocol = None
+        self.buffer.clear()
+        self.last_seq = None
+
+    def feed(self, data):
+        """Adds data from the port and returns the samples completed by it."""
+        self.buffer += data
+        if self.protocol == "binary":
+            return self._parse_frames()
+        if self.protocol == "text":
+            return self._parse_lines()
+        return self._detect()
+
+    def _detect(self):
+        # Text is 7-bit ASCII, so the 0xA5 sync byte never shows up in it.
+        # A sync followed by a frame that passes its CRC means binary, and a
+        # line that parses means text. Lines before that (the firmware's
+        # startup messages) are skipped without counting as malformed.
+        buffer = self.buffer
+        start = buffer.find(SYNC)
+        while start != -1:
+            if start + FRAME_SIZE > len(buffer):
+                # Wait for the rest of a possible frame before reading lines.
+                return []
+            if self._frame_ok(buffer, start):
+                del buffer[:start]
+                self.protocol = "binary"
+                return self._parse_frames()
+            start = buffer.find(SYNC, start + 1)
+        samples = self._parse_lines(count_malformed=False)
+        if samples:
+            self.protocol = "text"
+        return samples
+
+    def _frame_ok(self, buffer, pos):
+        end = pos + FRAME_SIZE - 2
+        return crc_hqx(buffer[pos + 2:end], 0) == buffer[end] | buffer[end + 1] << 8
+
+    def _parse_frames(self):
+        # Frames are unpacked straight out of the buffer, and the consumed
+        # bytes are dropped once at the end.
+        buffer = self.buffer
+        samples = []
+        pos = 0
+        end = len(buffer)
+        while pos + FRAME_SIZE <= end:
+            if buffer[pos] != 0xA5 or buffer[pos + 1] != 0x5A:
+                # Out of step: skip to the next sync.
+                found = buffer.find(SYNC, pos + 1)
+                pos = found if found != -1 else end - 1
+                continue
+            if not self._frame_ok(buffer, pos):
+                # A corrupt frame, or sync bytes inside one; resync one byte on.
+                self.malformed += 1
+                pos += 1
+                continue
+            seq, buttons, roll, pitch, _ = FRAME.unpack_from(buffer, pos + 2)
+            if self.last_seq is not None:
+                self.lost += (seq - self.last_seq - 1) & 0xFF
+            self.last_seq = seq
+            button_state = 0 if buttons & BUTTON_PRESSED else 1
+            samples.append((button_state, roll / ANGLE_SCALE, pitch / ANGLE_SCALE))
+            pos += FRAME_SIZE
+        del buffer[:pos]
+        return samples
+
+    def _parse_lines(self, count_malformed=True):
+        buffer = self.buffer
+        last = buffer.rfind(b"\n")
+        if last == -1:
+            if len(buffer) > MAX_LINE:
+                if count_malformed:
+                    self.malformed += 1
+                buffer.clear()
+            return []
+        lines = buffer[:last].split(b"\n")
+        del buffer[:last + 1]
+        samples = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            sample = parse_line(line)
+            if sample is not None:
+                samples.append(sample)
+            elif count_malformed:
+                self.malformed += 1
+        return samples
@@ -0,0 +1,239 @@
+# src/serial_replay.py
+#
+# Recording and replay of the tilt controller's serial stream, so the input
+# path can be run and benchmarked without the hardware.
+#
+# A recording is a file of raw chunks exactly as the port returned them,
+# each with the time it was read:
+#   header  4 bytes "IKQS", uint16 format version
+#   record  float64 seconds since the recording started, uint32 length, bytes
+#
+# ReplayPort plays a recording back with its original timing (or faster)
+# behind the parts of the serial.Serial interface the game uses, and
+# open_pty_replay() does the same through a pseudo-terminal for code that
+# wants a real device path.
+
+import math
+import os
+import random
+import struct
+import threading
+import time
+from serial_protocol import encode_frame
+
+MAGIC = b"IKQS"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<4sH")
+_RECORD = struct.Struct("<dI")
+
+# Longest a finished pty replay waits for the reader to take the bytes
+# still queued on the terminal; closing it discards them.
+PTY_DRAIN_TIMEOUT = 1.0
+
+class RecordingPort:
+    """
+    Wraps an open serial port and appends every chunk read from it to a
+    recording file. Everything else is passed through to the port.
+    """
+    def __init__(self, port, path):
+        self.port = port
+        self.file = open(path, "wb")
+        self.file.write(_HEADER.pack(MAGIC, FORMAT_VERSION))
+        self.start = time.perf_counter()
+
+    def __getattr__(self, name):
+        return getattr(self.port, name)
+
+    def _record(self, data):
+        if data:
+            self.file.write(_RECORD.pack(time.perf_counter() - self.start, len(data)))
+            self.file.write(data)
+            # The reader thread is a daemon, so nothing is left in the buffer
+            # if the game exits without closing the port.
+            self.file.flush()
+        return data
+
+    def read(self, size=1):
+        return self._record(self.port.read(size))
+
+    def readline(self):
+        return self._record(self.port.readline())
+
+    def close(self):
+        self.file.close()
+        self.port.close()
+
+def read_recording(path):
+    """Returns the (seconds, bytes) records of a recording file."""
+    with open(path, "rb") as f:
+        blob = f.read()
+    if len(blob) < _HEADER.size:
+        raise ValueError(f"{path}: not a serial recording")
+    magic, version = _HEADER.unpack_from(blob, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"{path}: not a serial recording (or an unknown version)")
+    records = []
+    offset = _HEADER.size
+    while offset + _RECORD.size <= len(blob):
+        seconds, length = _RECORD.unpack_from(blob, offset)
+        offset += _RECORD.size
+        records.append((seconds, blob[offset:offset + length]))
+        offset += length
+    return records
+
+def write_recording(path, records):
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION))
+        for seconds, data in records:
+            f.write(_RECORD.pack(seconds, len(data)))
+            f.write(data)
+
+def synthesize(rate, seconds, protocol="text", rng=random):
+    """
+    Makes records of a controller being tilted in slow circles, one sample
+    per record at rate samples per second, in the text or binary format.
+    """
+    records = []
+    for i in range(int(rate * seconds)):
+        t = i / rate
+        roll = 20.0 * math.sin(t) + rng.uniform(-0.5, 0.5)
+        pitch = 20.0 * math.cos(t) + rng.uniform(-0.5, 0.5)
+        if protocol == "binary":
+            data = encode_frame(i, 1, roll, pitch)
+        else:
+            data = b"1,%.2f,%.2f,STRAIGHT\r\n" % (roll, pitch)
+        records.append((t, data))
+    return records
+
+class ReplayPort:
+    """
+    Stands in for serial.Serial, releasing each recorded chunk once its time
+    has come.
+
+    Time starts at the first read or in_waiting check and runs speed times
+    as fast as the recording (speed=0 releases everything at once). read()
+    and readline() block for at most timeout seconds, like a real port.
+    """
+    def __init__(self, records, speed=1.0, timeout=0.1, loop=False):
+        self.records = records
+        self.speed = speed
+        self.timeout = timeout
+        self.is_open = True
+        self.start = None
+        self.pending = bytearray()
+        self.released = 0           # Records released so far, over all loops.
+        self._duration = records[-1][0] if records else 0.0
+        # A recording with no length would loop forever in an instant.
+        self.loop = loop and self._duration > 0
+
+    def release_time(self, record_index):
+        """perf_counter() time at which record_index (counted over loops) is released."""
+        loops, index = divmod(record_index, len(self.records))
+        seconds = loops * self._duration + self.records[index][0]
+        return self.start + (seconds / self.speed if self.speed else 0.0)
+
+    def _release(self):
+        now = time.perf_counter()
+        if self.start is None:
+            self.start = now
+        elapsed = (now - self.start) * self.speed if self.speed else math.inf
+        records = self.records
+        while True:
+            loops, index = divmod(self.released, len(records)) if records else (0, 0)
+            if not records or (loops and not self.loop):
+                return None
+            seconds = loops * self._duration + records[index][0]
+            if seconds > elapsed:
+                return self.start + seconds / self.speed
+            self.pending += records[index][1]
+            self.released += 1
+
+    def _wait_for(self, ready):
+        # Releases records until ready() or until timeout seconds have passed.
+        deadline = time.perf_counter() + self.timeout
+        while True:
+            next_time = self._release()
+            if ready():
+                return
+            now = time.perf_counter()
+            if now >= deadline:
+                return
+            wake = deadline if next_time is None else min(next_time, deadline)
+            time.sleep(max(0.0, wake - now))
+
+    @property
+    def in_waiting(self):
+        self._release()
+        return len(self.pending)
+
+    @property
+    def exhausted(self):
+        """True once every record has been released and read (never when looping)."""
+        return not self.loop and self.released >= len(self.records) and not self.pending
+
+    def read(self, size=1):
+        self._wait_for(lambda: self.pending)
+        data = bytes(self.pending[:size])
+        del self.pending[:size]
+        return data
+
+    def readline(self):
+        self._wait_for(lambda: b"\n" in self.pending)
+        end = self.pending.find(b"\n") + 1 or len(self.pending)
+        data = bytes(self.pending[:end])
+        del self.pending[:end]
+        return data
+
+    def reset_input_buffer(self):
+        self._release()
+        self.pending.clear()
+
+    def close(self):
+        self.is_open = False
+
+def open_pty_replay(records, speed=1.0, start=None, linger=0.0):
+    """
+    Replays records into a pseudo-terminal on a background thread (POSIX
+    only) and returns the device path to open with serial.Serial, plus the
+    thread. Record times count from start, a perf_counter() time that
+    defaults to now.
+
+    After the last record, the thread waits for the reader to take what is
+    queued (up to PTY_DRAIN_TIMEOUT), then linger seconds more, and closes
+    the terminal; the reader sees that as the device going away.
+    """
+    import fcntl
+    import pty
+    import termios
+    import tty
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    path = os.ttyname(slave)
+
+    if start is None:
+        start = time.perf_counter()
+
+    def queued():
+        return struct.unpack("i", fcntl.ioctl(slave, termios.FIONREAD, b"\0\0\0\0"))[0]
+
+    def feed():
+        try:
+            for seconds, data in records:
+                delay = start + (seconds / speed if speed else 0.0) - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                os.write(master, data)
+            deadline = time.perf_counter() + PTY_DRAIN_TIMEOUT
+            while queued() and time.perf_counter() < deadline:
+                time.sleep(0.01)
+            time.sleep(linger)
+        except OSError:
+            pass    # The reading side went away.
+        finally:
+            os.close(master)
+            os.close(slave)
+
+    thread = threading.Thread(target=feed, name="pty-replay", daemon=True)
+    thread.start()
+    return path, thread
@@ -0,0 +1,269 @@
+# src/session.py
+#
+# Recording and replay of whole play sessions, so a run seen on a cabinet
+# can be played again exactly. World is deterministic given its base seed
+# and the direction fed to each tick, so that is all a session file holds,
+# plus checksums of the state to catch a replay that goes another way:
+#   header  4 bytes "IKQR", uint16 format version, uint32 base seed,
+#           uint16 ticks per second
+#   body    a zlib stream of records, each starting with a varint tag:
+#     ticks << 1        a run of ticks with the same input: dx and dy as
+#                       zigzag varint deltas from the previous run's, in
+#                       1/QUANT steps, then one byte per tick, the low byte
+#                       of World.checksum() after the tick
+#     event << 1 | 1    RESTART: World.restart() from an end screen
+#                       SYNC: uint32 World.checksum() at this point
+#
+# The recorder flushes the stream on every SYNC, every SYNC_TICKS ticks, so
+# a file cut short by a power cut still replays up to there.
+#
+# Example, replaying a recording headless as fast as possible:
+#   python src/session.py session.ikqr
+
+import os
+import struct
+import sys
+import time
+import zlib
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+from level_manager import LevelManager
+from player import Player
+from sim import HEADLESS_PLAYER_SIZE
+from world import SIM_DT, SIM_HZ, World
+
+MAGIC = b"IKQR"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<4sHIH")
+_CHECKSUM = struct.Struct("<I")
+
+# Input directions are stored in steps of 1/QUANT per axis, and the
+# recorder feeds the game the stored value, so the replay sees exactly the
+# same input. Keys and the d-pad (-1, 0, 1) are exact.
+QUANT = 127
+
+RESTART = 0
+SYNC = 1
+
+# Ticks between SYNC records (and flushes of the file).
+SYNC_TICKS = SIM_HZ * 10
+
+def quantize(direction):
+    return tuple(max(-QUANT, min(round(value * QUANT), QUANT)) for value in direction)
+
+def _put_varint(out, value):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _get_varint(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+def _zigzag(value):
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+def _unzigzag(value):
+    return -(value >> 1) - 1 if value & 1 else value >> 1
+
+class SessionRecorder:
+    """
+    Records a session of world to path. The main loop runs its ticks and
+    restarts through step() and restart() instead of calling world
+    directly, and calls close() when the game exits.
+    """
+    def __init__(self, path, world):
+        self.file = open(path, "wb")
+        self.file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, world.base_seed, SIM_HZ))
+        self.compressor = zlib.compressobj(9)
+        self.input = (0, 0)     # Quantized input of the current run.
+        self.written = (0, 0)   # ... and of the last run written.
+        self.checks = bytearray()
+        self.ticks = 0
+        self.sync(world)
+
+    def step(self, world, direction, dt=SIM_DT):
+        """world.step() with direction as it will be replayed; returns its result."""
+        held = quantize(direction)
+        if held != self.input:
+            self._end_run()
+            self.input = held
+        result = world.step((held[0] / QUANT, held[1] / QUANT), dt)
+        self.checks.append(world.checksum() & 0xFF)
+        self.ticks += 1
+        if self.ticks % SYNC_TICKS == 0:
+            self.sync(world)
+        return result
+
+    def restart(self, world):
+        world.restart()
+        self._end_run()
+        out = bytearray()
+        _put_varint(out, RESTART << 1 | 1)
+        self.file.write(self.compressor.compress(out))
+        self.sync(world)
+
+    def sync(self, world):
+        """Records world's full checksum and flushes everything so far to the file."""
+        self._end_run()
+        out = bytearray()
+        _put_varint(out, SYNC << 1 | 1)
+        out += _CHECKSUM.pack(world.checksum())
+        self.file.write(self.compressor.compress(out))
+        self.file.write(self.compressor.flush(zlib.Z_SYNC_FLUSH))
+        self.file.flush()
+
+    def close(self, world):
+        self.sync(world)
+        self.file.write(self.compressor.flush())
+        self.file.close()
+
+    def _end_run(self):
+        # Writes out the current run, if it has any ticks.
+        if not self.checks:
+            return
+        out = bytearray()
+        _put_varint(out, len(self.checks) << 1)
+        _put_varint(out, _zigzag(self.input[0] - self.written[0]))
+        _put_varint(out, _zigzag(self.input[1] - self.written[1]))
+        out += self.checks
+        self.file.write(self.compressor.compress(out))
+        self.written = self.input
+        self.checks.clear()
+
+def read_session(path):
+    """
+    Returns (seed, records) of a session file. records are ("run",
+    (dx, dy), checks), ("restart",) and ("sync", checksum) tuples. A file
+    cut short ends at its last whole record.
+    """
+    with open(path, "rb") as f:
+        blob = f.read()
+    if len(blob) < _HEADER.size:
+        raise ValueError(f"{path}: not a session recording")
+    magic, version, seed, rate = _HEADER.unpack_from(blob, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"{path}: not a session recording (or an unknown version)")
+    if rate != SIM_HZ:
+        raise ValueError(f"{path}: recorded at {rate} ticks per second, the game runs at {SIM_HZ}")
+    data = zlib.decompressobj().decompress(blob[_HEADER.size:])
+    records = []
+    qx = qy = 0
+    offset = 0
+    try:
+        while offset < len(data):
+            tag, offset = _get_varint(data, offset)
+            if tag & 1 == 0:
+                ticks = tag >> 1
+                delta, offset = _get_varint(data, offset)
+                qx += _unzigzag(delta)
+                delta, offset = _get_varint(data, offset)
+                qy += _unzigzag(delta)
+                checks = data[offset:offset + ticks]
+                if len(checks) < ticks:
+                    break
+                offset += ticks
+                records.append(("run", (qx / QUANT, qy / QUANT), checks))
+            elif tag >> 1 == RESTART:
+                records.append(("restart",))
+            elif tag >> 1 == SYNC:
+                if offset + _CHECKSUM.size > len(data):
+                    break
+                records.append(("sync", _CHECKSUM.unpack_from(data, offset)[0]))
+                offset += _CHECKSUM.size
+            else:
+                raise ValueError(f"{path}: unknown record {tag >> 1}")
+    except IndexError:
+        pass  # Cut short in the middle of a record.
+    return seed, records
+
+class SessionReplay:
+    """
+    Plays a recorded session back into a World made with seed=self.seed.
+
+    Each step() runs one recorded tick, after any restarts and SYNC
+    checks recorded before it, and compares the state with the recording.
+    diverged is the number of the first tick (counted from the start) whose
+    state differed, or None. done is set once the recording is used up.
+    """
+    def __init__(self, path):
+        self.seed, self.records = read_session(path)
+        self.ticks = sum(len(record[2]) for record in self.records if record[0] == "run")
+        self.next_record = 0
+        self.run = None
+        self.run_tick = 0
+        self.tick = 0
+        self.diverged = None
+        self.done = False
+
+    def step(self, world, dt=SIM_DT):
+        """Runs the next recorded tick; returns world.step()'s result, or None when done."""
+        records = self.records
+        while self.run is None:
+            if self.next_record >= len(records):
+                self.done = True
+                return None
+            record = records[self.next_record]
+            self.next_record += 1
+            if record[0] == "run":
+                self.run = record
+                self.run_tick = 0
+            elif record[0] == "restart":
+                world.restart()
+            else:
+                self._check(world.checksum(), record[1])
+        _, direction, checks = self.run
+        result = world.step(direction, dt)
+        self.tick += 1
+        self._check(world.checksum() & 0xFF, checks[self.run_tick])
+        self.run_tick += 1
+        if self.run_tick == len(checks):
+            self.run = None
+        return result
+
+    def _check(self, value, recorded):
+        if value != recorded and self.diverged is None:
+            self.diverged = self.tick
+
+    def report(self):
+        if self.diverged is not None:
+            return f"Replay diverged at tick {self.diverged} ({self.diverged * SIM_DT:.2f} s)"
+        return f"Replayed {self.tick} of {self.ticks} ticks ({self.tick * SIM_DT:.2f} s), no divergence"
+
+def replay_headless(path, level_manager=None):
+    """
+    Replays the session in path without a display, as fast as the CPU
+    allows, stopping at the first divergence. Returns the SessionReplay.
+    """
+    replay = SessionReplay(path)
+    level_manager = level_manager or LevelManager()
+    start = level_manager.levels[level_manager.current_level_index]["player_start"]
+    player = Player(*start, image=pygame.Surface(HEADLESS_PLAYER_SIZE))
+    world = World(level_manager, player, None, seed=replay.seed)
+    while not replay.done and replay.diverged is None:
+        replay.step(world)
+    return replay
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("usage: python src/session.py <session file>")
+    start = time.perf_counter()
+    replay = replay_headless(sys.argv[1])
+    elapsed = time.perf_counter() - start
+    print(replay.report())
+    print(f"{elapsed:.2f} s, {replay.tick * SIM_DT / max(elapsed, 1e-9):,.0f}x real time")
+    if replay.diverged is not None:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
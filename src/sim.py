@@ -0,0 +1,164 @@
+# src/sim.py
+
+import random
+import pygame
+from level_manager import LevelManager
+from player import Player
+from world import World
+
+# Stand-in for the knight sprite. A plain Surface needs no display and no
+# asset loading, and gives the same 50x50 draw size and hitbox.
+HEADLESS_PLAYER_SIZE = (50, 50)
+
+# Rewards returned by GameSim.step().
+COIN_REWARD = 1.0
+DOOR_REWARD = 10.0
+GAMEOVER_REWARD = -10.0
+
+class GameSim:
+    """
+    Headless single-level simulation with the same rules as the game.
+
+    Runs World without a display, assets or a clock, as fast as the CPU
+    allows. An episode starts at level_index and ends when the knight goes
+    through the door, dies, runs out of time or reaches max_ticks.
+
+    Observations are tuples:
+      (player_x, player_y, coins_left, door_locked, time_left)
+    """
+    def __init__(self, level_index=0, seed=None, max_ticks=None, level_manager=None):
+        self.level_manager = level_manager or LevelManager()
+        self.level_index = level_index
+        self.max_ticks = max_ticks
+        start = self.level_manager.levels[level_index]["player_start"]
+        self.player = Player(*start, image=pygame.Surface(HEADLESS_PLAYER_SIZE))
+        self.world = None
+        self.reset(seed)
+
+    def reset(self, seed=None, level_index=None):
+        """Starts a new episode with a fresh seeded RNG. Returns the first observation."""
+        if level_index is not None:
+            self.level_index = level_index
+        self.rng = random.Random(seed)
+        self.level_manager.current_level_index = self.level_index
+        self.world = World(self.level_manager, self.player, None, rng=self.rng, single_level=True)
+        self.coins_left = self.world.coins.remaining
+        return self.observe()
+
+    def observe(self):
+        world = self.world
+        return (self.player.x, self.player.y, self.coins_left,
+                world.door.is_locked, world.timer.current_time)
+
+    def step(self, action):
+        """
+        Advances one tick with action = (dx, dy).
+
+        Returns (observation, reward, done, info).
+        """
+        world = self.world
+        result = world.step(action)
+        coins_left = world.coins.remaining
+        reward = (self.coins_left - coins_left) * COIN_REWARD
+        self.coins_left = coins_left
+        if result == "win":
+            reward += DOOR_REWARD
+        elif world.state == "gameover":
+            reward += GAMEOVER_REWARD
+        done = world.state != "playing" or (self.max_ticks is not None and world.ticks >= self.max_ticks)
+        info = {"state": world.state, "reason": world.gameover_reason, "ticks": world.ticks}
+        return self.observe(), reward, done, info
+
+class RandomPolicy:
+    """Holds a random 8-way direction for a few ticks at a time."""
+    def __init__(self, hold_ticks=10):
+        self.hold_ticks = hold_ticks
+
+    def reset(self, rng):
+        self.rng = rng
+        self.action = (0, 0)
+        self.ticks = 0
+
+    def __call__(self, sim):
+        if self.ticks % self.hold_ticks == 0:
+            self.action = (self.rng.choice((-1, 0, 1)), self.rng.choice((-1, 0, 1)))
+        self.ticks += 1
+        return self.action
+
+class GreedyPolicy:
+    """
+    Heads straight for the nearest coin, then the door, like a player with
+    no lookahead. Wiggles randomly for a moment when a wall stops it.
+    """
+    def __init__(self, wiggle_ticks=12):
+        self.wiggle_ticks = wiggle_ticks
+
+    def reset(self, rng):
+        self.rng = rng
+        self.last_pos = None
+        self.wiggle = 0
+        self.wiggle_action = (0, 0)
+
+    def __call__(self, sim):
+        player = sim.player
+        pos = (player.x, player.y)
+        if pos == self.last_pos and self.wiggle == 0:
+            self.wiggle = self.wiggle_ticks
+            self.wiggle_action = (self.rng.choice((-1, 1)), self.rng.choice((-1, 1)))
+        self.last_pos = pos
+        if self.wiggle:
+            self.wiggle -= 1
+            return self.wiggle_action
+
+        world = sim.world
+        cx, cy = player.rect.center
+        target = None
+        best = None
+        coin_rects = world.coins.rects
+        for index in world.coins.live:
+            tx, ty = coin_rects[index].center
+            dist = (tx - cx) ** 2 + (ty - cy) ** 2
+            if best is None or dist < best:
+                best = dist
+                target = (tx, ty)
+        if target is None:
+            target = (world.door.x + 25, world.door.y + 40)
+        dx = (target[0] > cx) - (target[0] < cx)
+        dy = (target[1] > cy) - (target[1] < cy)
+        return (dx, dy)
+
+class ReplayPolicy:
+    """Plays back a recorded list of (dx, dy) actions, then stands still."""
+    def __init__(self, actions):
+        self.actions = actions
+
+    def reset(self, rng):
+        self.index = 0
+
+    def __call__(self, sim):
+        if self.index < len(self.actions):
+            action = self.actions[self.index]
+            self.index += 1
+            return action
+        return (0, 0)
+
+POLICIES = {
+    "greedy": GreedyPolicy,
+    "random": RandomPolicy,
+}
+
+def run_episode(sim, policy, seed=None):
+    """
+    Plays one episode of sim with policy.
+
+    Returns (completed, ticks, total_reward, reason).
+    """
+    sim.reset(seed)
+    policy.reset(random.Random(seed))
+    total_reward = 0.0
+    done = False
+    info = None
+    while not done:
+        _, reward, done, info = sim.step(policy(sim))
+        total_reward += reward
+    return (info["state"] == "win", info["ticks"], total_reward, info["reason"])
@@ -0,0 +1,222 @@
+# src/spatial.py
+
+import pygame
+
+class SpatialGrid:
+    """
+    Uniform grid over an area for broad-phase rect queries.
+
+    Each item is stored with a pygame.Rect in every cell that rect touches.
+    The rect is kept by reference, so items whose rect is moved in place
+    (like MovingObstacle.rect) only need move() to re-bucket them. Rects that
+    leave the area are clamped into the border cells, so queries stay correct
+    anywhere.
+    """
+    def __init__(self, area, cell_size=64):
+        self.area = pygame.Rect(area)
+        self.cell_size = cell_size
+        self.cols = max(1, -(-self.area.width // cell_size))
+        self.rows = max(1, -(-self.area.height // cell_size))
+        # Each cell holds parallel lists of slot numbers and rects, so a cell
+        # can be tested with a single Rect.collidelist() call.
+        self.cell_slots = [[] for _ in range(self.cols * self.rows)]
+        self.cell_rects = [[] for _ in range(self.cols * self.rows)]
+        # Slot-indexed storage. Rects are unhashable, so items are found
+        # again by id().
+        self.items = []
+        self.rects = []
+        self.spans = []
+        self.slots = {}     # id(item) -> slot
+        self.free = []
+        self._stamp = 0
+        self._seen = []     # slot -> stamp of the last query that visited it
+
+    def __len__(self):
+        return len(self.slots)
+
+    def _span(self, rect):
+        area = self.area
+        size = self.cell_size
+        last_col = self.cols - 1
+        last_row = self.rows - 1
+        col0 = (rect.left - area.left) // size
+        row0 = (rect.top - area.top) // size
+        col1 = (rect.right - 1 - area.left) // size
+        row1 = (rect.bottom - 1 - area.top) // size
+        col0 = 0 if col0 < 0 else last_col if col0 > last_col else col0
+        row0 = 0 if row0 < 0 else last_row if row0 > last_row else row0
+        col1 = 0 if col1 < 0 else last_col if col1 > last_col else col1
+        row1 = 0 if row1 < 0 else last_row if row1 > last_row else row1
+        return (col0, row0, col1, row1)
+
+    def _add_to_cells(self, slot, rect, span):
+        col0, row0, col1, row1 = span
+        for row in range(row0, row1 + 1):
+            base = row * self.cols
+            for col in range(col0, col1 + 1):
+                self.cell_slots[base + col].append(slot)
+                self.cell_rects[base + col].append(rect)
+
+    def _remove_from_cells(self, slot, span):
+        col0, row0, col1, row1 = span
+        for row in range(row0, row1 + 1):
+            base = row * self.cols
+            for col in range(col0, col1 + 1):
+                slots = self.cell_slots[base + col]
+                index = slots.index(slot)
+                # Swap with the last entry so removal doesn't shift the list.
+                slots[index] = slots[-1]
+                slots.pop()
+                rects = self.cell_rects[base + col]
+                rects[index] = rects[-1]
+                rects.pop()
+
+    def insert(self, item, rect=None, span=None):
+        """
+        Adds item with rect (defaults to item itself, for plain rects).
+
+        span, the (col0, row0, col1, row1) cell range, can be passed in when
+        it was precomputed, as compiled levels do.
+        """
+        if rect is None:
+            rect = item
+        if span is None:
+            span = self._span(rect)
+        if self.free:
+            slot = self.free.pop()
+            self.items[slot] = item
+            self.rects[slot] = rect
+            self.spans[slot] = span
+        else:
+            slot = len(self.items)
+            self.items.append(item)
+            self.rects.append(rect)
+            self.spans.append(span)
+            self._seen.append(0)
+        self.slots[id(item)] = slot
+        self._add_to_cells(slot, rect, span)
+
+    def remove(self, item):
+        slot = self.slots.pop(id(item), None)
+        if slot is None:
+            return
+        self._remove_from_cells(slot, self.spans[slot])
+        self.items[slot] = None
+        self.rects[slot] = None
+        self.free.append(slot)
+
+    def move(self, item):
+        """Re-buckets item after its rect was moved in place. Cheap when it stays in the same cells."""
+        slot = self.slots[id(item)]
+        span = self._span(self.rects[slot])
+        if span != self.spans[slot]:
+            self._remove_from_cells(slot, self.spans[slot])
+            self.spans[slot] = span
+            self._add_to_cells(slot, self.rects[slot], span)
+
+    def clear(self):
+        for cell in self.cell_slots:
+            cell.clear()
+        for cell in self.cell_rects:
+            cell.clear()
+        self.items.clear()
+        self.rects.clear()
+        self.spans.clear()
+        self.slots.clear()
+        self.free.clear()
+        self._seen.clear()
+
+    def query(self, rect):
+        """Returns the items whose rect collides with rect."""
+        self._stamp += 1
+        stamp = self._stamp
+        seen = self._seen
+        found = []
+        col0, row0, col1, row1 = self._span(rect)
+        for row in range(row0, row1 + 1):
+            base = row * self.cols
+            for col in range(col0, col1 + 1):
+                cell_rects = self.cell_rects[base + col]
+                if not cell_rects:
+                    continue
+                slots = self.cell_slots[base + col]
+                for index in rect.collidelistall(cell_rects):
+                    slot = slots[index]
+                    if seen[slot] != stamp:
+                        seen[slot] = stamp
+                        found.append(self.items[slot])
+        return found
+
+    def query_into(self, rect, out):
+        """
+        Like query(), but writes the items into out, a list kept by the
+        caller between calls, and returns how many were found: they are
+        out[:count]. out only ever grows, and the cells are walked with
+        plain index loops (no range or list iterators), so a steady stream
+        of queries allocates no containers.
+        """
+        self._stamp += 1
+        stamp = self._stamp
+        seen = self._seen
+        rects = self.rects
+        items = self.items
+        cell_slots = self.cell_slots
+        cols = self.cols
+        count = 0
+        col0, row0, col1, row1 = self._span(rect)
+        row = row0
+        while row <= row1:
+            cell = row * cols + col0
+            last = row * cols + col1
+            while cell <= last:
+                slots = cell_slots[cell]
+                i = len(slots)
+                while i:
+                    i -= 1
+                    slot = slots[i]
+                    if seen[slot] != stamp and rect.colliderect(rects[slot]):
+                        seen[slot] = stamp
+                        if count < len(out):
+                            out[count] = items[slot]
+                        else:
+                            out.append(items[slot])
+                        count += 1
+                cell += 1
+            row += 1
+        return count
+
+    def first_collision(self, rect):
+        """Returns one item whose rect collides with rect, or None."""
+        col0, row0, col1, row1 = self._span(rect)
+        for row in range(row0, row1 + 1):
+            base = row * self.cols
+            for col in range(col0, col1 + 1):
+                index = rect.collidelist(self.cell_rects[base + col])
+                if index != -1:
+                    return self.items[self.cell_slots[base + col][index]]
+        return None
+
+    def collides(self, rect):
+        col0, row0, col1, row1 = self._span(rect)
+        cell_rects = self.cell_rects
+        for row in range(row0, row1 + 1):
+            base = row * self.cols
+            for col in range(col0, col1 + 1):
+                if rect.collidelist(cell_rects[base + col]) != -1:
+                    return True
+        return False
+
+def build_grid(area, rects, cell_size=64, spans=None):
+    """
+    Builds a SpatialGrid holding each rect in rects as its own item.
+
+    spans optionally gives each rect's precomputed cell range.
+    """
+    grid = SpatialGrid(area, cell_size)
+    if spans is None:
+        for rect in rects:
+            grid.insert(rect)
+    else:
+        for rect, span in zip(rects, spans):
+            grid.insert(rect, span=span)
+    return grid
@@ -0,0 +1,206 @@
+# src/swarm.py
+
+import random
+import zlib
+import numpy as np
+import pygame
+from utils import MAIN_AREA
+from obstacles import CHASE_SPEED, DRAW_SLACK
+from placement import FreeSpace, wall_rects
+from renderer import get_scaled
+
+# Rows of spiders tested against all walls at once. Bounds the temporary
+# (rows x walls) overlap matrix for very large swarms.
+WALL_TEST_CHUNK = 4096
+
+# Walls are bucketed into horizontal bands of at least this many pixels of
+# spider top positions, and each spider is only tested against its band's
+# walls, so a level many screens tall doesn't test every spider against
+# every wall. A one-screen level is a single band.
+WALL_BAND = 256
+
+class ObstacleSwarm:
+    """
+    Many spiders stored as NumPy arrays instead of one MovingObstacle each.
+
+    Positions and velocities are int arrays, and every tick applies the same
+    bounce rules as MovingObstacle.update() to the whole swarm at once:
+    reflect off the edges of area, then reverse and step back on any wall
+    overlap. It has the ObstacleGroup interface (update, collides, draw,
+    warm, checksum), so World can use either. The whole swarm moves every tick, on
+    screen or not: the array step costs the same either way.
+
+    With a FlowField, the first chasers spiders hunt the knight like
+    ChasingObstacles: one array lookup per tick gives each its next cell,
+    and spiders off the field or without a path bounce as usual.
+    """
+    def __init__(self, xs, ys, vxs, vys, width, height, image, chasers=0, flow=None, area=MAIN_AREA):
+        self.x = np.asarray(xs, dtype=np.int32)
+        self.y = np.asarray(ys, dtype=np.int32)
+        self.vx = np.asarray(vxs, dtype=np.int32)
+        self.vy = np.asarray(vys, dtype=np.int32)
+        # Position at the start of the last simulation tick, for interpolated drawing.
+        self.prev_x = self.x.copy()
+        self.prev_y = self.y.copy()
+        self.width = width
+        self.height = height
+        self.image = image
+        self.chasers = chasers if flow is not None else 0
+        self.flow = flow
+        self.area = pygame.Rect(area)
+        self._walls_for = None
+        self._walls = None
+
+    def __len__(self):
+        return len(self.x)
+
+    def _wall_bands(self, wall_grid):
+        # For each band of spider top positions, the edges of the walls
+        # a spider there can overlap as (left, top, right, bottom) column
+        # arrays. The first and last bands are open-ended. Rebuilt only when
+        # a different wall grid (a new level) comes in.
+        if self._walls_for is not wall_grid:
+            rects = [rect for rect in wall_grid.rects if rect is not None and rect.width > 0 and rect.height > 0]
+            edges = np.array([(r.left, r.top, r.right, r.bottom) for r in rects], dtype=np.int32).reshape(-1, 4)
+            self._edges = (edges[:, 0], edges[:, 1], edges[:, 2], edges[:, 3])
+            count = max(1, self.area.height // WALL_BAND)
+            self._walls = []
+            for band in range(count):
+                low = self.area.top + band * WALL_BAND
+                near = np.ones(len(edges), dtype=bool)
+                if band > 0:
+                    near &= edges[:, 3] > low
+                if band < count - 1:
+                    near &= edges[:, 1] - self.height < low + WALL_BAND - 1
+                band_edges = edges[near]
+                self._walls.append((band_edges[:, 0], band_edges[:, 1], band_edges[:, 2], band_edges[:, 3]))
+            self._walls_for = wall_grid
+        return self._walls
+
+    def _chase(self):
+        # Points the chasers' velocities at their next cells for this tick.
+        # Their steps stay on free cells, so the bounce tests below never
+        # fire for them. Returns the mask of chasers with a path and the
+        # bounce velocities they replaced, which update() puts back.
+        n = self.chasers
+        nav = self.flow.nav
+        x = self.x[:n]
+        y = self.y[:n]
+        col = np.clip((x + self.width // 2 - nav.area.left) // nav.cell_size, 0, nav.cols - 1)
+        row = np.clip((y + self.height // 2 - nav.area.top) // nav.cell_size, 0, nav.rows - 1)
+        target_x, target_y, chasing = self.flow.next_positions(row * nav.cols + col)
+        vx = self.vx[:n]
+        vy = self.vy[:n]
+        bounce = (vx[chasing], vy[chasing])
+        vx[chasing] = np.clip(target_x - x, -CHASE_SPEED, CHASE_SPEED)[chasing]
+        vy[chasing] = np.clip(target_y - y, -CHASE_SPEED, CHASE_SPEED)[chasing]
+        return chasing, bounce
+
+    def update(self, wall_grid, active=None):
+        chase = None
+        if self.chasers and self.flow.dist is not None:
+            chase = self._chase()
+        x, y, vx, vy = self.x, self.y, self.vx, self.vy
+        np.copyto(self.prev_x, x)
+        np.copyto(self.prev_y, y)
+        x += vx
+        y += vy
+
+        area = self.area
+        out = (x < area.left) | (x + self.width > area.right)
+        np.negative(vx, out=vx, where=out)
+        x += np.where(out, vx, 0)
+        out = (y < area.top) | (y + self.height > area.bottom)
+        np.negative(vy, out=vy, where=out)
+        y += np.where(out, vy, 0)
+
+        # Spiders grouped by band, then each group tested against its walls.
+        bands = self._wall_bands(wall_grid)
+        if len(bands) == 1:
+            groups = [np.arange(len(x))]
+        else:
+            band = np.clip((y - area.top) // WALL_BAND, 0, len(bands) - 1)
+            order = np.argsort(band, kind="stable")
+            groups = np.split(order, np.searchsorted(band[order], np.arange(1, len(bands))))
+        for (left, top, right, bottom), group in zip(bands, groups):
+            if len(left) == 0:
+                continue
+            for chunk in range(0, len(group), WALL_TEST_CHUNK):
+                members = group[chunk:chunk + WALL_TEST_CHUNK]
+                cx = x[members, None]
+                cy = y[members, None]
+                hit = ((cx < right) & (cx + self.width > left) &
+                       (cy < bottom) & (cy + self.height > top)).any(axis=1)
+                if hit.any():
+                    members = members[hit]
+                    vx[members] = -vx[members]
+                    vy[members] = -vy[members]
+                    x[members] += vx[members]
+                    y[members] += vy[members]
+                    # After an edge bounce the step back can land in a wall,
+                    # as in MovingObstacle.update(); those go back to where
+                    # the tick started. Few spiders get here, so they are
+                    # tested against every wall.
+                    stuck = members[self._hits_wall(x[members], y[members])]
+                    x[stuck] = self.prev_x[stuck]
+                    y[stuck] = self.prev_y[stuck]
+        if chase is not None:
+            chasing, (bounce_x, bounce_y) = chase
+            vx[:self.chasers][chasing] = bounce_x
+            vy[:self.chasers][chasing] = bounce_y
+
+    def _hits_wall(self, x, y):
+        left, top, right, bottom = self._edges
+        cx = x[:, None]
+        cy = y[:, None]
+        return ((cx < right) & (cx + self.width > left) &
+                (cy < bottom) & (cy + self.height > top)).any(axis=1)
+
+    def overlaps(self, rect):
+        """Returns a bool array marking the spiders that overlap rect."""
+        return ((self.x < rect.right) & (self.x + self.width > rect.left) &
+                (self.y < rect.bottom) & (self.y + self.height > rect.top))
+
+    def collides(self, rect):
+        if rect.width <= 0 or rect.height <= 0:
+            return False
+        return bool(self.overlaps(rect).any())
+
+    def draw(self, surface, alpha=1.0, camera=None):
+        """
+        Draws every spider, or with a camera only those in its view, and
+        returns the list of blitted rects.
+        """
+        sprite = get_scaled(self.image, (self.width, self.height))
+        draw_x = self.prev_x + (self.x - self.prev_x) * alpha
+        draw_y = self.prev_y + (self.y - self.prev_y) * alpha
+        if camera is not None:
+            shown = self.overlaps(camera.rect.inflate(2 * DRAW_SLACK, 2 * DRAW_SLACK))
+            # Whole world pixels first, as blit would truncate them.
+            draw_x = draw_x[shown].astype(np.int32) - camera.rect.x
+            draw_y = draw_y[shown].astype(np.int32) - camera.rect.y
+        return surface.blits([(sprite, pos) for pos in zip(draw_x.tolist(), draw_y.tolist())])
+
+    def warm(self):
+        get_scaled(self.image, (self.width, self.height))
+
+    def checksum(self, crc=0):
+        return zlib.crc32(self.y, zlib.crc32(self.x, crc))
+
+def create_swarm(wall_grid, obstacle_image, safe_rect, count=500, obs_width=30, obs_height=30, rng=random,
+                 chasers=0, flow=None, area=MAIN_AREA):
+    """Places count spiders in area clear of the walls and safe_rect, like create_obstacles."""
+    possible_speeds = [-4, -3, -2, 2, 3, 4]
+    free_space = FreeSpace(area, wall_rects(wall_grid) + [pygame.Rect(safe_rect)], obs_width, obs_height)
+    if not free_space:
+        print(f"No free space for obstacles; skipping {count}.")
+        count = 0
+    xs, ys, vxs, vys = [], [], [], []
+    for _ in range(count):
+        x, y = free_space.sample(rng)
+        xs.append(x)
+        ys.append(y)
+        vxs.append(rng.choice(possible_speeds))
+        vys.append(rng.choice(possible_speeds))
+    return ObstacleSwarm(xs, ys, vxs, vys, obs_width, obs_height, obstacle_image,
+                         min(chasers, count), flow, area)
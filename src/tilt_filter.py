@@ -0,0 +1,243 @@
+# src/tilt_filter.py
+
+import math
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; without it every batch takes the per-sample path.
+    np = None
+
+# Tilt (degrees) that is ignored, and tilt that gives full speed.
+DEADZONE = 2.0
+MAX_ANGLE = 30.0
+
+# Batches at least this big are filtered with NumPy in one pass.
+BATCH_MIN = 16
+
+# Sample spacing assumed until two batches have arrived.
+DEFAULT_DT = 0.01
+
+def shape_tilt(delta_roll, delta_pitch, deadzone=DEADZONE, max_angle=MAX_ANGLE):
+    """
+    Converts a tilt away from the zero position (degrees) to a movement
+    vector (dx, dy) of length 0..1.
+
+    Tilts inside the deadzone give (0, 0); beyond it the length grows
+    linearly to 1 at max_angle. Positive roll (tilted left) moves left and
+    positive pitch (tilted forward) moves down.
+    """
+    magnitude = math.sqrt(delta_roll**2 + delta_pitch**2)
+    if magnitude < deadzone:
+        return (0, 0)
+    effective_magnitude = min(max((magnitude - deadzone) / (max_angle - deadzone), 0), 1)
+    return (-delta_roll / magnitude * effective_magnitude, delta_pitch / magnitude * effective_magnitude)
+
+_exponent_cache = {}
+
+def _exponents(n):
+    # Row of n - 1, ..., 1, 0 for the batch EMA weights.
+    exponents = _exponent_cache.get(n)
+    if exponents is None:
+        exponents = _exponent_cache[n] = np.arange(n - 1, -1, -1, dtype=np.float64)
+    return exponents
+
+def _alpha(cutoff, dt):
+    # Smoothing factor of a first-order low-pass at cutoff Hz for step dt.
+    tau = 1.0 / (2.0 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+class TiltFilter:
+    """
+    Streaming filter from raw (roll, pitch) samples to a movement vector.
+
+    Stages, in order:
+      calibration - the zero position is the mean of the first
+                    calibration_samples samples, leaving out those more than
+                    calibration_spread degrees from their median, so one bad
+                    reading can't skew it. Until then the vector is (0, 0).
+      outliers    - a sample more than outlier_threshold degrees away from
+                    the filtered value is dropped, unless max_rejects in a row
+                    were dropped already (then it is a real fast tilt).
+      smoothing   - a one-euro filter (min_cutoff Hz, plus beta per degree/s
+                    of motion, so it is smooth at rest and quick when moving),
+                    or a plain EMA with ema_alpha when mode is "ema".
+      drift       - optionally, while the tilt stays inside the deadzone, the
+                    zero position follows the filtered value at drift_rate
+                    per second, cancelling slow sensor drift.
+
+    update() takes every sample that arrived since the last call. Small
+    batches are filtered one sample at a time; batches of BATCH_MIN or more
+    go through NumPy in one pass, as an EMA at the batch's one-euro cutoff.
+    """
+    def __init__(self, calibration_samples=20, calibration_spread=3.0, outlier_threshold=25.0,
+                 max_rejects=3, mode="one_euro", min_cutoff=1.0, beta=0.05, d_cutoff=1.0,
+                 ema_alpha=0.3, drift_rate=0.0, deadzone=DEADZONE, max_angle=MAX_ANGLE):
+        self.calibration_samples = calibration_samples
+        self.calibration_spread = calibration_spread
+        self.outlier_threshold = outlier_threshold
+        self.max_rejects = max_rejects
+        self.mode = mode
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.ema_alpha = ema_alpha
+        self.drift_rate = drift_rate
+        self.deadzone = deadzone
+        self.max_angle = max_angle
+        self.rejected = 0
+        self.reset()
+
+    def reset(self):
+        """Starts over, recalibrating from the next samples."""
+        self.window = []
+        self.zero = None        # (roll, pitch) of the zero position once calibrated
+        self.value = None       # filtered (roll, pitch)
+        self.speed = [0.0, 0.0] # filtered derivative, degrees/s
+        self.last_time = None
+        self.dt = DEFAULT_DT
+        self.rejects_in_row = 0
+
+    @property
+    def calibrated(self):
+        return self.zero is not None
+
+    def update(self, samples):
+        """
+        Feeds a batch of (arrival_time, button_state, roll, pitch) samples,
+        oldest first, and returns the movement vector after them.
+        """
+        if samples:
+            # Samples read in one chunk share an arrival time, so the batch
+            # is taken to be evenly spaced since the previous one.
+            newest = samples[-1][0]
+            if self.last_time is not None and newest > self.last_time:
+                self.dt = (newest - self.last_time) / len(samples)
+            self.last_time = newest
+            if not self.calibrated:
+                samples = self._calibrate(samples)
+            if samples:
+                if np is not None and len(samples) >= BATCH_MIN:
+                    self._filter_batch(samples)
+                else:
+                    for sample in samples:
+                        self._filter_one(sample[2], sample[3])
+                if self.drift_rate:
+                    self._follow_drift(len(samples) * self.dt)
+        return self.vector()
+
+    def vector(self):
+        if self.value is None:
+            return (0, 0)
+        return shape_tilt(self.value[0] - self.zero[0], self.value[1] - self.zero[1],
+                          self.deadzone, self.max_angle)
+
+    def _calibrate(self, samples):
+        # Collects the calibration window; returns the samples left over.
+        needed = self.calibration_samples - len(self.window)
+        self.window.extend((sample[2], sample[3]) for sample in samples[:needed]
+                           if math.isfinite(sample[2]) and math.isfinite(sample[3]))
+        if len(self.window) < self.calibration_samples:
+            return []
+        rolls = sorted(roll for roll, _ in self.window)
+        pitches = sorted(pitch for _, pitch in self.window)
+        middle = (rolls[len(rolls) // 2], pitches[len(pitches) // 2])
+        spread = self.calibration_spread
+        kept = [(roll, pitch) for roll, pitch in self.window
+                if abs(roll - middle[0]) <= spread and abs(pitch - middle[1]) <= spread] or [middle]
+        self.zero = (sum(roll for roll, _ in kept) / len(kept), sum(pitch for _, pitch in kept) / len(kept))
+        self.value = self.zero
+        self.window = []
+        return samples[needed:]
+
+    def _accept(self, roll, pitch):
+        # Outlier test against the filtered value.
+        if not (math.isfinite(roll) and math.isfinite(pitch)):
+            self.rejected += 1
+            return False
+        if (abs(roll - self.value[0]) > self.outlier_threshold
+                or abs(pitch - self.value[1]) > self.outlier_threshold):
+            if self.rejects_in_row < self.max_rejects:
+                self.rejects_in_row += 1
+                self.rejected += 1
+                return False
+        self.rejects_in_row = 0
+        return True
+
+    def _filter_one(self, roll, pitch):
+        if not self._accept(roll, pitch):
+            return
+        value = self.value
+        if self.mode == "ema":
+            a = self.ema_alpha
+            self.value = (value[0] + a * (roll - value[0]), value[1] + a * (pitch - value[1]))
+            return
+        dt = self.dt
+        a_d = _alpha(self.d_cutoff, dt)
+        new = []
+        for axis, x in enumerate((roll, pitch)):
+            speed = self.speed[axis] + a_d * ((x - value[axis]) / dt - self.speed[axis])
+            self.speed[axis] = speed
+            a = _alpha(self.min_cutoff + self.beta * abs(speed), dt)
+            new.append(value[axis] + a * (x - value[axis]))
+        self.value = (new[0], new[1])
+
+    def _filter_batch(self, samples):
+        # Rolls and pitches as two rows; built from lists, this is several
+        # times cheaper than converting the sample tuples whole.
+        values = np.array(([sample[2] for sample in samples], [sample[3] for sample in samples]),
+                          dtype=np.float64)
+        n = len(samples)
+        # Outliers: compared with the batch median rather than the current
+        # value, so a real tilt that the whole batch agrees on isn't dropped.
+        # NaNs sort to the end and fail the distance tests below.
+        ordered = np.sort(values, axis=1)
+        rolls, pitches = ordered.tolist()
+        low_roll, median_roll, high_roll = rolls[0], rolls[n // 2], rolls[-1]
+        low_pitch, median_pitch, high_pitch = pitches[0], pitches[n // 2], pitches[-1]
+        threshold = self.outlier_threshold
+        jump = max(abs(median_roll - self.value[0]), abs(median_pitch - self.value[1]))
+        if not jump <= threshold and self.rejects_in_row < self.max_rejects:
+            # The whole batch jumped; hold it back like a single outlier.
+            self.rejects_in_row += 1
+            self.rejected += n
+            return
+        # Samples are only tested one by one when the batch's extremes say
+        # some of them are out, which is rare.
+        if not (median_roll - low_roll <= threshold and high_roll - median_roll <= threshold
+                and median_pitch - low_pitch <= threshold and high_pitch - median_pitch <= threshold):
+            keep = np.abs(values - ordered[:, n // 2:n // 2 + 1]).max(axis=0) <= threshold
+            values = values.compress(keep, axis=1)
+            kept = values.shape[1]
+            self.rejected += n - kept
+            if kept == 0:
+                return
+            n = kept
+        self.rejects_in_row = 0
+        value = self.value
+        dt = self.dt
+        if self.mode == "ema":
+            alphas = (self.ema_alpha, self.ema_alpha)
+        else:
+            # One cutoff per axis for the whole batch, from its speed: the
+            # median sits about (n + 1) / 2 steps after the current value.
+            a_d = 1.0 - (1.0 - _alpha(self.d_cutoff, dt)) ** n
+            steps = (n + 1) / 2 * dt
+            speed = self.speed
+            for axis, median in enumerate((median_roll, median_pitch)):
+                speed[axis] += a_d * ((median - value[axis]) / steps - speed[axis])
+            alphas = tuple(_alpha(self.min_cutoff + self.beta * abs(s), dt) for s in speed)
+        # An EMA over n samples in closed form: the old value decays by
+        # (1 - a)^n, and sample k is weighted a * (1 - a)^(n - 1 - k).
+        decay = (1.0 - alphas[0], 1.0 - alphas[1])
+        powers = np.array(decay)[:, None] ** _exponents(n)
+        sums = (powers * values).sum(axis=1).tolist()
+        self.value = (decay[0] ** n * value[0] + alphas[0] * sums[0],
+                      decay[1] ** n * value[1] + alphas[1] * sums[1])
+
+    def _follow_drift(self, elapsed):
+        value = self.value
+        zero = self.zero
+        if math.hypot(value[0] - zero[0], value[1] - zero[1]) >= self.deadzone:
+            return
+        a = min(1.0, self.drift_rate * elapsed)
+        self.zero = (zero[0] + a * (value[0] - zero[0]), zero[1] + a * (value[1] - zero[1]))
@@ -4,9 +4,15 @@ import pygame
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
 MAIN_MARGIN = 50
-MAIN_AREA = pygame.Rect(MAIN_MARGIN, MAIN_MARGIN,
-                        SCREEN_WIDTH - 2 * MAIN_MARGIN,
-                        SCREEN_HEIGHT - 2 * MAIN_MARGIN)
+
+def play_area(world_width, world_height):
+    """The playable part of a world_width x world_height level: all but a MAIN_MARGIN border."""
+    return pygame.Rect(MAIN_MARGIN, MAIN_MARGIN,
+                       world_width - 2 * MAIN_MARGIN,
+                       world_height - 2 * MAIN_MARGIN)
+
+# The play area of a one-screen level, the default when a level sets no "world_size".
+MAIN_AREA = play_area(SCREEN_WIDTH, SCREEN_HEIGHT)
 
 class Timer:
     def __init__(self, time_limit):
@@ -0,0 +1,301 @@
+# src/world.py
+
+import pygame
+import random
+import struct
+import zlib
+from camera import Camera
+from collision import sweep_box
+from navigation import FlowField, NavGrid
+from objects import CoinStore, Door, create_coins_in_area
+from obstacles import ObstacleGroup, create_obstacles
+from profiler import frame_profiler
+from spatial import build_grid
+from utils import SCREEN_WIDTH, SCREEN_HEIGHT, Timer, play_area
+
+try:
+    from swarm import ObstacleSwarm, create_swarm
+except ImportError:  # NumPy is optional; without it every level uses MovingObstacles.
+    ObstacleSwarm = None
+
+# Levels with at least this many spiders ("spider_count") use the
+# array-backed ObstacleSwarm instead of one MovingObstacle per spider.
+SWARM_THRESHOLD = 50
+
+# Simulation rate. Speeds (Player.speed, spider vx/vy) are in pixels per tick,
+# so gameplay runs at the same pace whatever the render frame rate is.
+SIM_HZ = 30
+SIM_DT = 1.0 / SIM_HZ
+
+# Spiders within this many pixels of the view move every tick; further out,
+# in a level larger than the screen, they move in coarser steps or sleep
+# (see ObstacleGroup.update).
+ACTIVE_MARGIN = 64
+
+# Fields of World.checksum(): ticks, level index, total time, knight x and
+# y, time left, door locked, coins left and state.
+_STATE = struct.Struct("<qidddd?iB")
+STATES = ("playing", "win", "gameover")
+
+# Chasing spiders more than this many flow field steps (NAV_CELL pixels
+# each) from the knight wander instead, which bounds the search on large
+# levels. Covers the whole of a one-screen level.
+CHASE_RANGE = 80
+
+class PreparedLevel:
+    """
+    Everything a level needs before it can be played: the world's bounds
+    and play area, walls and their grid, placed coins (a CoinStore) and
+    spiders, the spawn safe zone, and the FlowField chasing spiders follow
+    (None when the level has none).
+
+    Built by World.prepare_level() without touching the live game state, so
+    it can be made on a worker thread and swapped in with World.apply_level().
+    """
+    def __init__(self, index, level, bounds, area, walls, wall_grid, coins, safe_rect, obstacles, flow=None):
+        self.index = index
+        self.level = level
+        self.bounds = bounds
+        self.area = area
+        self.walls = walls
+        self.wall_grid = wall_grid
+        self.coins = coins
+        self.safe_rect = safe_rect
+        self.obstacles = obstacles
+        self.flow = flow
+
+class World:
+    """
+    Game state for one run: the current level's walls, coins, door, spiders
+    and timer, plus the rules that advance them by one fixed tick.
+
+    step() never touches the display, so the main loop can run it any number
+    of times per rendered frame. Coin and spider placement for each level
+    load is seeded from rng, so passing a seeded random.Random makes a run
+    reproducible. With single_level the run ends in "win" at the current
+    level's door instead of loading the next level. With preload, the next
+    level and the restart level are prepared on a background thread while
+    the current one is played.
+
+    A level may be larger than the screen ("world_size"). view is then the
+    screen-sized window that follows the knight, at tick positions, and
+    spiders outside it are simulated at a lower rate, or not at all.
+    """
+    def __init__(self, level_manager, player, spider_img, safe_margin=100, rng=random,
+                 single_level=False, preload=False, seed=None):
+        self.level_manager = level_manager
+        self.rng = rng
+        self.single_level = single_level
+        self.player = player
+        self.spider_img = spider_img
+        self.safe_margin = safe_margin
+        self.state = "playing"  # "playing", "win", "gameover"
+        self.gameover_reason = ""
+        self.total_time = 0.0
+        self.ticks = 0
+        # Bumped on every level load so the renderer knows to rebuild the static layer.
+        self.level_serial = 0
+        level = level_manager.get_current_level()
+        self.door = Door(*level["door"])
+        self.timer = Timer(level["time_limit"])
+        # Level loads are numbered, and load n places coins and spiders with
+        # level_seed(n). The seed doesn't depend on which level is loaded, so
+        # the next level and a restart can both be prepared ahead of time.
+        self.base_seed = rng.getrandbits(32) if seed is None else seed
+        self.loads = 0
+        self.preloader = None
+        if preload:
+            # Imported here because preloader.py imports this module.
+            from preloader import LevelPreloader
+            self.preloader = LevelPreloader(self)
+        self.load_level()
+
+    def prepare_level(self, index, seed):
+        """
+        Builds level index's walls, coins and obstacles into a PreparedLevel.
+
+        Walls are indexed in a spatial grid over the level's play area for
+        the collision checks in step(), and coins go into a CoinStore, which
+        has its own. A level may set "world_size" (default the screen size),
+        "spider_count" (default 3) and "chasers" (default 0), the number of
+        those spiders that hunt the knight along a FlowField. Only reads
+        shared state, so it is safe to run on a worker thread.
+        """
+        rng = random.Random(seed)
+        level = self.level_manager.levels[index]
+        world_width, world_height = level.get("world_size", (SCREEN_WIDTH, SCREEN_HEIGHT))
+        bounds = pygame.Rect(0, 0, world_width, world_height)
+        area = play_area(world_width, world_height)
+        walls = [pygame.Rect(x, y, w, h) for (x, y, w, h) in level["walls"]]
+        wall_grid = build_grid(area, walls, level.get("cell_size", 64), level.get("wall_spans"))
+        coins = CoinStore.from_coins(create_coins_in_area(level["coins"], wall_grid, rng=rng, area=area), area)
+        # Define a safe zone for obstacles around the player's spawn, unless the
+        # compiled level already carries one.
+        if "safe_rect" in level:
+            safe_rect = pygame.Rect(level["safe_rect"])
+        else:
+            start_x, start_y = level["player_start"]
+            safe_margin = self.safe_margin
+            safe_rect = pygame.Rect(
+                start_x - safe_margin, start_y - safe_margin,
+                self.player.draw_width + 2 * safe_margin, self.player.draw_height + 2 * safe_margin
+            )
+        spider_count = level.get("spider_count", 3)
+        chasers = min(level.get("chasers", 0), spider_count)
+        flow = FlowField(NavGrid(walls, 30, 30, area=area), CHASE_RANGE) if chasers else None
+        if ObstacleSwarm is not None and spider_count >= SWARM_THRESHOLD:
+            obstacles = create_swarm(wall_grid, self.spider_img, safe_rect,
+                                     count=spider_count, obs_width=30, obs_height=30, rng=rng,
+                                     chasers=chasers, flow=flow, area=area)
+        else:
+            obstacles = ObstacleGroup(create_obstacles(wall_grid, self.spider_img, safe_rect,
+                                                       count=spider_count, obs_width=30, obs_height=30,
+                                                       rng=rng, chasers=chasers, flow=flow, area=area),
+                                      area)
+        return PreparedLevel(index, level, bounds, area, walls, wall_grid, coins, safe_rect, obstacles, flow)
+
+    def apply_level(self, prepared):
+        """Swaps a PreparedLevel in and resets the player, door and timer for it."""
+        level = prepared.level
+        self.bounds = prepared.bounds
+        self.area = prepared.area
+        self.view = Camera(SCREEN_WIDTH, SCREEN_HEIGHT, prepared.bounds)
+        self.walls = prepared.walls
+        self.wall_grid = prepared.wall_grid
+        self.coins = prepared.coins
+        self.safe_rect = prepared.safe_rect
+        self.obstacles = prepared.obstacles
+        self.flow = prepared.flow
+        player = self.player
+        player.x, player.y = level["player_start"]
+        player.rect.topleft = (player.x, player.y)
+        player.rect.centerx = player.x + player.draw_width // 2
+        player.prev_x, player.prev_y = player.x, player.y
+        self.view.follow(player.x + player.draw_width / 2, player.y + player.draw_height / 2)
+        self.door.x, self.door.y = level["door"]
+        self.door.lock()
+        self.coins.bind_door(self.door)
+        self.timer.reset(level["time_limit"])
+        self.level_serial += 1
+
+    def level_seed(self, load_number):
+        return (self.base_seed << 32) | load_number
+
+    def load_level(self):
+        """Makes the level manager's current level the live one."""
+        index = self.level_manager.current_level_index
+        self.loads += 1
+        if self.preloader is not None:
+            prepared = self.preloader.take(index, self.loads)
+        else:
+            prepared = self.prepare_level(index, self.level_seed(self.loads))
+        self.apply_level(prepared)
+        if self.preloader is not None and not self.single_level:
+            # Get the next level and the restart level ready in the background.
+            self.preloader.schedule(index + 1, self.loads + 1)
+            self.preloader.schedule(0, self.loads + 1)
+
+    def restart(self):
+        self.level_manager.reset()
+        self.load_level()
+        self.total_time = 0.0
+        self.state = "playing"
+        self.gameover_reason = ""
+
+    def checksum(self):
+        """
+        CRC32 of the simulation state: the knight, timer, door, coins and
+        every spider's position. Two runs with the same checksum after every
+        tick went the same way.
+        """
+        player = self.player
+        crc = zlib.crc32(_STATE.pack(self.ticks, self.level_manager.current_level_index, self.total_time,
+                                     player.x, player.y, self.timer.current_time, self.door.is_locked,
+                                     self.coins.remaining, STATES.index(self.state)))
+        return self.obstacles.checksum(crc)
+
+    def step(self, direction_vector, dt=SIM_DT):
+        """
+        Advances the game by one fixed tick of dt seconds.
+
+        Returns "next_level" when the player went through the door to another
+        level, the new state when it changed to "win" or "gameover", and None
+        otherwise.
+        """
+        if self.state != "playing":
+            return None
+        player = self.player
+        wall_grid = self.wall_grid
+        self.ticks += 1
+        self.total_time += dt
+
+        # Save previous position.
+        prev_x, prev_y = player.x, player.y
+        player.prev_x, player.prev_y = prev_x, prev_y
+
+        # Sweep the hitbox along the whole move: it stops flush against a
+        # wall and slides along it instead of losing the step or tunneling.
+        offset = (player.draw_width - player.rect.width) // 2
+        hit_x, player.y = sweep_box(wall_grid, prev_x + offset, prev_y,
+                                    player.rect.width, player.rect.height,
+                                    direction_vector[0] * player.speed,
+                                    direction_vector[1] * player.speed)
+        player.x = hit_x - offset
+
+        # Enforce boundaries using the level's play area.
+        area = self.area
+        if player.x < area.left:
+            player.x = area.left
+        if player.x + player.draw_width > area.right:
+            player.x = area.right - player.draw_width
+        if player.y < area.top:
+            player.y = area.top
+        if player.y + player.draw_height > area.bottom:
+            player.y = area.bottom - player.draw_height
+        player.rect.topleft = (player.x, player.y)
+        player.rect.x = player.x + (player.draw_width - player.rect.width) // 2
+        self.view.follow(player.x + player.draw_width / 2, player.y + player.draw_height / 2)
+        frame_profiler.mark("player")
+
+        # Update obstacles. Chasing spiders' flow field follows the knight,
+        # searching again only when the knight enters another cell.
+        if self.flow is not None:
+            self.flow.track(player.rect)
+        self.obstacles.update(wall_grid, self.view.rect.inflate(2 * ACTIVE_MARGIN, 2 * ACTIVE_MARGIN))
+        if self.obstacles.collides(player.rect):
+            self.state = "gameover"
+            self.gameover_reason = "You Died!"
+        frame_profiler.mark("obstacles")
+
+        # Check coin collisions. The store unlocks the door with the last coin.
+        self.coins.collect_touching(player.rect)
+        frame_profiler.mark("coins")
+
+        result = self._apply_rules(dt)
+        frame_profiler.mark("rules")
+        return result
+
+    def _apply_rules(self, dt):
+        # The door, level changes and the timer; returns step()'s result.
+        player = self.player
+
+        # Check door.
+        if self.door.check_collision(player) and not self.door.is_locked:
+            if self.single_level:
+                self.state = "win"
+                return "win"
+            self.level_manager.next_level()
+            if self.level_manager.current_level_index >= len(self.level_manager.levels):
+                self.state = "win"
+                return "win"
+            self.load_level()
+            return "next_level"
+
+        # Update timer; if time runs out, game over.
+        if self.timer.update(dt) and self.state == "playing":
+            self.state = "gameover"
+            self.gameover_reason = "Time Ran Out!"
+
+        if self.state != "playing":
+            return self.state
+        return None